@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validación y alta de alumnos
+
+La validación la usan el formulario de registro y la importación masiva,
+para que un alumno importado cumpla las mismas reglas que uno cargado a
+mano. crear_alumno() es el alta de a uno (web y escritorio), y
+ROSTER_DEL_DIA la lista de alumnos con su asistencia de una fecha que
+muestran las dos versiones. buscar_alumno() reconoce a un alumno que ya
+existe con el mismo criterio que la importación (lo usa la
+sincronización para no duplicar altas).
+"""
+
+import basedatos
+import db_pool
+import eventos
+import historial
+
+# Todos los alumnos con su asistencia de una fecha, en un solo JOIN
+ROSTER_DEL_DIA = basedatos.Sentencia('roster_del_dia', '''
+    SELECT a.id, a.nombre, a.apellido, ast.presente
+    FROM alumnos a
+    LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = %s
+    ORDER BY a.apellido, a.nombre
+''')
+
+# El mismo alumno: nombre y apellido sin distinguir mayúsculas y el mismo
+# teléfono, como en la importación
+SQL_BUSCAR = {
+    'postgresql': '''
+        SELECT id FROM alumnos
+        WHERE lower(apellido) = lower(%s) AND lower(nombre) = lower(%s)
+          AND COALESCE(telefono, '') = %s
+        ORDER BY id
+        LIMIT 1
+    ''',
+    'sqlite': '''
+        SELECT id FROM alumnos
+        WHERE apellido = %s COLLATE NOCASE AND nombre = %s COLLATE NOCASE
+          AND COALESCE(telefono, '') = %s
+        ORDER BY id
+        LIMIT 1
+    ''',
+}
+
+# Largos máximos de las columnas (VARCHAR en PostgreSQL)
+MAX_NOMBRE = 100
+MAX_APELLIDO = 100
+MAX_TELEFONO = 20
+
+
+def validar_alumno(nombre, apellido, telefono=''):
+    """Normalizar y validar un alumno
+
+    Devuelve ((nombre, apellido, telefono), None) si es válido o
+    (None, mensaje) si no.
+    """
+    nombre = (nombre or '').strip()
+    apellido = (apellido or '').strip()
+    telefono = (telefono or '').strip()
+
+    if not nombre or not apellido:
+        return None, 'Nombre y apellido son obligatorios'
+    if len(nombre) > MAX_NOMBRE or len(apellido) > MAX_APELLIDO:
+        return None, f'Nombre y apellido admiten hasta {MAX_NOMBRE} caracteres'
+    if len(telefono) > MAX_TELEFONO:
+        return None, f'El teléfono admite hasta {MAX_TELEFONO} caracteres'
+
+    return (nombre, apellido, telefono), None
+
+
+def buscar_alumno(cursor, nombre, apellido, telefono):
+    """id del alumno que ya existe con esos datos (ver SQL_BUSCAR), o None"""
+    basedatos.ejecutar_en(cursor, SQL_BUSCAR[basedatos.dialecto()], (apellido, nombre, telefono or ''))
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+
+def insertar_alumno(cursor, nombre, apellido, telefono):
+    """Insertar un alumno ya validado en la transacción del cursor, anotarlo en el historial y avisar; devuelve su id"""
+    if basedatos.dialecto() == 'postgresql':
+        basedatos.ejecutar_en(cursor, '''
+            INSERT INTO alumnos (nombre, apellido, telefono) VALUES (%s, %s, %s) RETURNING id
+        ''', (nombre, apellido, telefono))
+        alumno_id = cursor.fetchone()[0]
+    else:
+        basedatos.ejecutar_en(cursor, '''
+            INSERT INTO alumnos (nombre, apellido, telefono) VALUES (%s, %s, %s)
+        ''', (nombre, apellido, telefono))
+        alumno_id = cursor.lastrowid
+    historial.anotar(cursor, [('alumno', alumno_id, None, None)])
+    eventos.avisar_alumnos(cursor)
+    return alumno_id
+
+
+def crear_alumno(nombre, apellido, telefono):
+    """Insertar un alumno ya validado y anotarlo en el historial; devuelve su id"""
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            alumno_id = insertar_alumno(cursor, nombre, apellido, telefono)
+        finally:
+            cursor.close()
+    return alumno_id
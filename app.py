@@ -1,292 +1,920 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-Sistema de Asistencia para Clases de Yoga - Versión Web con PostgreSQL
-"""
-
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-import psycopg2
-import psycopg2.extras
-from datetime import datetime, date
-import os
-from urllib.parse import urlparse
-
-app = Flask(__name__)
-
-def get_db_connection():
-    """Conectar a la base de datos PostgreSQL o SQLite"""
-    try:
-        # Obtener URL de la base de datos desde Railway
-        database_url = os.environ.get('DATABASE_URL')
-        
-        if not database_url:
-            print("No DATABASE_URL found, using SQLite fallback")
-            # Para desarrollo local, usar SQLite como fallback
-            import sqlite3
-            conn = sqlite3.connect('asistencia_yoga.db')
-            conn.row_factory = sqlite3.Row
-            return conn
-        
-        print(f"Connecting to PostgreSQL: {database_url[:20]}...")
-        
-        # Parsear la URL de PostgreSQL
-        result = urlparse(database_url)
-        
-        conn = psycopg2.connect(
-            database=result.path[1:],  # Remover el '/' inicial
-            user=result.username,
-            password=result.password,
-            host=result.hostname,
-            port=result.port
-        )
-        
-        # Configurar para que las consultas devuelvan diccionarios
-        conn.autocommit = True
-        print("Successfully connected to PostgreSQL")
-        return conn
-        
-    except Exception as e:
-        print(f"Error conectando a PostgreSQL: {str(e)}")
-        print("Falling back to SQLite")
-        # Fallback a SQLite para desarrollo local
-        import sqlite3
-        conn = sqlite3.connect('asistencia_yoga.db')
-        conn.row_factory = sqlite3.Row
-        return conn
-
-def init_db():
-    """Inicializar la base de datos"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Crear tabla de alumnos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alumnos (
-                id SERIAL PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                apellido VARCHAR(100) NOT NULL,
-                telefono VARCHAR(20),
-                fecha_registro DATE DEFAULT CURRENT_DATE
-            )
-        ''')
-        
-        # Crear tabla de asistencias
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS asistencias (
-                id SERIAL PRIMARY KEY,
-                alumno_id INTEGER,
-                fecha DATE NOT NULL,
-                presente BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (alumno_id) REFERENCES alumnos (id)
-            )
-        ''')
-        
-        conn.commit()
-        print("Base de datos inicializada correctamente")
-        
-    except Exception as e:
-        print(f"Error inicializando base de datos: {str(e)}")
-        # Si es PostgreSQL, usar sintaxis correcta
-        if 'psycopg2' in str(type(conn)):
-            try:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS alumnos (
-                        id SERIAL PRIMARY KEY,
-                        nombre VARCHAR(100) NOT NULL,
-                        apellido VARCHAR(100) NOT NULL,
-                        telefono VARCHAR(20),
-                        fecha_registro DATE DEFAULT CURRENT_DATE
-                    )
-                ''')
-                
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS asistencias (
-                        id SERIAL PRIMARY KEY,
-                        alumno_id INTEGER,
-                        fecha DATE NOT NULL,
-                        presente BOOLEAN DEFAULT FALSE,
-                        FOREIGN KEY (alumno_id) REFERENCES alumnos (id)
-                    )
-                ''')
-                
-                conn.commit()
-                print("Base de datos PostgreSQL inicializada correctamente")
-            except Exception as e2:
-                print(f"Error con PostgreSQL: {str(e2)}")
-    finally:
-        cursor.close()
-        conn.close()
-
-def execute_query(query, params=None, fetch=False):
-    """Ejecutar consulta de forma segura"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        if fetch:
-            if 'psycopg2' in str(type(conn)):
-                # Para PostgreSQL, devolver diccionarios
-                columns = [desc[0] for desc in cursor.description]
-                results = cursor.fetchall()
-                return [dict(zip(columns, row)) for row in results]
-            else:
-                # Para SQLite, ya devuelve diccionarios
-                return cursor.fetchall()
-        else:
-            conn.commit()
-            return True
-            
-    except Exception as e:
-        print(f"Error ejecutando consulta: {str(e)}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
-
-@app.route('/')
-def index():
-    """Página principal"""
-    return render_template('index.html')
-
-@app.route('/alumnos')
-def ver_alumnos():
-    """Ver lista de alumnos"""
-    try:
-        # Asegurar que la base de datos esté inicializada
-        init_db()
-        
-        alumnos = execute_query('''
-            SELECT * FROM alumnos ORDER BY apellido, nombre
-        ''', fetch=True)
-        
-        if not alumnos:
-            return render_template('alumnos.html', alumnos=[], registrados_hoy=0)
-        
-        # Contar alumnos registrados hoy
-        hoy = date.today().strftime('%Y-%m-%d')
-        registrados_hoy = len([alumno for alumno in alumnos if alumno['fecha_registro'] == hoy])
-        
-        return render_template('alumnos.html', alumnos=alumnos, registrados_hoy=registrados_hoy)
-    except Exception as e:
-        print(f"Error en ver_alumnos: {str(e)}")
-        return f"Error: {str(e)}", 500
-
-@app.route('/registrar_alumno', methods=['GET', 'POST'])
-def registrar_alumno():
-    """Registrar nuevo alumno"""
-    if request.method == 'POST':
-        nombre = request.form['nombre'].strip()
-        apellido = request.form['apellido'].strip()
-        telefono = request.form['telefono'].strip()
-        
-        if not nombre or not apellido:
-            return jsonify({'success': False, 'message': 'Nombre y apellido son obligatorios'})
-        
-        try:
-            # Asegurar que la base de datos esté inicializada
-            init_db()
-            
-            result = execute_query('''
-                INSERT INTO alumnos (nombre, apellido, telefono)
-                VALUES (%s, %s, %s)
-            ''', (nombre, apellido, telefono))
-            
-            if result:
-                return jsonify({'success': True, 'message': 'Alumno registrado correctamente'})
-            else:
-                return jsonify({'success': False, 'message': 'Error al registrar alumno'})
-                
-        except Exception as e:
-            return jsonify({'success': False, 'message': f'Error al registrar: {str(e)}'})
-    
-    return render_template('registrar_alumno.html')
-
-@app.route('/asistencia')
-def marcar_asistencia():
-    """Página para marcar asistencia"""
-    try:
-        init_db()
-        
-        alumnos = execute_query('''
-            SELECT a.id, a.nombre, a.apellido, 
-                   COALESCE(ast.presente, NULL) as presente
-            FROM alumnos a
-            LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = %s
-            ORDER BY a.apellido, a.nombre
-        ''', (date.today(),), fetch=True)
-        
-        return render_template('asistencia.html', alumnos=alumnos, fecha_hoy=date.today().strftime("%d/%m/%Y"))
-    except Exception as e:
-        print(f"Error en marcar_asistencia: {str(e)}")
-        return f"Error: {str(e)}", 500
-
-@app.route('/toggle_asistencia', methods=['POST'])
-def toggle_asistencia():
-    """Cambiar estado de asistencia de un alumno"""
-    data = request.get_json()
-    alumno_id = data['alumno_id']
-    presente = data['presente']
-    
-    try:
-        init_db()
-        
-        result = execute_query('''
-            INSERT INTO asistencias (alumno_id, fecha, presente)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (alumno_id, fecha) 
-            DO UPDATE SET presente = EXCLUDED.presente
-        ''', (alumno_id, date.today(), presente))
-        
-        if result:
-            return jsonify({'success': True})
-        else:
-            return jsonify({'success': False, 'message': 'Error al actualizar asistencia'})
-            
-    except Exception as e:
-        print(f"Error en toggle_asistencia: {str(e)}")
-        return jsonify({'success': False, 'message': str(e)})
-
-@app.route('/asistencias_hoy')
-def ver_asistencias_hoy():
-    """Ver asistencias del día actual"""
-    try:
-        init_db()
-        
-        asistencias = execute_query('''
-            SELECT a.nombre, a.apellido, 
-                   CASE 
-                       WHEN ast.presente = TRUE THEN 'Presente'
-                       WHEN ast.presente = FALSE THEN 'Ausente'
-                       ELSE 'Sin marcar'
-                   END as estado
-            FROM alumnos a
-            LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = %s
-            ORDER BY a.apellido, a.nombre
-        ''', (date.today(),), fetch=True)
-        
-        return render_template('asistencias_hoy.html', asistencias=asistencias, fecha_hoy=date.today().strftime("%d/%m/%Y"))
-    except Exception as e:
-        print(f"Error en ver_asistencias_hoy: {str(e)}")
-        return f"Error: {str(e)}", 500
-
-if __name__ == '__main__':
-    init_db()
-    
-    # Obtener puerto del entorno (para Railway) o usar 5000 por defecto
-    port = int(os.environ.get('PORT', 5000))
-    
-    print("=" * 50)
-    print("Sistema de Asistencia Yoga - Versión Web con PostgreSQL")
-    print("=" * 50)
-    print(f"Servidor ejecutándose en puerto: {port}")
-    print("=" * 50)
-    
-    # Ejecutar en modo debug para desarrollo local, producción para Railway
-    debug_mode = os.environ.get('FLASK_ENV') != 'production'
-    app.run(host='0.0.0.0', port=port, debug=debug_mode)
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Asistencia para Clases de Yoga - Versión Web con PostgreSQL
+
+Importar este módulo no toca la base: create_app() prepara la aplicación
+(esquema, particiones y plantillas) y calentar() abre el pool del
+proceso. gunicorn.conf.py arranca con 'app:create_app()' y --preload,
+así que lo primero se hace una sola vez en el proceso maestro y lo
+segundo en cada worker antes de su primer pedido.
+"""
+
+from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, Response
+from markupsafe import Markup
+from datetime import datetime, date, timedelta
+import base64
+import click
+import hashlib
+import json
+import os
+import time
+
+import asistencia_mensual
+import basedatos
+import cache
+import consultas_lentas
+import db_pool
+import estaticos
+import eventos
+import exportar
+import historial
+import importar
+import metricas
+import migraciones
+import particiones
+import sincronizar
+from alumnos import ROSTER_DEL_DIA, crear_alumno, validar_alumno
+
+app = Flask(__name__)
+metricas.instalar(app)
+estaticos.instalar(app)
+
+# Cookie que marca a un navegador que acaba de escribir: sus lecturas van
+# al primario mientras dure, así ve lo que guardó aunque la réplica atrase
+COOKIE_ESCRITURA = 'escribio'
+LECTURA_PROPIA = db_pool._env_num('DB_LECTURA_PROPIA', 5.0)
+
+@app.before_request
+def elegir_destino_lecturas():
+    db_pool.leer_del_primario(request.method not in ('GET', 'HEAD')
+                              or COOKIE_ESCRITURA in request.cookies)
+
+@app.after_request
+def recordar_escritura(response):
+    if db_pool.escribio() and db_pool.get_replica() is not None:
+        response.set_cookie(COOKIE_ESCRITURA, '1', max_age=max(1, int(LECTURA_PROPIA)),
+                            httponly=True, samesite='Lax')
+    return response
+
+@app.errorhandler(db_pool.PoolAgotadoError)
+def base_ocupada(error):
+    """Sin conexión o sin turno de escritura a tiempo: 503 para que el cliente reintente"""
+    print(f"Base ocupada: {error}")
+    return jsonify({'success': False, 'message': 'Base de datos ocupada, reintentar'}), 503, {'Retry-After': '5'}
+
+def get_db_connection():
+    """Conectar a la base de datos PostgreSQL o SQLite
+
+    Devuelve un context manager que presta una conexión del pool del proceso
+    y la devuelve al salir del bloque `with`.
+    """
+    return db_pool.conexion()
+
+def execute_query(query, params=None, fetch=False):
+    """Ejecutar consulta de forma segura
+
+    La consulta (texto con marcadores %s o una basedatos.Sentencia) se
+    adapta al motor del pool; devuelve las filas (basedatos.Fila, las
+    mismas en SQLite y PostgreSQL) si fetch, True si no, o None si falla.
+    Con fetch la consulta es de solo lectura y, si hay
+    DATABASE_URL_REPLICA, puede ir a la réplica.
+    """
+    try:
+        if fetch:
+            return basedatos.consultar(query, params, lectura=True)
+        basedatos.ejecutar(query, params)
+        return True
+    except Exception as e:
+        print(f"Error ejecutando consulta: {str(e)}")
+        return None
+
+# Estado del arranque del proceso, para /readyz sin consultar la base
+_arranque = {'preparada': False, 'pid_calentado': None, 'version_esquema': None, 'segundos': None}
+
+def create_app():
+    """Preparar la aplicación (una vez por proceso) y devolverla
+
+    Migra el esquema (salvo MIGRAR_AL_INICIAR=0), crea las particiones
+    que falten y compila todas las plantillas. Con gunicorn --preload
+    corre en el maestro antes de crear los workers, que la heredan hecha;
+    sin preload la corre cada worker al arrancar (hook post_fork).
+    """
+    if _arranque['preparada']:
+        return app
+    inicio = time.perf_counter()
+    if os.environ.get('MIGRAR_AL_INICIAR', '1') == '1':
+        migraciones.migrar()
+        particiones.asegurar()
+    _arranque['version_esquema'] = migraciones.version_actual()
+    for nombre in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nombre)
+    _arranque['segundos'] = round(time.perf_counter() - inicio, 3)
+    _arranque['preparada'] = True
+    return app
+
+def calentar():
+    """Abrir el pool de este proceso antes del primer pedido (en cada worker)
+
+    Con PostgreSQL arranca también la escucha de avisos, que mantiene la
+    cache de este worker al día con lo que escriben los demás.
+    """
+    db_pool.calentar()
+    eventos.asegurar_escucha()
+    _arranque['pid_calentado'] = os.getpid()
+
+@app.route('/healthz')
+def healthz():
+    """El proceso responde (no consulta la base)"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """El proceso ya está listo para atender pedidos (no consulta la base)
+
+    Listo es: create_app() terminó y este worker ya abrió su pool. Si no,
+    503 para que la plataforma no le mande tráfico todavía.
+    """
+    if not _arranque['preparada'] or _arranque['pid_calentado'] != os.getpid():
+        return jsonify({'status': 'iniciando', 'pid': os.getpid()}), 503
+    return jsonify({
+        'status': 'listo',
+        'pid': os.getpid(),
+        'version_esquema': _arranque['version_esquema'],
+        'segundos_preparacion': _arranque['segundos'],
+    })
+
+@app.cli.command('migrar')
+def migrar_command():
+    """Aplicar las migraciones pendientes del esquema"""
+    migraciones.migrar()
+    particiones.asegurar()
+    print(f"Esquema en versión {migraciones.version_actual()}")
+
+@app.cli.command('reconstruir-mensual')
+def reconstruir_mensual_command():
+    """Recalcular el acumulado mensual de asistencia desde cero"""
+    print(f"Acumulado mensual reconstruido: {asistencia_mensual.reconstruir()} filas")
+
+@app.cli.command('archivar-asistencias')
+@click.argument('hasta')
+def archivar_asistencias_command(hasta):
+    """Archivar las particiones de asistencias hasta el mes HASTA (AAAA-MM) inclusive"""
+    try:
+        mes = datetime.strptime(hasta, '%Y-%m').date()
+        particiones.archivar(mes)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='HASTA')
+    print(f"Particiones de asistencias: {', '.join(particiones.listar())}")
+
+@app.route('/')
+def index():
+    """Página principal"""
+    return render_template('index.html')
+
+@app.route('/metrics')
+def metrics():
+    """Métricas del proceso en formato Prometheus"""
+    texto = metricas.exponer(db_pool.stats(), cache.roster.stats(), eventos.stats())
+    return Response(texto, mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/consultas_lentas')
+def ver_consultas_lentas():
+    """Consultas que superaron CONSULTAS_LENTAS_MS, con su plan si se capturó"""
+    entradas = consultas_lentas.entradas()
+    datos = consultas_lentas.stats()
+    if request.args.get('formato') == 'json':
+        return jsonify({'stats': datos, 'consultas': entradas})
+    return render_template('consultas_lentas.html', consultas=entradas, stats=datos)
+
+@app.route('/admin/consultas_lentas/limpiar', methods=['POST'])
+def limpiar_consultas_lentas():
+    consultas_lentas.limpiar()
+    return redirect(url_for('ver_consultas_lentas'))
+
+@app.route('/pool_stats')
+def pool_stats():
+    """Contadores del pool de conexiones (para dimensionarlo según los workers)"""
+    return jsonify(db_pool.stats())
+
+@app.route('/cache_stats')
+def cache_stats():
+    """Aciertos y fallos de la cache del roster (y de las tarjetas de asistencia)"""
+    return jsonify(dict(cache.roster.stats(), tarjetas=cache.tarjetas.stats()))
+
+def _version_plantillas():
+    """Huella de las plantillas y los estáticos: un deploy que cambia el HTML cambia los ETag"""
+    huella = hashlib.blake2b(digest_size=6)
+    huella.update(estaticos.version().encode())
+    carpeta = os.path.join(app.root_path, 'templates')
+    for nombre in sorted(os.listdir(carpeta)):
+        with open(os.path.join(carpeta, nombre), 'rb') as f:
+            huella.update(f.read())
+    return huella.hexdigest()
+
+VERSION_PLANTILLAS = _version_plantillas()
+
+def respuesta_condicional(entrada, renderizar):
+    """Responder 304 si el cliente ya tiene esta versión de los datos
+
+    Si no, devuelve renderizar() con ETag y Last-Modified. Sin entrada (error
+    al consultar) se renderiza sin validadores.
+    """
+    if entrada is None:
+        return renderizar()
+    
+    etag = f'{entrada.etag}-{VERSION_PLANTILLAS}'
+    if request.if_none_match:
+        no_modificado = request.if_none_match.contains_weak(etag)
+    else:
+        no_modificado = bool(request.if_modified_since) and entrada.modificado <= request.if_modified_since
+    
+    respuesta = Response(status=304) if no_modificado else make_response(renderizar())
+    respuesta.set_etag(etag)
+    respuesta.last_modified = entrada.modificado
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+# Alumnos por página en /alumnos
+ALUMNOS_POR_PAGINA = 50
+MAX_ALUMNOS_POR_PAGINA = 200
+
+def _codificar_cursor(alumno):
+    """Cursor opaco con la clave de orden (apellido, nombre, id) de un alumno"""
+    clave = json.dumps([alumno['apellido'], alumno['nombre'], alumno['id']])
+    return base64.urlsafe_b64encode(clave.encode('utf-8')).decode('ascii')
+
+def _decodificar_cursor(cursor):
+    apellido, nombre, alumno_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return str(apellido), str(nombre), int(alumno_id)
+
+def _condicion_busqueda(q):
+    """Filtro por prefijo de nombre, apellido o teléfono (cada palabra debe coincidir)
+
+    Devuelve (sql, params). Las condiciones están escritas para usar los
+    índices de prefijo de la migración 5.
+    """
+    postgresql = basedatos.dialecto() == 'postgresql'
+    condiciones = []
+    params = []
+    for palabra in q.split():
+        patron = palabra.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        if postgresql:
+            patron = patron.lower()
+            condiciones.append('''(lower(apellido) LIKE %s ESCAPE '\\'
+                                 OR lower(nombre) LIKE %s ESCAPE '\\'
+                                 OR telefono LIKE %s ESCAPE '\\')''')
+        else:
+            condiciones.append('''(apellido LIKE %s ESCAPE '\\'
+                                 OR nombre LIKE %s ESCAPE '\\'
+                                 OR telefono LIKE %s ESCAPE '\\')''')
+        params.extend([patron, patron, patron])
+    return ' AND '.join(condiciones), params
+
+@app.route('/alumnos')
+def ver_alumnos():
+    """Ver lista de alumnos
+
+    Paginada por keyset sobre (apellido, nombre, id): ?despues=<cursor> avanza,
+    ?antes=<cursor> retrocede. ?q= filtra por nombre, apellido o teléfono.
+    """
+    q = request.args.get('q', '').strip()
+    try:
+        por_pagina = min(max(int(request.args.get('por_pagina', ALUMNOS_POR_PAGINA)), 1), MAX_ALUMNOS_POR_PAGINA)
+    except ValueError:
+        por_pagina = ALUMNOS_POR_PAGINA
+    
+    try:
+        despues = _decodificar_cursor(request.args['despues']) if request.args.get('despues') else None
+        antes = _decodificar_cursor(request.args['antes']) if request.args.get('antes') else None
+    except (ValueError, TypeError):
+        return "Error: cursor de paginación inválido", 400
+    
+    try:
+        clave = ('alumnos', q, despues, antes, por_pagina, date.today().isoformat())
+        entrada = cache.roster.obtener_o_calcular(
+            clave, lambda: consultar_alumnos(q, despues, antes, por_pagina))
+        if entrada is None:
+            return "Error: no se pudo consultar la lista de alumnos", 500
+        
+        return respuesta_condicional(entrada, lambda: render_template('alumnos.html', **entrada.valor))
+    except Exception as e:
+        print(f"Error en ver_alumnos: {str(e)}")
+        return f"Error: {str(e)}", 500
+
+def consultar_alumnos(q, despues, antes, por_pagina):
+    """Una página de alumnos más los totales; None si falla la consulta"""
+    condiciones = []
+    params = []
+    if q:
+        sql_busqueda, params_busqueda = _condicion_busqueda(q)
+        condiciones.append(sql_busqueda)
+        params.extend(params_busqueda)
+    if despues:
+        condiciones.append('(apellido, nombre, id) > (%s, %s, %s)')
+        params.extend(despues)
+    elif antes:
+        condiciones.append('(apellido, nombre, id) < (%s, %s, %s)')
+        params.extend(antes)
+    
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+    orden = 'DESC' if antes and not despues else 'ASC'
+    
+    # Se pide una fila de más para saber si hay otra página
+    alumnos = execute_query(f'''
+        SELECT id, nombre, apellido, telefono, fecha_registro
+        FROM alumnos
+        {where}
+        ORDER BY apellido {orden}, nombre {orden}, id {orden}
+        LIMIT %s
+    ''', params + [por_pagina + 1], fetch=True)
+    if alumnos is None:
+        return None
+    
+    hay_mas = len(alumnos) > por_pagina
+    alumnos = alumnos[:por_pagina]
+    if orden == 'DESC':
+        alumnos.reverse()
+    
+    paginacion = {
+        'q': q,
+        'por_pagina': por_pagina,
+        'siguiente': None,
+        'anterior': None,
+    }
+    if alumnos:
+        if hay_mas or orden == 'DESC':
+            paginacion['siguiente'] = _codificar_cursor(alumnos[-1])
+        if (hay_mas and orden == 'DESC') or despues:
+            paginacion['anterior'] = _codificar_cursor(alumnos[0])
+    
+    # Totales con COUNT indexados, sin recorrer la lista en Python
+    totales = execute_query('''
+        SELECT (SELECT COUNT(*) FROM alumnos) AS total,
+               (SELECT COUNT(*) FROM alumnos WHERE fecha_registro = %s) AS registrados_hoy
+    ''', (date.today(),), fetch=True)
+    if not totales:
+        return None
+    
+    return {
+        'alumnos': alumnos,
+        'total': totales[0]['total'],
+        'registrados_hoy': totales[0]['registrados_hoy'],
+        'paginacion': paginacion,
+    }
+
+@app.route('/registrar_alumno', methods=['GET', 'POST'])
+def registrar_alumno():
+    """Registrar nuevo alumno"""
+    if request.method == 'POST':
+        datos, error = validar_alumno(request.form['nombre'], request.form['apellido'],
+                                      request.form['telefono'])
+        if error:
+            return jsonify({'success': False, 'message': error})
+        nombre, apellido, telefono = datos
+        
+        try:
+            crear_alumno(nombre, apellido, telefono)
+        except Exception as e:
+            print(f"Error registrando alumno: {str(e)}")
+            return jsonify({'success': False, 'message': f'Error al registrar: {str(e)}'})
+        
+        cache.roster.invalidar()
+        return jsonify({'success': True, 'message': 'Alumno registrado correctamente'})
+    
+    return render_template('registrar_alumno.html')
+
+# Tamaño máximo del CSV de importación (en bytes)
+MAX_IMPORTACION = 5 * 1024 * 1024
+
+@app.route('/importar_alumnos', methods=['GET', 'POST'])
+def importar_alumnos():
+    """Importar alumnos en bloque desde un CSV (nombre, apellido, telefono)"""
+    if request.method == 'POST':
+        if request.content_length and request.content_length > MAX_IMPORTACION:
+            return jsonify({'success': False,
+                            'message': f'El archivo supera los {MAX_IMPORTACION // (1024 * 1024)} MB'}), 413
+
+        archivo = request.files.get('archivo')
+        if archivo is None or not archivo.filename:
+            return jsonify({'success': False, 'message': 'Selecciona un archivo CSV'}), 400
+
+        try:
+            resultado = importar.importar_alumnos(archivo.read())
+        except importar.ArchivoInvalidoError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            print(f"Error importando alumnos: {e}")
+            return jsonify({'success': False, 'message': f'Error al importar: {str(e)}'}), 500
+
+        if resultado['importadas']:
+            cache.roster.invalidar()
+        print(f"Importación de alumnos: {resultado['importadas']} nuevos, "
+              f"{resultado['duplicadas']} duplicados, {resultado['invalidas']} inválidos "
+              f"en {resultado['segundos']}s")
+
+        resultado.update({
+            'success': True,
+            'message': f"{resultado['importadas']} alumnos importados",
+        })
+        return jsonify(resultado)
+
+    return render_template('importar_alumnos.html', max_mb=MAX_IMPORTACION // (1024 * 1024))
+
+# Consultas de cada pedido del día: se preparan una vez por conexión
+# (ROSTER_DEL_DIA está en alumnos, la comparte la versión de escritorio)
+ASISTENCIAS_DEL_DIA = basedatos.Sentencia('asistencias_del_dia', '''
+    SELECT a.nombre, a.apellido,
+           CASE
+               WHEN ast.presente = TRUE THEN 'Presente'
+               WHEN ast.presente = FALSE THEN 'Ausente'
+               ELSE 'Sin marcar'
+           END as estado
+    FROM alumnos a
+    LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = %s
+    ORDER BY a.apellido, a.nombre
+''')
+
+RESUMEN_DEL_DIA = basedatos.Sentencia('resumen_del_dia', '''
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(CASE WHEN ast.presente = TRUE THEN 1 ELSE 0 END), 0) AS presentes,
+           COALESCE(SUM(CASE WHEN ast.presente = FALSE THEN 1 ELSE 0 END), 0) AS ausentes,
+           COALESCE(SUM(CASE WHEN ast.presente IS NULL THEN 1 ELSE 0 END), 0) AS sin_marcar,
+           COALESCE(ROUND(100.0 * SUM(CASE WHEN ast.presente = TRUE THEN 1 ELSE 0 END)
+                          / NULLIF(COUNT(*), 0), 1), 0) AS porcentaje
+    FROM alumnos a
+    LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = %s
+''')
+
+def roster_del_dia(fecha):
+    """Alumnos con su asistencia de la fecha (entrada de cache o None si falla)"""
+    return cache.roster.obtener_o_calcular(
+        ('asistencia', fecha.isoformat()), lambda: execute_query(ROSTER_DEL_DIA, (fecha,), fetch=True))
+
+def _estado(presente):
+    """True, False o None (sin marcar), igual en SQLite y PostgreSQL"""
+    return None if presente is None else bool(presente)
+
+def tarjeta_asistencia(alumno):
+    """HTML de la tarjeta de un alumno, cacheado por alumno y estado"""
+    clave = (alumno.id, alumno.nombre, alumno.apellido, _estado(alumno.presente))
+    return cache.tarjetas.obtener_o_renderizar(
+        clave, lambda: app.jinja_env.get_template('_tarjeta_asistencia.html').render(alumno=alumno))
+
+def version_roster(entrada):
+    """Estados por alumno y contadores de una versión (ETag) del roster del día
+
+    Se guardan en cache.versiones para que /asistencia/cambios pueda
+    comparar contra lo que tiene el cliente.
+    """
+    def calcular():
+        estados = {alumno.id: _estado(alumno.presente) for alumno in entrada.valor}
+        valores = list(estados.values())
+        return {
+            'estados': estados,
+            'contadores': {
+                'presentes': valores.count(True),
+                'ausentes': valores.count(False),
+                'sin_marcar': valores.count(None),
+            },
+        }
+    
+    return cache.versiones.obtener_o_calcular(('version', entrada.etag), calcular).valor
+
+@app.route('/asistencia')
+def marcar_asistencia():
+    """Página para marcar asistencia
+
+    Las tarjetas se arman con los fragmentos cacheados: después de un
+    cambio solo se vuelven a renderizar las de los alumnos que cambiaron.
+    """
+    try:
+        entrada = roster_del_dia(date.today())
+        
+        def renderizar():
+            alumnos = entrada.valor if entrada else None
+            if not alumnos:
+                return render_template('asistencia.html', alumnos=None,
+                                       fecha_hoy=date.today().strftime("%d/%m/%Y"))
+            return render_template(
+                'asistencia.html', alumnos=alumnos,
+                tarjetas=Markup(''.join(tarjeta_asistencia(alumno) for alumno in alumnos)),
+                contadores=version_roster(entrada)['contadores'], version=entrada.etag,
+                fecha=date.today().isoformat(), fecha_hoy=date.today().strftime("%d/%m/%Y"))
+        
+        return respuesta_condicional(entrada, renderizar)
+    except Exception as e:
+        print(f"Error en marcar_asistencia: {str(e)}")
+        return f"Error: {str(e)}", 500
+
+@app.route('/asistencia/cambios')
+def cambios_asistencia():
+    """Tarjetas que cambiaron desde la versión que tiene el cliente, y los contadores
+
+    ?version= es la que vino con la página (o con la respuesta anterior).
+    Si este proceso ya no la recuerda se mandan todas las tarjetas
+    (completo=true) y el cliente las reemplaza igual, una por una.
+    """
+    entrada = roster_del_dia(date.today())
+    if entrada is None:
+        return jsonify({'success': False, 'message': 'Error al consultar la asistencia'}), 500
+    
+    actual = version_roster(entrada)
+    version = request.args.get('version', '')
+    anterior = None
+    if version != entrada.etag and version:
+        anterior = cache.versiones.obtener(('version', version))
+    
+    completo = False
+    if version == entrada.etag:
+        cambiados = []
+    elif anterior is None:
+        cambiados = entrada.valor
+        completo = True
+    else:
+        previos = anterior.valor['estados']
+        cambiados = [alumno for alumno in entrada.valor
+                     if previos.get(alumno.id, 'nuevo') != _estado(alumno.presente)]
+    
+    return jsonify({
+        'success': True,
+        'version': entrada.etag,
+        'completo': completo,
+        'tarjetas': [{'alumno_id': alumno.id, 'estado': _estado(alumno.presente),
+                      'html': tarjeta_asistencia(alumno)} for alumno in cambiados],
+        'contadores': actual['contadores'],
+    })
+
+@app.route('/asistencia/eventos')
+def eventos_asistencia():
+    """Stream (Server-Sent Events) con los cambios de asistencia de todos los dispositivos
+
+    Cada evento trae {"fecha": "YYYY-MM-DD", "cambios": [[alumno_id, presente], ...]}.
+    Con el proceso lleno de streams responde 503 y el cliente sigue
+    poniéndose al día con /asistencia/cambios.
+    """
+    cola = eventos.suscribir()
+    if cola is None:
+        return Response('Demasiados streams abiertos', status=503, headers={'Retry-After': '30'})
+    return Response(eventos.stream(cola), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/toggle_asistencia', methods=['POST'])
+def toggle_asistencia():
+    """Cambiar estado de asistencia de un alumno"""
+    data = request.get_json()
+    alumno_id = int(data['alumno_id'])
+    presente = bool(data['presente'])
+    
+    try:
+        with db_pool.transaccion() as conn:
+            guardados = asistencia_mensual.guardar_asistencias(conn, [(alumno_id, date.today(), presente)])
+        
+        if guardados:
+            cache.roster.invalidar('asistencia', 'asistencias_hoy', 'resumen')
+            return jsonify({'success': True})
+        else:
+            return jsonify({'success': False, 'message': 'Alumno inexistente'})
+            
+    except db_pool.PoolAgotadoError:
+        raise
+    except Exception as e:
+        print(f"Error en toggle_asistencia: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error al actualizar asistencia'})
+
+# Máximo de cambios aceptados en un solo POST a /asistencia/batch
+MAX_BATCH_ASISTENCIA = 500
+
+@app.route('/asistencia/batch', methods=['POST'])
+def batch_asistencia():
+    """Aplicar varios cambios de asistencia en una sola transacción
+
+    Recibe {"cambios": [{"alumno_id": 1, "presente": 1}, ...]} y devuelve el
+    resultado de cada cambio. Si un alumno aparece varias veces, vale el último.
+    """
+    data = request.get_json(silent=True) or {}
+    cambios = data.get('cambios')
+    
+    if not isinstance(cambios, list) or not cambios:
+        return jsonify({'success': False, 'message': 'Se esperaba una lista de cambios'}), 400
+    if len(cambios) > MAX_BATCH_ASISTENCIA:
+        return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_ASISTENCIA} cambios por envío'}), 400
+    
+    invalidos = []
+    validos = {}
+    for cambio in cambios:
+        try:
+            alumno_id = int(cambio['alumno_id'])
+            presente = bool(int(cambio['presente']))
+        except (KeyError, TypeError, ValueError):
+            alumno_id = cambio.get('alumno_id') if isinstance(cambio, dict) else None
+            invalidos.append({'alumno_id': alumno_id, 'success': False, 'message': 'Cambio inválido'})
+            continue
+        # Si el alumno se repite, vale el último cambio
+        validos.pop(alumno_id, None)
+        validos[alumno_id] = presente
+    
+    if not validos:
+        return jsonify({'success': False, 'resultados': invalidos, 'aplicados': 0})
+    
+    hoy = date.today()
+    
+    try:
+        with db_pool.transaccion() as conn:
+            guardados = asistencia_mensual.guardar_asistencias(
+                conn, [(alumno_id, hoy, presente) for alumno_id, presente in validos.items()])
+        
+        resultados = list(invalidos)
+        for alumno_id in validos:
+            if alumno_id in guardados:
+                resultados.append({'alumno_id': alumno_id, 'success': True})
+            else:
+                resultados.append({'alumno_id': alumno_id, 'success': False, 'message': 'Alumno inexistente'})
+    except db_pool.PoolAgotadoError:
+        raise
+    except Exception as e:
+        print(f"Error en batch_asistencia: {str(e)}")
+        fallidos = [{'alumno_id': alumno_id, 'success': False, 'message': 'Error al actualizar asistencia'}
+                    for alumno_id in validos]
+        return jsonify({'success': False, 'resultados': invalidos + fallidos, 'aplicados': 0})
+    
+    if guardados:
+        cache.roster.invalidar('asistencia', 'asistencias_hoy', 'resumen')
+    
+    return jsonify({
+        'success': all(r['success'] for r in resultados),
+        'resultados': resultados,
+        'aplicados': len(guardados),
+    })
+
+# Cambios por página en /api/changes
+CAMBIOS_POR_PAGINA = 500
+MAX_CAMBIOS_POR_PAGINA = 1000
+
+@app.route('/api/changes')
+def api_cambios():
+    """Cambios de asistencia y altas de alumnos posteriores a ?since=<cursor>, en orden
+
+    Sin since devuelve solo el cursor actual: el cliente lo pide antes de
+    su carga completa y desde ahí sigue con since. Si hay_mas es true se
+    vuelve a pedir enseguida con el cursor recibido (?limit= ajusta la
+    página, hasta MAX_CAMBIOS_POR_PAGINA). El cursor es un texto opaco
+    (ver historial).
+    """
+    try:
+        limite = min(max(int(request.args.get('limit', CAMBIOS_POR_PAGINA)), 1), MAX_CAMBIOS_POR_PAGINA)
+        desde = historial.leer_cursor(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since debe ser un cursor de /api/changes y limit un entero'}), 400
+    
+    try:
+        if desde is None:
+            return jsonify({'success': True, 'cambios': [], 'cursor': historial.ultimo(), 'hay_mas': False})
+        cambios, cursor, hay_mas = historial.listar(desde, limite)
+    except Exception as e:
+        print(f"Error en api_cambios: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error al consultar los cambios'}), 500
+    
+    return jsonify({
+        'success': True,
+        'cambios': cambios,
+        'cursor': cursor,
+        'hay_mas': hay_mas,
+    })
+
+@app.route('/api/roster')
+def api_roster():
+    """Todos los alumnos con su asistencia de ?fecha= (hoy) y el cursor de /api/changes
+
+    Es la carga completa con la que arranca un cliente que sincroniza: el
+    cursor se toma antes de leer, así que lo que cambie mientras tanto
+    llega después por /api/changes.
+    """
+    try:
+        fecha = date.fromisoformat(request.args['fecha']) if request.args.get('fecha') else date.today()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'fecha debe tener el formato AAAA-MM-DD'}), 400
+    
+    try:
+        # Del primario, como el cursor: una réplica atrasada haría que el
+        # cliente se pierda lo que pasó entre su estado y el cursor
+        cursor = historial.ultimo()
+        alumnos = basedatos.consultar('''
+            SELECT a.id, a.nombre, a.apellido, a.telefono, ast.presente
+            FROM alumnos a
+            LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = %s
+            ORDER BY a.id
+        ''', (fecha,))
+    except Exception as e:
+        print(f"Error en api_roster: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error al consultar los alumnos'}), 500
+    
+    return jsonify({
+        'success': True,
+        'alumnos': [{'id': a.id, 'nombre': a.nombre, 'apellido': a.apellido, 'telefono': a.telefono or '',
+                     'presente': None if a.presente is None else bool(a.presente)} for a in alumnos],
+        'cursor': cursor,
+    })
+
+@app.route('/api/sync', methods=['POST'])
+def api_sync():
+    """Recibir un lote de la versión de escritorio (ver sincronizar.recibir)
+
+    El cuerpo es JSON, comprimido con gzip si trae Content-Encoding: gzip.
+    """
+    if request.content_length and request.content_length > sincronizar.MAX_BYTES:
+        return jsonify({'success': False, 'message': 'Lote demasiado grande'}), 413
+    try:
+        datos = sincronizar.leer_lote(request.get_data(), request.headers.get('Content-Encoding'))
+        resultado = sincronizar.recibir(datos)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except db_pool.PoolAgotadoError:
+        raise
+    except Exception as e:
+        print(f"Error en api_sync: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error al aplicar el lote'}), 500
+    
+    if resultado['alumnos'] or resultado['aplicadas']:
+        cache.roster.invalidar('alumnos', 'asistencia', 'asistencias_hoy', 'resumen')
+    return jsonify({'success': True, **resultado})
+
+def resumen_asistencia(fecha):
+    """Contar presentes, ausentes y sin marcar de una fecha en una sola consulta
+
+    Devuelve None si la consulta falla.
+    """
+    filas = execute_query(RESUMEN_DEL_DIA, (fecha,), fetch=True)
+    
+    if not filas:
+        return None
+    
+    fila = filas[0]
+    return {
+        'total': int(fila['total']),
+        'presentes': int(fila['presentes']),
+        'ausentes': int(fila['ausentes']),
+        'sin_marcar': int(fila['sin_marcar']),
+        'porcentaje': float(fila['porcentaje']),
+    }
+
+def resumen_del_dia(fecha):
+    """resumen_asistencia() cacheado (entrada de cache o None si falla)"""
+    return cache.roster.obtener_o_calcular(('resumen', fecha.isoformat()), lambda: resumen_asistencia(fecha))
+
+@app.route('/asistencias_hoy')
+def ver_asistencias_hoy():
+    """Ver asistencias del día actual"""
+    hoy = date.today()
+    
+    def consultar():
+        asistencias = execute_query(ASISTENCIAS_DEL_DIA, (hoy,), fetch=True)
+        resumen = resumen_del_dia(hoy)
+        if asistencias is None or resumen is None:
+            return None
+        return {'asistencias': asistencias, 'resumen': resumen.valor}
+    
+    try:
+        entrada = cache.roster.obtener_o_calcular(('asistencias_hoy', hoy.isoformat()), consultar)
+        if entrada is None:
+            return "Error: no se pudieron consultar las asistencias", 500
+        
+        return respuesta_condicional(entrada, lambda: render_template(
+            'asistencias_hoy.html', **entrada.valor, fecha_hoy=hoy.strftime("%d/%m/%Y")))
+    except Exception as e:
+        print(f"Error en ver_asistencias_hoy: {str(e)}")
+        return f"Error: {str(e)}", 500
+
+@app.route('/asistencias_hoy/resumen')
+def resumen_asistencias_hoy():
+    """Resumen del día en JSON (para paneles que consultan seguido)
+
+    Acepta ?fecha=YYYY-MM-DD para consultar otro día.
+    """
+    try:
+        fecha = date.fromisoformat(request.args['fecha']) if 'fecha' in request.args else date.today()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Fecha inválida, usar YYYY-MM-DD'}), 400
+    
+    entrada = resumen_del_dia(fecha)
+    if entrada is None:
+        return jsonify({'success': False, 'message': 'Error al consultar el resumen'}), 500
+    
+    return respuesta_condicional(entrada, lambda: jsonify(dict(entrada.valor, fecha=fecha.isoformat())))
+
+def _mes_param(nombre, defecto):
+    """Leer un parámetro YYYY-MM como el primer día de ese mes"""
+    valor = request.args.get(nombre)
+    if not valor:
+        return defecto
+    return datetime.strptime(valor, '%Y-%m').date()
+
+@app.route('/reportes')
+def reporte_mensual():
+    """Asistencia de cada alumno entre dos meses (?desde=YYYY-MM&hasta=YYYY-MM)
+
+    Lee solo del acumulado mensual. Con ?formato=json devuelve JSON.
+    """
+    hoy = date.today()
+    try:
+        hasta = _mes_param('hasta', hoy.replace(day=1))
+        desde = _mes_param('desde', hasta.replace(month=1))
+    except ValueError:
+        return "Error: los meses se indican como YYYY-MM", 400
+    
+    try:
+        alumnos = asistencia_mensual.reporte_por_alumno(desde, hasta)
+        if request.args.get('formato') == 'json':
+            return jsonify({'desde': desde.strftime('%Y-%m'), 'hasta': hasta.strftime('%Y-%m'), 'alumnos': alumnos})
+        ultimo_dia = (hasta.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return render_template('reportes.html', alumnos=alumnos, desde=desde.strftime('%Y-%m'),
+                               hasta=hasta.strftime('%Y-%m'), hasta_dia=ultimo_dia.isoformat())
+    except Exception as e:
+        print(f"Error en reporte_mensual: {str(e)}")
+        return f"Error: {str(e)}", 500
+
+@app.route('/reportes/alumno/<int:alumno_id>')
+def reporte_alumno(alumno_id):
+    """Asistencia mes por mes de un alumno (por defecto, los últimos 12 meses)"""
+    hoy = date.today()
+    try:
+        hasta = _mes_param('hasta', hoy.replace(day=1))
+        anio, mes = divmod(hasta.year * 12 + hasta.month - 12, 12)
+        desde = _mes_param('desde', date(anio, mes + 1, 1))
+    except ValueError:
+        return "Error: los meses se indican como YYYY-MM", 400
+    
+    try:
+        alumno = execute_query('''
+            SELECT id, nombre, apellido FROM alumnos WHERE id = %s
+        ''', (alumno_id,), fetch=True)
+        if not alumno:
+            return "Alumno no encontrado", 404
+        
+        meses = asistencia_mensual.reporte_de_alumno(alumno_id, desde, hasta)
+        if request.args.get('formato') == 'json':
+            return jsonify({'alumno': dict(alumno[0]), 'desde': desde.strftime('%Y-%m'),
+                            'hasta': hasta.strftime('%Y-%m'), 'meses': meses})
+        return render_template('reporte_alumno.html', alumno=alumno[0], meses=meses,
+                               desde=desde.strftime('%Y-%m'), hasta=hasta.strftime('%Y-%m'))
+    except Exception as e:
+        print(f"Error en reporte_alumno: {str(e)}")
+        return f"Error: {str(e)}", 500
+
+@app.route('/exportar/asistencias')
+def exportar_asistencias():
+    """Descargar asistencias de un rango de fechas en CSV o NDJSON
+
+    Parámetros: desde, hasta (YYYY-MM-DD), alumno_id (se puede repetir) y
+    formato=csv|ndjson. La respuesta se genera a medida que se lee la base.
+    """
+    hoy = date.today()
+    try:
+        hasta = date.fromisoformat(request.args['hasta']) if request.args.get('hasta') else hoy
+        desde = date.fromisoformat(request.args['desde']) if request.args.get('desde') else hasta.replace(day=1)
+        alumnos = [int(alumno_id) for alumno_id in request.args.getlist('alumno_id')]
+    except ValueError:
+        return "Error: fechas YYYY-MM-DD y alumno_id numérico", 400
+    if any(not 1 <= alumno_id <= exportar.MAX_ALUMNO_ID for alumno_id in alumnos):
+        return "Error: alumno_id fuera de rango", 400
+    if desde > hasta:
+        return "Error: 'desde' es posterior a 'hasta'", 400
+    
+    formato = request.args.get('formato', 'csv')
+    if formato == 'csv':
+        generar, mimetype = exportar.generar_csv, 'text/csv; charset=utf-8'
+    elif formato == 'ndjson':
+        generar, mimetype = exportar.generar_ndjson, 'application/x-ndjson'
+    else:
+        return "Error: formato debe ser csv o ndjson", 400
+    
+    # La consulta corre antes de responder: si falla, 503 y no un 200 cortado
+    try:
+        filas = exportar.abrir(desde, hasta, alumnos)
+    except db_pool.PoolAgotadoError:
+        raise
+    except Exception as e:
+        print(f"Error en exportar_asistencias: {str(e)}")
+        return "Error: no se pudo leer la base de datos, reintentar", 503, {'Retry-After': '5'}
+    
+    nombre = f'asistencias_{desde.isoformat()}_{hasta.isoformat()}.{formato}'
+    return Response(generar(filas), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nombre}"'})
+
+if __name__ == '__main__':
+    # Obtener puerto del entorno (para Railway) o usar 5000 por defecto
+    port = int(os.environ.get('PORT', 5000))
+    
+    print("=" * 50)
+    print("Sistema de Asistencia Yoga - Versión Web con PostgreSQL")
+    print("=" * 50)
+    print(f"Servidor ejecutándose en puerto: {port}")
+    print("=" * 50)
+    
+    # Ejecutar en modo debug para desarrollo local, producción para Railway
+    debug_mode = os.environ.get('FLASK_ENV') != 'production'
+    create_app()
+    calentar()
+    app.run(host='0.0.0.0', port=port, debug=debug_mode)
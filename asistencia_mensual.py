@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Acumulado mensual de asistencia por alumno (tabla asistencias_mensuales)
+
+Cada fila guarda, para un alumno y un mes, cuántas clases tuvo presente,
+ausente y marcadas, y los mismos días como bits: dias_presentes y
+dias_marcados tienen prendido el bit d - 1 para el día d del mes. Se
+mantiene al escribir en asistencias (ver guardar_asistencias) y se puede
+reconstruir desde cero:
+
+    python asistencia_mensual.py
+    flask --app app reconstruir-mensual
+
+Los reportes leen solo de esta tabla: un año son 12 filas por alumno.
+Los bits alcanzan para la tasa de asistencia de los últimos N días, la
+racha actual y la última vez presente de todos los alumnos a la vez
+(indicadores), sin leer asistencias.
+"""
+
+from datetime import date, timedelta
+
+import basedatos
+import db_pool
+import eventos
+import historial
+import particiones
+
+SQL_RECONSTRUIR = {
+    'postgresql': '''
+        INSERT INTO asistencias_mensuales (alumno_id, mes, presentes, ausentes, marcadas,
+                                           dias_presentes, dias_marcados)
+        SELECT alumno_id,
+               date_trunc('month', fecha)::date,
+               SUM(CASE WHEN presente THEN 1 ELSE 0 END),
+               SUM(CASE WHEN presente THEN 0 ELSE 1 END),
+               COUNT(*),
+               SUM(CASE WHEN presente THEN 1 << (EXTRACT(DAY FROM fecha)::int - 1) ELSE 0 END),
+               SUM(1 << (EXTRACT(DAY FROM fecha)::int - 1))
+        FROM asistencias
+        WHERE presente IS NOT NULL AND alumno_id IS NOT NULL
+        GROUP BY alumno_id, date_trunc('month', fecha)
+    ''',
+    'sqlite': '''
+        INSERT INTO asistencias_mensuales (alumno_id, mes, presentes, ausentes, marcadas,
+                                           dias_presentes, dias_marcados)
+        SELECT alumno_id,
+               date(fecha, 'start of month'),
+               SUM(CASE WHEN presente THEN 1 ELSE 0 END),
+               SUM(CASE WHEN presente THEN 0 ELSE 1 END),
+               COUNT(*),
+               SUM(CASE WHEN presente THEN 1 << (CAST(strftime('%d', fecha) AS INTEGER) - 1) ELSE 0 END),
+               SUM(1 << (CAST(strftime('%d', fecha) AS INTEGER) - 1))
+        FROM asistencias
+        WHERE presente IS NOT NULL AND alumno_id IS NOT NULL
+        GROUP BY alumno_id, date(fecha, 'start of month')
+    ''',
+}
+
+
+# Sentencias del camino de toggle_asistencia (ver basedatos.Sentencia)
+BLOQUEAR_ALUMNOS = basedatos.Sentencia('bloquear_alumnos', '''
+    SELECT id FROM alumnos WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE
+''')
+
+ASISTENCIA_PREVIA = basedatos.Sentencia('asistencia_previa', '''
+    SELECT alumno_id, presente FROM asistencias
+    WHERE fecha = %s AND alumno_id = ANY(%s)
+''')
+
+# Solo PostgreSQL: en SQLite asistencias es una vista y cada fila va a la
+# tabla de su año
+GUARDAR_ASISTENCIA = basedatos.Sentencia('guardar_asistencia', basedatos.upsert(
+    'asistencias', ('alumno_id', 'fecha', 'presente'), ('alumno_id', 'fecha')))
+
+# Los bits también se suman: cada delta prende (+bit) o apaga (-bit) un
+# día cuyo estado anterior se conoce, así que nunca hay acarreo
+SUMAR_MENSUAL = basedatos.Sentencia('sumar_mensual', '''
+    INSERT INTO asistencias_mensuales (alumno_id, mes, presentes, ausentes, marcadas,
+                                       dias_presentes, dias_marcados)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (alumno_id, mes) DO UPDATE SET
+        presentes = asistencias_mensuales.presentes + EXCLUDED.presentes,
+        ausentes = asistencias_mensuales.ausentes + EXCLUDED.ausentes,
+        marcadas = asistencias_mensuales.marcadas + EXCLUDED.marcadas,
+        dias_presentes = asistencias_mensuales.dias_presentes + EXCLUDED.dias_presentes,
+        dias_marcados = asistencias_mensuales.dias_marcados + EXCLUDED.dias_marcados
+''')
+
+# El mes viaja como texto y sin ORDER BY: convertir y ordenar en Python los
+# pocos meses distintos es más barato que hacerlo por fila en la base
+BITS_POR_ALUMNO = basedatos.Sentencia('bits_por_alumno', '''
+    SELECT alumno_id, CAST(mes AS TEXT) AS mes, dias_presentes, dias_marcados
+    FROM asistencias_mensuales
+    WHERE mes <= %s
+''')
+
+
+def guardar_asistencias(conn, filas):
+    """Upsert de asistencias (alumno_id, fecha, presente) y de su acumulado mensual
+
+    Debe llamarse dentro de db_pool.transaccion(). Los alumnos inexistentes
+    se ignoran; devuelve el conjunto de alumno_id que se guardaron. Los
+    cambios de estado se anotan en el historial y se publican en eventos
+    para los streams en vivo.
+    """
+    postgresql = basedatos.dialecto() == 'postgresql'
+    cursor = conn.cursor()
+
+    try:
+        # Serializar las escrituras de un mismo alumno: el delta del acumulado
+        # depende del estado anterior, que no puede cambiar mientras tanto
+        ids = sorted({alumno_id for alumno_id, _, _ in filas})
+        # (en SQLite, db_pool.transaccion ya tomó el lock de escritura)
+        if postgresql:
+            basedatos.ejecutar_en(cursor, BLOQUEAR_ALUMNOS, (ids,))
+        else:
+            basedatos.ejecutar_en(
+                cursor, f'SELECT id FROM alumnos WHERE id IN ({basedatos.marcadores(len(ids))})', ids)
+        existentes = {fila[0] for fila in cursor.fetchall()}
+
+        filas = [fila for fila in filas if fila[0] in existentes]
+        if not filas:
+            return existentes
+        particiones.asegurar_fechas(cursor, {fecha for _, fecha, _ in filas})
+
+        # Estado anterior de cada (alumno, fecha)
+        por_fecha = {}
+        for alumno_id, fecha, presente in filas:
+            por_fecha.setdefault(fecha, []).append(alumno_id)
+        previos = {}
+        for fecha, alumnos in por_fecha.items():
+            if postgresql:
+                basedatos.ejecutar_en(cursor, ASISTENCIA_PREVIA, (fecha, alumnos))
+            else:
+                basedatos.ejecutar_en(cursor, f'''
+                    SELECT alumno_id, presente FROM asistencias
+                    WHERE fecha = %s AND alumno_id IN ({basedatos.marcadores(len(alumnos))})
+                ''', [fecha] + alumnos)
+            for alumno_id, presente in cursor.fetchall():
+                previos[(alumno_id, fecha)] = None if presente is None else bool(presente)
+
+        if postgresql:
+            basedatos.guardar_filas(cursor, GUARDAR_ASISTENCIA, '''
+                INSERT INTO asistencias (alumno_id, fecha, presente)
+                VALUES %s
+                ON CONFLICT (alumno_id, fecha)
+                DO UPDATE SET presente = EXCLUDED.presente
+            ''', filas)
+        else:
+            por_tabla = {}
+            for fila in filas:
+                por_tabla.setdefault(particiones.tabla_de(fila[1]), []).append(fila)
+            for tabla, del_anio in por_tabla.items():
+                basedatos.ejecutar_muchos_en(cursor, basedatos.upsert(
+                    tabla, ('alumno_id', 'fecha', 'presente'), ('alumno_id', 'fecha')), del_anio)
+
+        # Deltas del acumulado: una marca nueva suma a marcadas; un cambio
+        # presente <-> ausente mueve una clase de una columna a la otra.
+        # Los bits del día se prenden o apagan igual
+        deltas = {}
+        for alumno_id, fecha, presente in filas:
+            previo = previos.get((alumno_id, fecha))
+            if previo == presente:
+                continue
+            delta = deltas.setdefault((alumno_id, fecha.replace(day=1)), [0, 0, 0, 0, 0])
+            bit = 1 << (fecha.day - 1)
+            if previo is None:
+                delta[2] += 1
+                delta[4] += bit
+            else:
+                delta[0] -= 1 if previo else 0
+                delta[1] -= 0 if previo else 1
+                delta[3] -= bit if previo else 0
+            delta[0] += 1 if presente else 0
+            delta[1] += 0 if presente else 1
+            delta[3] += bit if presente else 0
+
+        valores = [(alumno_id, mes, *delta) for (alumno_id, mes), delta in deltas.items()]
+        if valores:
+            basedatos.guardar_filas(cursor, SUMAR_MENSUAL, '''
+                INSERT INTO asistencias_mensuales (alumno_id, mes, presentes, ausentes, marcadas,
+                                                   dias_presentes, dias_marcados)
+                VALUES %s
+                ON CONFLICT (alumno_id, mes) DO UPDATE SET
+                    presentes = asistencias_mensuales.presentes + EXCLUDED.presentes,
+                    ausentes = asistencias_mensuales.ausentes + EXCLUDED.ausentes,
+                    marcadas = asistencias_mensuales.marcadas + EXCLUDED.marcadas,
+                    dias_presentes = asistencias_mensuales.dias_presentes + EXCLUDED.dias_presentes,
+                    dias_marcados = asistencias_mensuales.dias_marcados + EXCLUDED.dias_marcados
+            ''', valores)
+
+        # Anotar los cambios de estado en el historial y avisar a los demás
+        # dispositivos (el aviso sale al confirmar)
+        cambiados = [fila for fila in filas if previos.get((fila[0], fila[1])) != fila[2]]
+        historial.anotar(cursor, [('asistencia', alumno_id, fecha, presente)
+                                  for alumno_id, fecha, presente in cambiados])
+        avisos = {}
+        for alumno_id, fecha, presente in cambiados:
+            avisos.setdefault(fecha, []).append((alumno_id, presente))
+        for fecha, cambios in avisos.items():
+            eventos.publicar(conn, fecha, cambios)
+    finally:
+        cursor.close()
+
+    return existentes
+
+
+def reconstruir():
+    """Recalcular asistencias_mensuales desde asistencias; devuelve las filas generadas
+
+    Los meses de particiones archivadas (ver particiones.archivar) ya no
+    están en asistencias: su acumulado se conserva tal como estaba.
+    """
+    dialecto = basedatos.dialecto()
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            # Bloquear escrituras en asistencias mientras se recalcula (en
+            # SQLite la transacción ya tiene el lock de escritura)
+            if dialecto == 'postgresql':
+                cursor.execute('LOCK TABLE asistencias IN SHARE MODE')
+            desde = particiones.primera(cursor)
+            if desde is None:
+                cursor.execute('DELETE FROM asistencias_mensuales')
+            else:
+                basedatos.ejecutar_en(cursor, 'DELETE FROM asistencias_mensuales WHERE mes >= %s', (desde,))
+            cursor.execute(SQL_RECONSTRUIR[dialecto])
+            cursor.execute('SELECT COUNT(*) FROM asistencias_mensuales')
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+
+def reporte_por_alumno(desde, hasta):
+    """Totales de cada alumno entre dos meses (inclusive), leyendo solo el acumulado
+
+    Es de solo lectura: con DATABASE_URL_REPLICA puede ir a la réplica.
+    """
+    with db_pool.conexion_lectura() as conn:
+        cursor = conn.cursor()
+        try:
+            basedatos.ejecutar_en(cursor, '''
+                SELECT a.id, a.nombre, a.apellido,
+                       COALESCE(SUM(m.presentes), 0),
+                       COALESCE(SUM(m.ausentes), 0),
+                       COALESCE(SUM(m.marcadas), 0)
+                FROM alumnos a
+                LEFT JOIN asistencias_mensuales m
+                       ON m.alumno_id = a.id AND m.mes BETWEEN %s AND %s
+                GROUP BY a.id, a.nombre, a.apellido
+                ORDER BY a.apellido, a.nombre
+            ''', (desde.replace(day=1), hasta.replace(day=1)))
+            return [_fila_reporte(fila[3:], id=fila[0], nombre=fila[1], apellido=fila[2])
+                    for fila in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+
+def reporte_de_alumno(alumno_id, desde, hasta):
+    """Mes por mes de un alumno entre dos meses (inclusive)"""
+    with db_pool.conexion_lectura() as conn:
+        cursor = conn.cursor()
+        try:
+            basedatos.ejecutar_en(cursor, '''
+                SELECT mes, presentes, ausentes, marcadas
+                FROM asistencias_mensuales
+                WHERE alumno_id = %s AND mes BETWEEN %s AND %s
+                ORDER BY mes
+            ''', (alumno_id, desde.replace(day=1), hasta.replace(day=1)))
+            return [_fila_reporte(fila[1:], mes=str(fila[0])[:7]) for fila in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+
+def cargar_bits(hasta):
+    """{alumno_id: [(mes, dias_presentes, dias_marcados), ...]} del mes de hasta hacia atrás"""
+    with db_pool.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            basedatos.ejecutar_en(cursor, BITS_POR_ALUMNO, (hasta.replace(day=1),))
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    meses = {}
+    bits = {}
+    for alumno_id, mes, presentes, marcadas in filas:
+        fecha = meses.get(mes)
+        if fecha is None:
+            fecha = meses[mes] = date.fromisoformat(mes[:10])
+        bits.setdefault(alumno_id, []).append((fecha, presentes, marcadas))
+    for lista in bits.values():
+        lista.sort(reverse=True)
+    return bits
+
+
+def _contar(bits):
+    # int.bit_count() recién existe en Python 3.10
+    return bin(bits).count('1')
+
+
+def _mascara(mes, desde, hasta):
+    """Bits de los días de ese mes entre desde y hasta (inclusive)"""
+    mascara = (1 << 31) - 1
+    if hasta is not None and (mes.year, mes.month) == (hasta.year, hasta.month):
+        mascara &= (1 << hasta.day) - 1
+    if desde is not None and (mes.year, mes.month) == (desde.year, desde.month):
+        mascara &= ~((1 << (desde.day - 1)) - 1)
+    return mascara
+
+
+def tasas(bits, desde, hasta):
+    """{alumno_id: (presentes, marcadas)} entre dos fechas (inclusive)"""
+    inicio = desde.replace(day=1)
+    resultado = {}
+    for alumno_id, meses in bits.items():
+        presentes = marcadas = 0
+        for mes, dias_presentes, dias_marcados in meses:
+            if mes > hasta:
+                continue
+            if mes < inicio:
+                break
+            mascara = _mascara(mes, desde, hasta)
+            presentes += _contar(dias_presentes & mascara)
+            marcadas += _contar(dias_marcados & mascara)
+        resultado[alumno_id] = (presentes, marcadas)
+    return resultado
+
+
+def rachas(bits, hasta):
+    """{alumno_id: clases seguidas presente hasta esa fecha}
+
+    Cuentan las marcas: un día sin marcar (sin clase para ese alumno) no
+    corta la racha; un ausente sí.
+    """
+    resultado = {}
+    for alumno_id, meses in bits.items():
+        racha = 0
+        for mes, dias_presentes, dias_marcados in meses:
+            if mes > hasta:
+                continue
+            mascara = _mascara(mes, None, hasta)
+            dias_presentes &= mascara
+            ausentes = dias_marcados & mascara & ~dias_presentes
+            if ausentes:
+                # Solo los presentes posteriores al último ausente
+                racha += _contar(dias_presentes >> ausentes.bit_length())
+                break
+            racha += _contar(dias_presentes)
+        resultado[alumno_id] = racha
+    return resultado
+
+
+def ultimas_visitas(bits, hasta):
+    """{alumno_id: último día presente hasta esa fecha, o None}"""
+    resultado = {}
+    for alumno_id, meses in bits.items():
+        ultima = None
+        for mes, dias_presentes, _ in meses:
+            if mes > hasta:
+                continue
+            dias = dias_presentes & _mascara(mes, None, hasta)
+            if dias:
+                ultima = mes.replace(day=dias.bit_length())
+                break
+        resultado[alumno_id] = ultima
+    return resultado
+
+
+def indicadores(hasta=None, dias=90):
+    """Tasa de los últimos `dias` días, racha actual y última visita de cada alumno
+
+    Lee solo los bits del acumulado; los alumnos sin ninguna marca no
+    aparecen. Devuelve {alumno_id: {...}}.
+    """
+    hasta = hasta or date.today()
+    desde = hasta - timedelta(days=dias - 1)
+    bits = cargar_bits(hasta)
+    periodo = tasas(bits, desde, hasta)
+    seguidas = rachas(bits, hasta)
+    visitas = ultimas_visitas(bits, hasta)
+    resultado = {}
+    for alumno_id in bits:
+        presentes, marcadas = periodo[alumno_id]
+        resultado[alumno_id] = {
+            'presentes': presentes,
+            'marcadas': marcadas,
+            'porcentaje': round(presentes * 100.0 / marcadas, 1) if marcadas else 0.0,
+            'racha': seguidas[alumno_id],
+            'ultima_visita': visitas[alumno_id],
+        }
+    return resultado
+
+
+def _fila_reporte(conteos, **datos):
+    presentes, ausentes, marcadas = (int(n) for n in conteos)
+    datos.update({
+        'presentes': presentes,
+        'ausentes': ausentes,
+        'marcadas': marcadas,
+        'porcentaje': round(presentes * 100.0 / marcadas, 1) if marcadas else 0.0,
+    })
+    return datos
+
+
+if __name__ == '__main__':
+    print(f"Acumulado mensual reconstruido: {reconstruir()} filas")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Acceso a datos compartido por app.py, app_postgresql.py y main.py
+
+Las consultas se escriben una sola vez, con marcadores %s (como en
+psycopg2), y este módulo las adapta al motor que eligió db_pool al crear
+el pool del proceso:
+
+- En SQLite los %s se traducen a ? (y %% a %); cada traducción se hace
+  una vez y queda cacheada.
+- upsert() arma INSERT ... ON CONFLICT ... DO UPDATE, que entienden los
+  dos motores (SQLite >= 3.24), en lugar de INSERT OR REPLACE, que en
+  SQLite borra la fila y le asigna otro id.
+- Las sentencias calientes se declaran con Sentencia(nombre, sql) y se
+  preparan una vez por conexión: PREPARE + EXECUTE en PostgreSQL (se
+  analizan y planifican una sola vez); en SQLite el módulo sqlite3
+  reutiliza la sentencia compilada mientras el texto sea idéntico, y la
+  traducción cacheada garantiza que lo sea.
+- Las filas de un SELECT son Fila en los dos motores: tuplas con acceso
+  por nombre cuyo mapa de columnas es uno solo por resultado.
+"""
+
+import sqlite3
+import threading
+import weakref
+from functools import lru_cache
+from operator import itemgetter
+
+import db_pool
+
+
+class Sentencia:
+    """Consulta que se prepara una vez por conexión"""
+
+    __slots__ = ('nombre', 'sql', 'parametros', 'sql_preparada')
+
+    def __init__(self, nombre, sql):
+        self.nombre = nombre
+        self.sql = sql
+        self.sql_preparada, self.parametros = _numerar(sql)
+
+    def __repr__(self):
+        return f'Sentencia({self.nombre!r})'
+
+
+class Fila(tuple):
+    """Fila de un resultado: tupla con acceso por nombre (fila['id'] o fila.id)
+
+    Cada juego de columnas tiene su subclase (ver clase_fila) con el mapa
+    nombre -> posición y una property por columna; la fila no guarda más
+    que sus valores. dict(fila) funciona como con sqlite3.Row.
+    """
+
+    __slots__ = ()
+    _columnas = ()
+    _indices = {}
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            return tuple.__getitem__(self, self._indices[clave])
+        return tuple.__getitem__(self, clave)
+
+    def keys(self):
+        return self._columnas
+
+    def get(self, clave, defecto=None):
+        indice = self._indices.get(clave)
+        return defecto if indice is None else tuple.__getitem__(self, indice)
+
+    def _asdict(self):
+        return dict(zip(self._columnas, self))
+
+    def __repr__(self):
+        return 'Fila(' + ', '.join(f'{columna}={valor!r}' for columna, valor in zip(self._columnas, self)) + ')'
+
+
+@lru_cache(maxsize=256)
+def clase_fila(columnas):
+    """Subclase de Fila para una tupla de nombres de columna (cacheada)"""
+    atributos = {'__slots__': (), '_columnas': columnas,
+                 '_indices': {columna: i for i, columna in enumerate(columnas)}}
+    for i, columna in enumerate(columnas):
+        # Las columnas que no son identificadores o que taparían un método
+        # (count, index, keys...) quedan accesibles solo con fila['columna']
+        if columna.isidentifier() and not hasattr(Fila, columna):
+            atributos[columna] = property(itemgetter(i))
+    return type('Fila', (Fila,), atributos)
+
+
+# Conexión PostgreSQL -> nombres de las sentencias ya preparadas en ella.
+# Con referencias débiles: una conexión reciclada por el pool no deja rastro.
+_preparadas = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def dialecto():
+    """'postgresql' o 'sqlite', según el pool del proceso"""
+    return db_pool.get_pool().dialecto
+
+
+@lru_cache(maxsize=512)
+def traducir(sql, motor, con_parametros=True):
+    """SQL con marcadores %s adaptado al motor
+
+    Sigue las reglas de psycopg2: %% es un % literal solo cuando la
+    consulta lleva parámetros, y los marcadores se reemplazan en todo el
+    texto (también dentro de comillas).
+    """
+    if motor != 'sqlite' or not con_parametros:
+        return sql
+    return sql.replace('%%', '\0').replace('%s', '?').replace('\0', '%')
+
+
+def _numerar(sql):
+    """Pasar %s a $1, $2... para PREPARE; devuelve (sql, cantidad de parámetros)"""
+    trozos = sql.replace('%%', '\0').split('%s')
+    texto = trozos[0]
+    for n, trozo in enumerate(trozos[1:], 1):
+        texto += f'${n}' + trozo
+    return texto.replace('\0', '%'), len(trozos) - 1
+
+
+def marcadores(n):
+    """'%s, %s, ...' con n marcadores"""
+    return ', '.join(['%s'] * n)
+
+
+def upsert(tabla, columnas, conflicto, actualizar=None):
+    """INSERT ... ON CONFLICT (conflicto) DO UPDATE de las columnas a actualizar
+
+    Si actualizar está vacío, las filas que ya existen se dejan como están
+    (DO NOTHING).
+    """
+    if actualizar is None:
+        actualizar = [columna for columna in columnas if columna not in conflicto]
+    sql = (f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({marcadores(len(columnas))}) "
+           f"ON CONFLICT ({', '.join(conflicto)}) ")
+    if not actualizar:
+        return sql + 'DO NOTHING'
+    return sql + 'DO UPDATE SET ' + ', '.join(f'{columna} = EXCLUDED.{columna}' for columna in actualizar)
+
+
+def _preparar(cursor, sentencia):
+    conn = cursor.connection
+    with _lock:
+        nombres = _preparadas.setdefault(conn, set())
+        if sentencia.nombre in nombres:
+            return
+    cursor.execute(f'PREPARE {sentencia.nombre} AS {sentencia.sql_preparada}')
+    with _lock:
+        nombres.add(sentencia.nombre)
+
+
+def ejecutar_en(cursor, sql, params=None):
+    """Ejecutar en un cursor una consulta (texto o Sentencia) en su dialecto"""
+    sqlite = isinstance(cursor, sqlite3.Cursor)
+    if isinstance(sql, Sentencia):
+        if sqlite:
+            return cursor.execute(traducir(sql.sql, 'sqlite'), params or ())
+        _preparar(cursor, sql)
+        if not sql.parametros:
+            return cursor.execute(f'EXECUTE {sql.nombre}')
+        return cursor.execute(f'EXECUTE {sql.nombre} ({marcadores(sql.parametros)})', params)
+
+    if sqlite:
+        return cursor.execute(traducir(sql, 'sqlite', params is not None), params or ())
+    return cursor.execute(sql, params)
+
+
+def ejecutar_muchos_en(cursor, sql, filas):
+    """executemany en el dialecto del cursor"""
+    if isinstance(cursor, sqlite3.Cursor):
+        return cursor.executemany(traducir(sql, 'sqlite'), filas)
+    return cursor.executemany(sql, filas)
+
+
+def guardar_filas(cursor, sentencia, sql_lote, filas):
+    """Insertar filas con una Sentencia
+
+    Una sola fila usa la sentencia preparada; varias, execute_values en
+    PostgreSQL (sql_lote lleva VALUES %s) o executemany en SQLite.
+    """
+    if len(filas) == 1:
+        ejecutar_en(cursor, sentencia, filas[0])
+    elif isinstance(cursor, sqlite3.Cursor):
+        ejecutar_muchos_en(cursor, sentencia.sql, filas)
+    else:
+        import psycopg2.extras
+
+        psycopg2.extras.execute_values(cursor, sql_lote, filas)
+
+
+def filas(cursor):
+    """Filas del último SELECT como Fila, en cualquiera de los dos motores"""
+    if isinstance(cursor, sqlite3.Cursor):
+        # Tuplas simples: no armar un sqlite3.Row por fila para descartarlo
+        cursor.row_factory = None
+    clase = clase_fila(tuple(desc[0] for desc in cursor.description))
+    nueva = tuple.__new__
+    return [nueva(clase, fila) for fila in cursor.fetchall()]
+
+
+def consultar(sql, params=None, lectura=False):
+    """Ejecutar un SELECT con una conexión del pool y devolver sus filas
+
+    Con lectura=True la consulta puede ir a la réplica (ver
+    db_pool.conexion_lectura).
+    """
+    with (db_pool.conexion_lectura() if lectura else db_pool.conexion()) as conn:
+        cursor = conn.cursor()
+        try:
+            ejecutar_en(cursor, sql, params)
+            return filas(cursor)
+        finally:
+            cursor.close()
+
+
+def consultar_uno(sql, params=None):
+    """Primera fila de un SELECT, o None"""
+    resultado = consultar(sql, params)
+    return resultado[0] if resultado else None
+
+
+def ejecutar(sql, params=None):
+    """Ejecutar una escritura en su propia transacción; devuelve las filas afectadas"""
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            ejecutar_en(cursor, sql, params)
+            return cursor.rowcount
+        finally:
+            cursor.close()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de arranque: cuánto tarda gunicorn en quedar listo
+
+Mide tres cosas:
+
+- lo que tarda `import app` solo (no tiene que tocar la base);
+- por cada modo, desde que se lanza gunicorn con --workers workers hasta
+  el primer 200 de /readyz y hasta que respondieron listos todos los
+  workers (pids distintos);
+- la latencia de los primeros --pedidos pedidos concurrentes a --ruta
+  apenas están todos listos.
+
+Los modos son `frio` (GUNICORN_PRELOAD=0: cada worker migra, compila las
+plantillas y abre su pool) y `preload` (el maestro prepara la aplicación
+una vez y los workers solo abren el pool).
+
+    python benchmarks/arranque.py --workers 4 --alumnos 2000
+
+Sin DATABASE_URL se usa SQLite en benchmarks/arranque.db, que se borra y
+se vuelve a cargar con sembrar.py. Con PostgreSQL la carga vacía las
+tablas, así que la URL tiene que pasarse de forma explícita con
+--database-url (o usar --alumnos 0 para no cargar nada).
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+sys.path.insert(0, RAIZ)
+
+BASE = os.path.join(DIRECTORIO, 'arranque.db')
+
+MODOS = {'frio': '0', 'preload': '1'}
+
+SCRIPT_IMPORTAR = (
+    'import time; inicio = time.perf_counter(); import app, db_pool; '
+    'print(time.perf_counter() - inicio, db_pool._pool is not None)'
+)
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por rango más cercano de una lista ordenada"""
+    if not ordenados:
+        return None
+    rango = math.ceil(p / 100.0 * len(ordenados))
+    return ordenados[max(0, min(len(ordenados), rango) - 1)]
+
+
+def pedir(puerto, ruta, espera=2.0):
+    """GET con una conexión nueva; devuelve (estado, cuerpo) o (None, None) si no conecta"""
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=espera)
+    try:
+        conexion.request('GET', ruta)
+        respuesta = conexion.getresponse()
+        return respuesta.status, respuesta.read()
+    except OSError:
+        return None, None
+    finally:
+        conexion.close()
+
+
+def medir_importacion(entorno, repeticiones):
+    """Segundos de `import app` en un proceso nuevo (el mejor de varios) y si abrió el pool"""
+    tiempos = []
+    abrio_pool = False
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', SCRIPT_IMPORTAR], env=entorno, cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.split()
+        tiempos.append(float(salida[0]))
+        abrio_pool = abrio_pool or salida[1] == 'True'
+    return min(tiempos), abrio_pool
+
+
+def medir_modo(modo, args, entorno):
+    """Lanzar gunicorn en un modo y medir hasta que todos los workers están listos"""
+    entorno = dict(entorno, GUNICORN_PRELOAD=MODOS[modo])
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        ['gunicorn', '--workers', str(args.workers), '--bind', f'127.0.0.1:{args.puerto}'],
+        env=entorno, cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    primero = None
+    listos = set()
+    try:
+        while len(listos) < args.workers:
+            if time.perf_counter() - inicio > args.espera:
+                raise RuntimeError(f'{modo}: {len(listos)} de {args.workers} workers listos '
+                                   f'después de {args.espera}s')
+            estado, cuerpo = pedir(args.puerto, '/readyz')
+            if estado == 200:
+                if primero is None:
+                    primero = time.perf_counter() - inicio
+                listos.add(json.loads(cuerpo)['pid'])
+            elif estado is None:
+                time.sleep(0.01)
+        todos = time.perf_counter() - inicio
+
+        # Los primeros pedidos de verdad, todos a la vez
+        latencias = []
+        errores = []
+        lock = threading.Lock()
+
+        def primer_pedido():
+            comienzo = time.perf_counter()
+            estado, _ = pedir(args.puerto, args.ruta, espera=30.0)
+            with lock:
+                latencias.append(time.perf_counter() - comienzo)
+                if estado != 200:
+                    errores.append(estado)
+
+        hilos = [threading.Thread(target=primer_pedido) for _ in range(args.pedidos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    latencias.sort()
+    return {
+        'primer_listo_s': round(primero, 3),
+        'todos_listos_s': round(todos, 3),
+        'ms': {p: round(percentil(latencias, p) * 1000, 1) for p in (50, 95, 100)},
+        'errores': len(errores),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tiempo de arranque de los workers de gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='workers de gunicorn (4)')
+    parser.add_argument('--pedidos', type=int, default=16, help='primeros pedidos concurrentes (16)')
+    parser.add_argument('--ruta', default='/asistencia', help='ruta de los primeros pedidos (/asistencia)')
+    parser.add_argument('--alumnos', type=int, default=1000, help='alumnos a cargar antes, 0 para no cargar (1000)')
+    parser.add_argument('--modos', default='frio,preload', help='modos a medir (frio,preload)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='arranques por modo, vale el mejor (3)')
+    parser.add_argument('--puerto', type=int, default=8099)
+    parser.add_argument('--espera', type=float, default=60.0, help='segundos máximos hasta estar listos (60)')
+    parser.add_argument('--database-url', help='PostgreSQL a usar (se vacía si --alumnos > 0)')
+    parser.add_argument('--salida', help='archivo JSON de resultados (benchmarks/resultados/arranque-<fecha>.json)')
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    elif os.environ.get('DATABASE_URL') and args.alumnos:
+        print('Con DATABASE_URL la carga vacía las tablas: pasar la URL con --database-url o usar --alumnos 0')
+        return 1
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['SQLITE_PATH'] = BASE
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(BASE + sufijo):
+                os.remove(BASE + sufijo)
+    if args.alumnos:
+        import sembrar
+
+        siembra = sembrar.sembrar(args.alumnos, 1, limpiar=True)
+        print(f"Datos: {siembra['alumnos']} alumnos, {siembra['asistencias']} asistencias")
+        import db_pool
+
+        db_pool.cerrar()
+
+    entorno = dict(os.environ, METRICAS='0')
+    importacion, abrio_pool = medir_importacion(entorno, args.repeticiones)
+    print(f"import app: {importacion * 1000:.0f} ms ({'abrió' if abrio_pool else 'sin abrir'} el pool)")
+
+    modos = {}
+    for modo in args.modos.split(','):
+        corridas = [medir_modo(modo, args, entorno) for _ in range(args.repeticiones)]
+        modos[modo] = min(corridas, key=lambda corrida: corrida['todos_listos_s'])
+        mejor = modos[modo]
+        print(f"{modo:8} primer worker listo {mejor['primer_listo_s']:.2f}s  "
+              f"{args.workers} listos {mejor['todos_listos_s']:.2f}s  "
+              f"primeros {args.pedidos} pedidos ms: p50 {mejor['ms'][50]}  p95 {mejor['ms'][95]}  "
+              f"máx {mejor['ms'][100]}  errores {mejor['errores']}")
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'base': 'postgresql' if os.environ.get('DATABASE_URL') else 'sqlite',
+        'workers': args.workers,
+        'alumnos': args.alumnos,
+        'ruta': args.ruta,
+        'importar_app_ms': round(importacion * 1000, 1),
+        'importar_abre_pool': abrio_pool,
+        'modos': modos,
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO, 'resultados', f"arranque-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    return 0 if not any(modo['errores'] for modo in modos.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
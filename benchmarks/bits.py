@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tasa, racha y última visita de todos los alumnos: bits contra filas
+
+Compara, para todo el roster, las tres preguntas que resuelve
+asistencia_mensual.indicadores con los bits del acumulado mensual
+(dias_presentes, dias_marcados) contra el SQL equivalente sobre las
+filas de asistencias:
+
+- tasa           presentes y marcadas de los últimos --dias días
+- racha          presentes seguidos desde el último ausente
+- ultima_visita  último día presente
+
+Los bits se leen con una sola consulta (una fila por alumno y mes) y se
+cuentan en Python; el SQL recorre una fila por alumno y día. Antes de
+medir se verifica que las dos formas den lo mismo.
+
+    python benchmarks/bits.py --alumnos 5000 --anios 3
+    python benchmarks/bits.py --database-url postgresql://localhost/yoga_bench
+
+Sin DATABASE_URL se usa SQLite en benchmarks/bench.db. Con PostgreSQL,
+la carga de datos vacía las tablas, así que la URL tiene que pasarse de
+forma explícita con --database-url.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORIO))
+
+SQL_TASA = '''
+    SELECT alumno_id, SUM(CASE WHEN presente THEN 1 ELSE 0 END), COUNT(*)
+    FROM asistencias
+    WHERE fecha BETWEEN %s AND %s AND presente IS NOT NULL
+    GROUP BY alumno_id
+'''
+
+SQL_RACHA = '''
+    SELECT ast.alumno_id, COUNT(*)
+    FROM asistencias ast
+    LEFT JOIN (
+        SELECT alumno_id, MAX(fecha) AS ultima_falta
+        FROM asistencias
+        WHERE NOT presente AND fecha <= %s
+        GROUP BY alumno_id
+    ) f ON f.alumno_id = ast.alumno_id
+    WHERE ast.presente AND ast.fecha <= %s
+      AND (f.ultima_falta IS NULL OR ast.fecha > f.ultima_falta)
+    GROUP BY ast.alumno_id
+'''
+
+SQL_ULTIMA_VISITA = '''
+    SELECT alumno_id, MAX(fecha)
+    FROM asistencias
+    WHERE presente AND fecha <= %s
+    GROUP BY alumno_id
+'''
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor[:10]) if isinstance(valor, str) else valor
+
+
+def con_sql(desde, hasta):
+    """Las tres respuestas desde las filas de asistencias"""
+    import basedatos
+
+    tasas = {fila[0]: (int(fila[1]), int(fila[2]))
+             for fila in basedatos.consultar(SQL_TASA, (desde, hasta))}
+    rachas = {fila[0]: fila[1] for fila in basedatos.consultar(SQL_RACHA, (hasta, hasta))}
+    visitas = {fila[0]: _fecha(fila[1]) for fila in basedatos.consultar(SQL_ULTIMA_VISITA, (hasta,))}
+    return tasas, rachas, visitas
+
+
+def con_bits(desde, hasta):
+    """Las tres respuestas desde los bits del acumulado mensual"""
+    import asistencia_mensual
+
+    bits = asistencia_mensual.cargar_bits(hasta)
+    return (asistencia_mensual.tasas(bits, desde, hasta),
+            asistencia_mensual.rachas(bits, hasta),
+            asistencia_mensual.ultimas_visitas(bits, hasta))
+
+
+def _sin_vacios(tasas, rachas, visitas):
+    # El SQL no devuelve a quien no tiene filas; los bits devuelven ceros
+    return ({k: v for k, v in tasas.items() if v != (0, 0)},
+            {k: v for k, v in rachas.items() if v},
+            {k: v for k, v in visitas.items() if v is not None})
+
+
+def mejor_tiempo(funcion, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tasa, racha y última visita: bits contra filas')
+    parser.add_argument('--alumnos', type=int, default=5000, help='alumnos a cargar (5000)')
+    parser.add_argument('--anios', type=int, default=3, help='años de asistencia a cargar (3)')
+    parser.add_argument('--dias', type=int, default=90, help='ventana de la tasa en días (90)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='repeticiones para el tiempo (3)')
+    parser.add_argument('--database-url', help='PostgreSQL a usar (se vacía al cargar los datos)')
+    parser.add_argument('--sin-sembrar', action='store_true', help='usar los datos que ya están en la base')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='archivo JSON de resultados (benchmarks/resultados/bits-<fecha>.json)')
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    elif os.environ.get('DATABASE_URL') and not args.sin_sembrar:
+        parser.error('con DATABASE_URL en el entorno, pasa --database-url explícito o usa --sin-sembrar')
+    if not os.environ.get('DATABASE_URL'):
+        os.environ.setdefault('SQLITE_PATH', os.path.join(DIRECTORIO, 'bench.db'))
+
+    import basedatos
+    import sembrar
+
+    if not args.sin_sembrar:
+        siembra = sembrar.sembrar(args.alumnos, args.anios * 12, semilla=args.semilla, limpiar=True)
+        print(f"Datos: {siembra['alumnos']} alumnos, {siembra['asistencias']} asistencias "
+              f"({siembra['segundos']}s)")
+
+    filas = basedatos.consultar_uno('SELECT COUNT(*) AS n FROM asistencias').n
+    mensuales = basedatos.consultar_uno('SELECT COUNT(*) AS n FROM asistencias_mensuales').n
+    hasta = date.today()
+    desde = hasta - timedelta(days=args.dias - 1)
+
+    esperado = con_sql(desde, hasta)
+    obtenido = _sin_vacios(*con_bits(desde, hasta))
+    for nombre, de_sql, de_bits in zip(('tasa', 'racha', 'ultima_visita'), esperado, obtenido):
+        if de_sql != de_bits:
+            distintos = [k for k in set(de_sql) | set(de_bits) if de_sql.get(k) != de_bits.get(k)]
+            print(f"Los bits no coinciden con el SQL en {nombre} para {len(distintos)} alumnos")
+            return 1
+
+    tiempos = {
+        'sql': mejor_tiempo(lambda: con_sql(desde, hasta), args.repeticiones),
+        'bits': mejor_tiempo(lambda: con_bits(desde, hasta), args.repeticiones),
+    }
+
+    dialecto = basedatos.dialecto()
+    print(f"{dialecto}: {filas} filas de asistencias, {mensuales} filas con bits")
+    print(f"{'forma':<8}{'ms':>10}")
+    for forma, segundos in tiempos.items():
+        print(f"{forma:<8}{segundos * 1000:>10.1f}")
+    print(f"Los bits son {tiempos['sql'] / tiempos['bits']:.1f}x más rápidos")
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'dialecto': dialecto,
+        'filas_asistencias': filas,
+        'filas_mensuales': mensuales,
+        'dias': args.dias,
+        'ms': {forma: round(segundos * 1000, 2) for forma, segundos in tiempos.items()},
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO, 'resultados', f"bits-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de carga de las rutas de la aplicación
+
+Carga un roster sintético (ver sembrar.py), levanta la aplicación en un
+servidor WSGI con hilos dentro del mismo proceso y le pega de forma
+concurrente a /alumnos, /asistencia, /asistencias_hoy, /registrar_alumno
+y /toggle_asistencia con una mezcla de pesos fija. Al final informa, por
+ruta, pedidos por segundo y latencias p50/p95/p99, y guarda todo en JSON.
+
+    python benchmarks/carga.py --alumnos 5000 --concurrencia 8 --duracion 30
+    python benchmarks/carga.py --comparar benchmarks/resultados/anterior.json
+
+Para medir gunicorn (u otro servidor) se lo levanta aparte contra la misma
+base y se pasa --url; en ese caso conviene cargar los datos antes con
+sembrar.py y usar --sin-sembrar.
+
+Sin DATABASE_URL se usa SQLite en benchmarks/bench.db. Con PostgreSQL,
+la carga de datos vacía las tablas, así que la URL tiene que pasarse de
+forma explícita con --database-url.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+sys.path.insert(0, RAIZ)
+
+# Peso de cada ruta en la mezcla de pedidos
+MEZCLA = {
+    'alumnos': 30,
+    'asistencia': 20,
+    'asistencias_hoy': 20,
+    'toggle_asistencia': 25,
+    'registrar_alumno': 5,
+}
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por rango más cercano de una lista ordenada"""
+    if not ordenados:
+        return None
+    rango = math.ceil(p / 100.0 * len(ordenados))
+    return ordenados[max(0, min(len(ordenados), rango) - 1)]
+
+
+class Cliente:
+    """Conexión HTTP de un hilo (reconecta si el servidor la cierra)"""
+
+    def __init__(self, url, timeout=30.0):
+        partes = urlsplit(url)
+        self.host = partes.hostname
+        self.port = partes.port or 80
+        self.prefijo = partes.path.rstrip('/')
+        self.timeout = timeout
+        self._conn = None
+
+    def pedir(self, metodo, ruta, cuerpo=None, headers=None):
+        """Hacer el pedido, leer la respuesta completa y devolver (status, cuerpo)"""
+        for intento in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(metodo, self.prefijo + ruta, body=cuerpo, headers=headers or {})
+                respuesta = self._conn.getresponse()
+                datos = respuesta.read()
+                if respuesta.will_close:
+                    self.cerrar()
+                return respuesta.status, datos
+            except (http.client.HTTPException, ConnectionError):
+                # Conexión keep-alive cerrada del otro lado: se reintenta una vez
+                self.cerrar()
+                if intento == 2:
+                    raise
+
+    def cerrar(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Escenario:
+    """Arma los pedidos de cada ruta con datos del roster cargado"""
+
+    def __init__(self, ids, apellidos, semilla):
+        self.ids = ids
+        self.apellidos = apellidos
+        self.semilla = semilla
+        self._contador = 0
+        self._lock = threading.Lock()
+
+    def pedido(self, ruta, azar):
+        if ruta == 'alumnos':
+            # Un tercio de las veces con búsqueda por prefijo de apellido
+            if self.apellidos and azar.random() < 1 / 3:
+                q = azar.choice(self.apellidos)[:3]
+                return 'GET', '/alumnos?' + urlencode({'q': q}), None, {}
+            return 'GET', '/alumnos', None, {}
+        if ruta == 'asistencia':
+            return 'GET', '/asistencia', None, {}
+        if ruta == 'asistencias_hoy':
+            return 'GET', '/asistencias_hoy', None, {}
+        if ruta == 'toggle_asistencia':
+            cuerpo = json.dumps({'alumno_id': azar.choice(self.ids), 'presente': azar.random() < 0.8})
+            return 'POST', '/toggle_asistencia', cuerpo, {'Content-Type': 'application/json'}
+        if ruta == 'registrar_alumno':
+            with self._lock:
+                self._contador += 1
+                n = self._contador
+            cuerpo = urlencode({'nombre': f'Bench{self.semilla}-{n}', 'apellido': 'Carga', 'telefono': ''})
+            return 'POST', '/registrar_alumno', cuerpo, {'Content-Type': 'application/x-www-form-urlencoded'}
+        raise ValueError(ruta)
+
+
+def _exitoso(ruta, status, datos):
+    if status >= 400:
+        return False
+    if ruta in ('toggle_asistencia', 'registrar_alumno'):
+        try:
+            return bool(json.loads(datos).get('success'))
+        except ValueError:
+            return False
+    return True
+
+
+def trabajador(url, escenario, rutas, pesos, hasta, medir_desde, semilla, muestras, errores):
+    azar = random.Random(semilla)
+    cliente = Cliente(url)
+    try:
+        while True:
+            ahora = time.perf_counter()
+            if ahora >= hasta:
+                break
+            ruta = azar.choices(rutas, pesos)[0]
+            metodo, camino, cuerpo, headers = escenario.pedido(ruta, azar)
+            inicio = time.perf_counter()
+            try:
+                status, datos = cliente.pedir(metodo, camino, cuerpo, headers)
+                ok = _exitoso(ruta, status, datos)
+            except Exception as e:
+                ok = False
+                status = type(e).__name__
+            duracion = time.perf_counter() - inicio
+            if inicio < medir_desde:
+                continue
+            muestras[ruta].append(duracion)
+            if not ok:
+                errores[ruta][str(status)] = errores[ruta].get(str(status), 0) + 1
+    finally:
+        cliente.cerrar()
+
+
+def resumir(muestras, errores, segundos):
+    """Métricas por ruta (latencias en milisegundos)"""
+    rutas = {}
+    todas = []
+    total_errores = 0
+    for ruta in sorted(muestras):
+        tiempos = sorted(muestras[ruta])
+        todas.extend(tiempos)
+        n_errores = sum(errores[ruta].values())
+        total_errores += n_errores
+        rutas[ruta] = _metricas(tiempos, n_errores, segundos)
+        rutas[ruta]['errores_por_tipo'] = errores[ruta]
+    todas.sort()
+    return rutas, _metricas(todas, total_errores, segundos)
+
+
+def _metricas(tiempos, n_errores, segundos):
+    ms = lambda valor: None if valor is None else round(valor * 1000, 2)  # noqa: E731
+    return {
+        'pedidos': len(tiempos),
+        'errores': n_errores,
+        'rps': round(len(tiempos) / segundos, 1) if segundos else 0.0,
+        'media_ms': ms(sum(tiempos) / len(tiempos)) if tiempos else None,
+        'p50_ms': ms(percentil(tiempos, 50)),
+        'p95_ms': ms(percentil(tiempos, 95)),
+        'p99_ms': ms(percentil(tiempos, 99)),
+        'max_ms': ms(tiempos[-1]) if tiempos else None,
+    }
+
+
+def comparar(actual, anterior, tolerancia):
+    """Lista de regresiones de actual contra anterior (p95 más alto o menos rps)"""
+    regresiones = []
+    for ruta, datos in actual['rutas'].items():
+        base = anterior.get('rutas', {}).get(ruta)
+        if not base or not base.get('p95_ms') or not datos.get('p95_ms'):
+            continue
+        if datos['p95_ms'] > base['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{ruta}: p95 {base['p95_ms']} ms -> {datos['p95_ms']} ms")
+        if base['rps'] and datos['rps'] < base['rps'] * (1 - tolerancia):
+            regresiones.append(f"{ruta}: rps {base['rps']} -> {datos['rps']}")
+    return regresiones
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _datos_roster():
+    import db_pool
+
+    with db_pool.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT id, apellido FROM alumnos')
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+    return [fila[0] for fila in filas], sorted({fila[1] for fila in filas})
+
+
+def _servidor_local():
+    """Levantar la aplicación en un puerto libre; devuelve (url, servidor)"""
+    from werkzeug.serving import make_server
+
+    import app as aplicacion
+
+    # Sin el log de cada pedido: escribir a la consola pesa en la medición
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    servidor = make_server('127.0.0.1', 0, aplicacion.create_app(), threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{servidor.server_port}', servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de carga de las rutas')
+    parser.add_argument('--alumnos', type=int, default=1000, help='alumnos a cargar (1000)')
+    parser.add_argument('--meses', type=int, default=6, help='meses de asistencia a cargar (6)')
+    parser.add_argument('--concurrencia', type=int, default=8, help='clientes simultáneos (8)')
+    parser.add_argument('--duracion', type=float, default=20.0, help='segundos de medición (20)')
+    parser.add_argument('--calentamiento', type=float, default=3.0, help='segundos previos sin medir (3)')
+    parser.add_argument('--rutas', help='rutas a incluir separadas por coma (todas)')
+    parser.add_argument('--url', help='servidor ya levantado (por defecto, uno local en este proceso)')
+    parser.add_argument('--database-url', help='PostgreSQL a usar (se vacía al cargar los datos)')
+    parser.add_argument('--sin-sembrar', action='store_true', help='usar los datos que ya están en la base')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='archivo JSON de resultados (benchmarks/resultados/carga-<fecha>.json)')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='variación admitida contra --comparar (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    elif os.environ.get('DATABASE_URL') and not args.sin_sembrar:
+        parser.error('con DATABASE_URL en el entorno, pasa --database-url explícito o usa --sin-sembrar')
+    if not os.environ.get('DATABASE_URL'):
+        os.environ.setdefault('SQLITE_PATH', os.path.join(DIRECTORIO, 'bench.db'))
+
+    rutas = args.rutas.split(',') if args.rutas else list(MEZCLA)
+    desconocidas = set(rutas) - set(MEZCLA)
+    if desconocidas:
+        parser.error(f"rutas desconocidas: {', '.join(sorted(desconocidas))}")
+
+    import db_pool
+    import sembrar
+
+    siembra = None
+    if not args.sin_sembrar:
+        siembra = sembrar.sembrar(args.alumnos, args.meses, semilla=args.semilla, limpiar=True)
+        print(f"Datos: {siembra['alumnos']} alumnos, {siembra['asistencias']} asistencias "
+              f"({siembra['segundos']}s)")
+
+    ids, apellidos = _datos_roster()
+    if not ids:
+        print("La base no tiene alumnos: carga datos con sembrar.py o sin --sin-sembrar")
+        return 1
+
+    servidor = None
+    url = args.url
+    if not url:
+        url, servidor = _servidor_local()
+
+    escenario = Escenario(ids, apellidos, args.semilla)
+    muestras = {ruta: [] for ruta in rutas}
+    errores = {ruta: {} for ruta in rutas}
+    pesos = [MEZCLA[ruta] for ruta in rutas]
+
+    print(f"Midiendo {url} con {args.concurrencia} clientes durante {args.duracion}s "
+          f"(+{args.calentamiento}s de calentamiento)")
+    inicio = time.perf_counter()
+    medir_desde = inicio + args.calentamiento
+    hasta = medir_desde + args.duracion
+    hilos = []
+    for i in range(args.concurrencia):
+        # list.append es atómico: todos los hilos escriben en las mismas listas
+        hilo = threading.Thread(target=trabajador, args=(
+            url, escenario, rutas, pesos, hasta, medir_desde, args.semilla * 1000 + i, muestras, errores))
+        hilo.start()
+        hilos.append(hilo)
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - medir_desde
+
+    if servidor is not None:
+        servidor.shutdown()
+
+    por_ruta, total = resumir(muestras, errores, segundos)
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'dialecto': db_pool.get_pool().dialecto,
+            'servidor': args.url or 'werkzeug (hilos, en proceso)',
+        },
+        'config': {
+            'alumnos': len(ids),
+            'meses': args.meses if siembra else None,
+            'asistencias': siembra['asistencias'] if siembra else None,
+            'concurrencia': args.concurrencia,
+            'duracion': args.duracion,
+            'calentamiento': args.calentamiento,
+            'mezcla': {ruta: MEZCLA[ruta] for ruta in rutas},
+            'semilla': args.semilla,
+        },
+        'total': total,
+        'rutas': por_ruta,
+    }
+
+    print(f"\n{'ruta':<20}{'pedidos':>9}{'errores':>9}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for ruta, datos in list(por_ruta.items()) + [('TOTAL', total)]:
+        print(f"{ruta:<20}{datos['pedidos']:>9}{datos['errores']:>9}{datos['rps']:>9}"
+              f"{datos['p50_ms'] or '-':>10}{datos['p95_ms'] or '-':>10}{datos['p99_ms'] or '-':>10}")
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO, 'resultados', f"carga-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.tolerancia)
+        if regresiones:
+            print(f"\nRegresiones contra {args.comparar}:")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            return 1
+        print(f"\nSin regresiones contra {args.comparar} (tolerancia {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
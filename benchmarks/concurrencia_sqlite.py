@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escrituras concurrentes contra SQLite: varios procesos marcando asistencia
+
+Simula varios workers de gunicorn sobre el mismo archivo SQLite: levanta
+--procesos procesos, cada uno con la aplicación y --hilos hilos que hacen
+--marcas POST /toggle_asistencia (con el cliente de pruebas de Flask,
+sin red) sobre alumnos al azar, todos arrancando a la vez. Informa las
+marcas por segundo, las latencias y cuántas fallaron; con el turno de
+escritura de db_pool y el busy timeout no tiene que fallar ninguna.
+
+Al final verifica que el acumulado mensual, que se mantiene con deltas,
+sea igual a reconstruirlo desde cero: una escritura perdida o aplicada
+dos veces lo descuadra.
+
+    python benchmarks/concurrencia_sqlite.py --procesos 4 --hilos 8 --marcas 200
+
+Usa siempre SQLite, en un archivo propio que se borra al empezar
+(benchmarks/concurrencia.db).
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+sys.path.insert(0, RAIZ)
+
+BASE = os.path.join(DIRECTORIO, 'concurrencia.db')
+
+SQL_ACUMULADO = '''
+    SELECT alumno_id, mes, presentes, ausentes, marcadas, dias_presentes, dias_marcados
+    FROM asistencias_mensuales
+    ORDER BY alumno_id, mes
+'''
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por rango más cercano de una lista ordenada"""
+    if not ordenados:
+        return None
+    rango = math.ceil(p / 100.0 * len(ordenados))
+    return ordenados[max(0, min(len(ordenados), rango) - 1)]
+
+
+def trabajador(hilos, marcas, inicio, semilla):
+    """Un proceso: hilos que marcan asistencia desde el instante inicio; imprime el resultado en JSON"""
+    import app as aplicacion
+    import basedatos
+    import db_pool
+
+    flask_app = aplicacion.create_app()
+    ids = [fila[0] for fila in basedatos.consultar('SELECT id FROM alumnos')]
+    latencias = []
+    fallas = []
+    lock = threading.Lock()
+
+    def marcar(numero):
+        azar = random.Random(semilla * 1000 + numero)
+        cliente = flask_app.test_client()
+        propias = []
+        errores = []
+        for _ in range(marcas):
+            comienzo = time.perf_counter()
+            respuesta = cliente.post('/toggle_asistencia', json={
+                'alumno_id': azar.choice(ids), 'presente': azar.random() < 0.8})
+            propias.append(time.perf_counter() - comienzo)
+            datos = respuesta.get_json(silent=True) or {}
+            if respuesta.status_code != 200 or not datos.get('success'):
+                errores.append(datos.get('message') or f'HTTP {respuesta.status_code}')
+        with lock:
+            latencias.extend(propias)
+            fallas.extend(errores)
+
+    time.sleep(max(0.0, inicio - time.time()))
+    hilos_marcando = [threading.Thread(target=marcar, args=(numero,)) for numero in range(hilos)]
+    for hilo in hilos_marcando:
+        hilo.start()
+    for hilo in hilos_marcando:
+        hilo.join()
+
+    estadisticas = db_pool.stats()
+    print(json.dumps({
+        'latencias': latencias,
+        'fallas': fallas,
+        'escrituras': estadisticas.get('escrituras', 0),
+        'esperas_escritura': estadisticas.get('esperas_escritura', 0),
+    }))
+
+
+def verificar_acumulado():
+    """Si el acumulado mensual mantenido con deltas es igual al reconstruido"""
+    import asistencia_mensual
+    import basedatos
+
+    mantenido = [tuple(fila) for fila in basedatos.consultar(SQL_ACUMULADO)]
+    asistencia_mensual.reconstruir()
+    return mantenido == [tuple(fila) for fila in basedatos.consultar(SQL_ACUMULADO)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Escrituras concurrentes contra SQLite')
+    parser.add_argument('--procesos', type=int, default=4, help='procesos, como workers de gunicorn (4)')
+    parser.add_argument('--hilos', type=int, default=8, help='hilos marcando por proceso (8)')
+    parser.add_argument('--marcas', type=int, default=200, help='marcas por hilo (200)')
+    parser.add_argument('--alumnos', type=int, default=300, help='alumnos a cargar (300)')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='archivo JSON de resultados (benchmarks/resultados/concurrencia-<fecha>.json)')
+    parser.add_argument('--trabajador', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['SQLITE_PATH'] = BASE
+
+    if args.trabajador is not None:
+        trabajador(args.hilos, args.marcas, args.trabajador, args.semilla)
+        return 0
+
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(BASE + sufijo):
+            os.remove(BASE + sufijo)
+    import sembrar
+
+    siembra = sembrar.sembrar(args.alumnos, 1, semilla=args.semilla)
+    print(f"Datos: {siembra['alumnos']} alumnos, {siembra['asistencias']} asistencias")
+
+    # Que todos empiecen a la vez, después de importar la aplicación
+    inicio = time.time() + 3.0
+    entorno = dict(os.environ, MIGRAR_AL_INICIAR='0', METRICAS='0')
+    procesos = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--trabajador', str(inicio),
+                          '--hilos', str(args.hilos), '--marcas', str(args.marcas),
+                          '--semilla', str(args.semilla + numero)],
+                         env=entorno, stdout=subprocess.PIPE, text=True)
+        for numero in range(args.procesos)
+    ]
+    resultados = []
+    for proceso in procesos:
+        salida, _ = proceso.communicate()
+        if proceso.returncode != 0:
+            print(f"Un proceso terminó con código {proceso.returncode}")
+            return 1
+        resultados.append(json.loads(salida.strip().splitlines()[-1]))
+    segundos = time.time() - inicio
+
+    latencias = sorted(latencia for resultado in resultados for latencia in resultado['latencias'])
+    fallas = [falla for resultado in resultados for falla in resultado['fallas']]
+    esperas = sum(resultado['esperas_escritura'] for resultado in resultados)
+    acumulado_ok = verificar_acumulado()
+
+    print(f"{args.procesos} procesos x {args.hilos} hilos: {len(latencias)} marcas en {segundos:.1f}s "
+          f"({len(latencias) / segundos:.0f}/s)")
+    print(f"Latencia ms: p50 {percentil(latencias, 50) * 1000:.1f}  p95 {percentil(latencias, 95) * 1000:.1f}  "
+          f"p99 {percentil(latencias, 99) * 1000:.1f}  máx {latencias[-1] * 1000:.1f}")
+    print(f"Esperas por el turno de escritura dentro de cada proceso: {esperas}")
+    print(f"Marcas fallidas: {len(fallas)}")
+    print(f"Acumulado mensual igual al reconstruido: {'sí' if acumulado_ok else 'NO'}")
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'procesos': args.procesos,
+        'hilos': args.hilos,
+        'marcas': len(latencias),
+        'segundos': round(segundos, 2),
+        'marcas_por_segundo': round(len(latencias) / segundos, 1),
+        'ms': {p: round(percentil(latencias, p) * 1000, 2) for p in (50, 95, 99)},
+        'esperas_escritura': esperas,
+        'fallidas': len(fallas),
+        'errores': sorted(set(fallas)),
+        'acumulado_ok': acumulado_ok,
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO, 'resultados', f"concurrencia-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    return 0 if not fallas and acumulado_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
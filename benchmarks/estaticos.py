@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bytes y pedidos por página: HTML, CSS y JS de la primera visita y las siguientes
+
+Carga un roster sintético (ver sembrar.py), pide cada página con el
+cliente de pruebas de Flask como la pediría un navegador (Accept-Encoding
+gzip y br) y sigue los <link href> y <script src> que tiene:
+
+- los propios (/static, /estaticos) se piden igual y se cuentan los bytes
+  que viajan; los que vienen con Cache-Control immutable no se vuelven a
+  pedir en las visitas siguientes, los otros se revalidan (un pedido más);
+- los de terceros (CDN) se cuentan como pedidos; sus bytes solo con --red,
+  que los baja de verdad.
+
+Las fuentes que referencian las hojas de estilo no se cuentan: el
+navegador baja solo las que usa la página.
+
+    python benchmarks/estaticos.py --alumnos 200
+    python benchmarks/estaticos.py --comparar benchmarks/resultados/estaticos-anterior.json
+
+Usa siempre SQLite, en un archivo propio que se borra al empezar
+(benchmarks/estaticos.db).
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import urllib.request
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+sys.path.insert(0, RAIZ)
+
+BASE = os.path.join(DIRECTORIO, 'estaticos.db')
+
+PAGINAS = ('/', '/alumnos', '/asistencia', '/asistencias_hoy', '/reportes')
+
+NAVEGADOR = {'Accept-Encoding': 'gzip, deflate, br'}
+
+REFERENCIAS = re.compile(r'<(?:link[^>]*\bhref|script[^>]*\bsrc)="([^"]+)"')
+
+
+def bajar(url):
+    """Bytes transferidos de una URL de terceros (pidiendo gzip), o None si no se pudo"""
+    pedido = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip', 'User-Agent': 'yoga-benchmark'})
+    try:
+        with urllib.request.urlopen(pedido, timeout=20) as respuesta:
+            return len(respuesta.read())
+    except OSError:
+        return None
+
+
+def medir_pagina(cliente, ruta, red, terceros):
+    """Bytes y pedidos de una página en la primera visita y en las siguientes"""
+    respuesta = cliente.get(ruta, headers=NAVEGADOR)
+    html = respuesta.get_data()
+    if respuesta.headers.get('Content-Encoding') == 'gzip':
+        texto = gzip.decompress(html)
+    elif respuesta.headers.get('Content-Encoding') == 'br':
+        import brotli
+
+        texto = brotli.decompress(html)
+    else:
+        texto = html
+    texto = texto.decode('utf-8')
+    en_linea = re.findall(r'<(style|script)>(.*?)</\1>', texto, flags=re.S)
+
+    resultado = {
+        'html_bytes': len(texto.encode('utf-8')),
+        'html_transferidos': len(html),
+        'en_linea_bytes': sum(len(contenido.encode('utf-8')) for _, contenido in en_linea),
+        'primera': {'pedidos': 1, 'bytes': len(html), 'terceros': 0, 'terceros_sin_medir': 0},
+        'siguientes': {'pedidos': 1, 'bytes': len(html)},
+    }
+    for url in REFERENCIAS.findall(texto):
+        primera = resultado['primera']
+        primera['pedidos'] += 1
+        if url.startswith(('http:', 'https:', '//')):
+            primera['terceros'] += 1
+            if red and url not in terceros:
+                terceros[url] = bajar(url)
+            if terceros.get(url) is None:
+                primera['terceros_sin_medir'] += 1
+            else:
+                primera['bytes'] += terceros[url]
+            continue
+        estatico = cliente.get(url, headers=NAVEGADOR)
+        primera['bytes'] += len(estatico.get_data())
+        if 'immutable' not in estatico.headers.get('Cache-Control', ''):
+            resultado['siguientes']['pedidos'] += 1
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bytes y pedidos por página')
+    parser.add_argument('--alumnos', type=int, default=200, help='alumnos a cargar (200)')
+    parser.add_argument('--red', action='store_true', help='bajar los archivos de las CDN para contar sus bytes')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior contra el que comparar')
+    parser.add_argument('--salida', help='archivo JSON de resultados (benchmarks/resultados/estaticos-<fecha>.json)')
+    args = parser.parse_args(argv)
+
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['SQLITE_PATH'] = BASE
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(BASE + sufijo):
+            os.remove(BASE + sufijo)
+    import sembrar
+
+    sembrar.sembrar(args.alumnos, 1)
+    import app as aplicacion
+
+    cliente = aplicacion.create_app().test_client()
+    terceros = {}
+    paginas = {ruta: medir_pagina(cliente, ruta, args.red, terceros) for ruta in PAGINAS}
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)['paginas']
+
+    print(f"{'página':18} {'HTML':>8} {'viajan':>8} {'en línea':>9} {'pedidos 1ª':>11} {'terceros':>9} "
+          f"{'bytes 1ª':>9} {'pedidos sig.':>13} {'bytes sig.':>11}")
+    for ruta, datos in paginas.items():
+        primera, siguientes = datos['primera'], datos['siguientes']
+        sin_medir = '+?' if primera['terceros_sin_medir'] else ''
+        print(f"{ruta:18} {datos['html_bytes']:>8} {datos['html_transferidos']:>8} {datos['en_linea_bytes']:>9} "
+              f"{primera['pedidos']:>11} {primera['terceros']:>9} {str(primera['bytes']) + sin_medir:>9} "
+              f"{siguientes['pedidos']:>13} {siguientes['bytes']:>11}")
+        if anterior and ruta in anterior:
+            antes = anterior[ruta]
+            sin_medir = '+?' if antes['primera']['terceros_sin_medir'] else ''
+            print(f"{'  antes':18} {antes['html_bytes']:>8} {antes['html_transferidos']:>8} "
+                  f"{antes['en_linea_bytes']:>9} {antes['primera']['pedidos']:>11} "
+                  f"{antes['primera']['terceros']:>9} {str(antes['primera']['bytes']) + sin_medir:>9} "
+                  f"{antes['siguientes']['pedidos']:>13} {antes['siguientes']['bytes']:>11}")
+    if any(datos['primera']['terceros_sin_medir'] for datos in paginas.values()):
+        print('\n+? : más los bytes de las CDN, sin medir (usar --red)')
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'alumnos': args.alumnos,
+        'terceros': terceros,
+        'paginas': paginas,
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO, 'resultados', f"estaticos-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memoria y tiempo de armar las filas de un resultado grande
+
+Compara, para un SELECT de N filas con las columnas del roster, las tres
+formas de fila que tuvo la aplicación:
+
+- dict         dict(zip(columnas, fila)), lo que hacía execute_query en PostgreSQL
+- sqlite3.Row  lo que devolvía en SQLite
+- Fila         basedatos.Fila, la que usan hoy los dos motores
+
+La memoria es la que queda retenida por la lista de filas (tracemalloc).
+Los valores pesan lo mismo en todos los casos, así que se mide también
+la tupla simple del driver como piso: la columna "extra" es lo que agrega
+cada forma de fila por encima de ella. El tiempo es el mejor de varias
+repeticiones de fetchall + conversión.
+
+    python benchmarks/filas.py --filas 10000
+    python benchmarks/filas.py --database-url postgresql://localhost/yoga_bench
+
+Con --database-url se mide también PostgreSQL (dict contra Fila); la
+consulta usa generate_series, no lee ni escribe tablas.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORIO))
+
+import basedatos  # noqa: E402
+
+SQL_SQLITE = '''
+    WITH RECURSIVE serie(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM serie WHERE n < ?)
+    SELECT n AS id, 'Nombre ' || n AS nombre, 'Apellido ' || n AS apellido,
+           CASE WHEN n % 3 = 0 THEN NULL ELSE n % 2 END AS presente
+    FROM serie
+'''
+
+SQL_POSTGRESQL = '''
+    SELECT n AS id, 'Nombre ' || n AS nombre, 'Apellido ' || n AS apellido,
+           CASE WHEN n %% 3 = 0 THEN NULL ELSE n %% 2 = 1 END AS presente
+    FROM generate_series(1, %s) AS n
+'''
+
+
+def como_dicts(cursor):
+    columnas = [desc[0] for desc in cursor.description]
+    return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def como_tuplas(cursor):
+    return cursor.fetchall()
+
+
+def medir(abrir_cursor, convertir, repeticiones):
+    """(bytes retenidos por la lista de filas, mejor tiempo en segundos)"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        cursor = abrir_cursor()
+        inicio = time.perf_counter()
+        convertir(cursor)
+        mejor = min(mejor, time.perf_counter() - inicio)
+        cursor.close()
+
+    cursor = abrir_cursor()
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    filas = convertir(cursor)
+    retenidos = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    cursor.close()
+    del filas
+    return retenidos, mejor
+
+
+def comparar_sqlite(n, repeticiones):
+    conn = sqlite3.connect(':memory:')
+
+    def cursor_con(row_factory):
+        def abrir():
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory
+            cursor.execute(SQL_SQLITE, (n,))
+            return cursor
+        return abrir
+
+    resultados = {
+        'tupla': medir(cursor_con(None), como_tuplas, repeticiones),
+        'dict': medir(cursor_con(None), como_dicts, repeticiones),
+        'sqlite3.Row': medir(cursor_con(sqlite3.Row), como_tuplas, repeticiones),
+        'Fila': medir(cursor_con(None), basedatos.filas, repeticiones),
+    }
+    conn.close()
+    return resultados
+
+
+def comparar_postgresql(database_url, n, repeticiones):
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+
+    def abrir():
+        cursor = conn.cursor()
+        cursor.execute(SQL_POSTGRESQL, (n,))
+        return cursor
+
+    resultados = {
+        'tupla': medir(abrir, como_tuplas, repeticiones),
+        'dict': medir(abrir, como_dicts, repeticiones),
+        'Fila': medir(abrir, basedatos.filas, repeticiones),
+    }
+    conn.close()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memoria y tiempo por forma de fila')
+    parser.add_argument('--filas', type=int, default=10000, help='filas del resultado (10000)')
+    parser.add_argument('--repeticiones', type=int, default=5, help='repeticiones para el tiempo (5)')
+    parser.add_argument('--database-url', help='PostgreSQL para medir también ese motor')
+    parser.add_argument('--salida', help='archivo JSON de resultados (benchmarks/resultados/filas-<fecha>.json)')
+    args = parser.parse_args(argv)
+
+    motores = {'sqlite': comparar_sqlite(args.filas, args.repeticiones)}
+    if args.database_url:
+        motores['postgresql'] = comparar_postgresql(args.database_url, args.filas, args.repeticiones)
+
+    resultado = {'fecha': datetime.now().isoformat(timespec='seconds'), 'filas': args.filas, 'motores': {}}
+    print(f"{'motor':<12}{'forma':<14}{'KiB':>10}{'bytes/fila':>12}{'extra/fila':>12}{'ms':>9}")
+    for motor, formas in motores.items():
+        resultado['motores'][motor] = {}
+        piso = formas['tupla'][0]
+        for forma, (retenidos, segundos) in formas.items():
+            resultado['motores'][motor][forma] = {
+                'bytes': retenidos,
+                'bytes_por_fila': round(retenidos / args.filas, 1),
+                'extra_por_fila': round((retenidos - piso) / args.filas, 1),
+                'ms': round(segundos * 1000, 2),
+            }
+            print(f"{motor:<12}{forma:<14}{retenidos / 1024:>10.0f}{retenidos / args.filas:>12.1f}"
+                  f"{(retenidos - piso) / args.filas:>12.1f}{segundos * 1000:>9.2f}")
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO, 'resultados', f"filas-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carga de datos sintéticos para los benchmarks
+
+Genera un roster de N alumnos y, para cada día de clase (lunes a sábado)
+de los últimos meses, marca a cada alumno con probabilidad prob_marcado
+(presente con probabilidad prob_presente). Incluye el día de hoy y
+reconstruye el acumulado mensual al final.
+
+Usa la base configurada como la aplicación (DATABASE_URL o SQLite); sin
+DATABASE_URL los benchmarks apuntan SQLITE_PATH a benchmarks/bench.db.
+
+    python benchmarks/sembrar.py --alumnos 5000 --meses 6 --limpiar
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORIO))
+if not os.environ.get('DATABASE_URL'):
+    os.environ.setdefault('SQLITE_PATH', os.path.join(DIRECTORIO, 'bench.db'))
+
+import asistencia_mensual  # noqa: E402
+import db_pool  # noqa: E402
+import migraciones  # noqa: E402
+import particiones  # noqa: E402
+
+NOMBRES = [
+    'Ana', 'Lucía', 'Sofía', 'Valentina', 'Camila', 'Martina', 'Julieta', 'Paula',
+    'Carla', 'Laura', 'María', 'Elena', 'Juan', 'Pedro', 'Luis', 'Carlos', 'Diego',
+    'Martín', 'Pablo', 'Andrés', 'Tomás', 'Nicolás', 'Mateo', 'Santiago',
+]
+APELLIDOS = [
+    'García', 'Fernández', 'González', 'Rodríguez', 'López', 'Martínez', 'Pérez',
+    'Sánchez', 'Romero', 'Díaz', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores',
+    'Acosta', 'Benítez', 'Medina', 'Herrera', 'Suárez', 'Aguirre', 'Giménez',
+    'Molina', 'Castro', 'Ortiz', 'Silva', 'Núñez', 'Luna', 'Rojas', 'Sosa',
+]
+
+# Filas de asistencia por lote de inserción
+LOTE = 20000
+
+
+def _limpiar(cursor, dialecto):
+    if dialecto == 'postgresql':
+        cursor.execute('TRUNCATE asistencias_mensuales, asistencias, alumnos RESTART IDENTITY CASCADE')
+    else:
+        # asistencias es una vista: se vacían las tablas de cada año
+        for tabla in ['asistencias_mensuales'] + particiones.listar() + ['alumnos']:
+            cursor.execute(f'DELETE FROM {tabla}')
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'alumnos'")
+
+
+def _insertar(cursor, dialecto, tabla, columnas, filas):
+    if not filas:
+        return
+    if dialecto == 'postgresql':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        marcadores = ', '.join('?' * len(columnas))
+        cursor.executemany(f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({marcadores})", filas)
+
+
+def dias_de_clase(meses, hasta=None):
+    """Fechas de lunes a sábado de los últimos `meses` meses (30 días cada uno)"""
+    hasta = hasta or date.today()
+    dia = hasta - timedelta(days=30 * meses)
+    while dia <= hasta:
+        if dia.weekday() != 6:
+            yield dia
+        dia += timedelta(days=1)
+
+
+def sembrar(alumnos, meses, prob_marcado=0.35, prob_presente=0.85, semilla=1, limpiar=False):
+    """Cargar el roster y su asistencia; devuelve un dict con los conteos"""
+    migraciones.migrar()
+    dialecto = db_pool.get_pool().dialecto
+    azar = random.Random(semilla)
+    inicio = time.perf_counter()
+    hoy = date.today()
+    particiones.asegurar(hoy - timedelta(days=30 * meses), hoy)
+
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            if limpiar:
+                _limpiar(cursor, dialecto)
+            else:
+                cursor.execute('SELECT COUNT(*) FROM alumnos')
+                if cursor.fetchone()[0]:
+                    raise RuntimeError('La base ya tiene alumnos: usa --limpiar para vaciarla')
+
+            roster = []
+            for i in range(alumnos):
+                roster.append((
+                    azar.choice(NOMBRES),
+                    azar.choice(APELLIDOS),
+                    f'11{azar.randrange(10 ** 8):08d}',
+                    (hoy - timedelta(days=azar.randrange(30 * meses + 1))).isoformat(),
+                ))
+            _insertar(cursor, dialecto, 'alumnos', ('nombre', 'apellido', 'telefono', 'fecha_registro'), roster)
+
+            cursor.execute('SELECT id FROM alumnos ORDER BY id')
+            ids = [fila[0] for fila in cursor.fetchall()]
+
+            # Filas pendientes por tabla: en SQLite cada año tiene la suya
+            total = 0
+            pendientes = {}
+            for dia in dias_de_clase(meses, hoy):
+                iso = dia.isoformat()
+                tabla = particiones.tabla_de(dia)
+                filas = pendientes.setdefault(tabla, [])
+                for alumno_id in ids:
+                    if azar.random() < prob_marcado:
+                        presente = azar.random() < prob_presente
+                        filas.append((alumno_id, iso, presente if dialecto == 'postgresql' else int(presente)))
+                if len(filas) >= LOTE:
+                    _insertar(cursor, dialecto, tabla, ('alumno_id', 'fecha', 'presente'), filas)
+                    total += len(filas)
+                    pendientes[tabla] = []
+            for tabla, filas in pendientes.items():
+                _insertar(cursor, dialecto, tabla, ('alumno_id', 'fecha', 'presente'), filas)
+                total += len(filas)
+        finally:
+            cursor.close()
+
+    mensuales = asistencia_mensual.reconstruir()
+    return {
+        'dialecto': dialecto,
+        'alumnos': alumnos,
+        'meses': meses,
+        'asistencias': total,
+        'asistencias_mensuales': mensuales,
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cargar datos sintéticos para los benchmarks')
+    parser.add_argument('--alumnos', type=int, default=1000, help='alumnos del roster (1000)')
+    parser.add_argument('--meses', type=int, default=6, help='meses de asistencia hacia atrás (6)')
+    parser.add_argument('--prob-marcado', type=float, default=0.35,
+                        help='probabilidad de que un alumno tenga marca en un día de clase (0.35)')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--limpiar', action='store_true', help='vaciar alumnos y asistencias antes de cargar')
+    args = parser.parse_args(argv)
+
+    resultado = sembrar(args.alumnos, args.meses, prob_marcado=args.prob_marcado,
+                        semilla=args.semilla, limpiar=args.limpiar)
+    print(f"{resultado['alumnos']} alumnos, {resultado['asistencias']} asistencias, "
+          f"{resultado['asistencias_mensuales']} filas mensuales en {resultado['dialecto']} "
+          f"({resultado['segundos']}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache en memoria del proceso para el roster y la asistencia del día
+
+Cada entrada vence a los CACHE_TTL segundos y, si se supera
+CACHE_MAX_ENTRADAS, se desaloja la usada hace más tiempo. Las rutas que
+escriben invalidan las entradas afectadas.
+
+Con varios workers de gunicorn cada uno tiene su propia cache. Con
+PostgreSQL cada worker escucha los avisos de cambios (eventos.Escucha) e
+invalida la suya con lo que escriben los demás; con SQLite los avisos no
+salen del proceso, así que en otros procesos sobre el mismo archivo un
+dato puede quedar viejo como máximo CACHE_TTL segundos.
+
+Además del roster se cachean el HTML de las tarjetas de asistencia
+(tarjetas) y los estados de las últimas versiones del roster
+(versiones), que /asistencia/cambios usa para mandar solo lo que cambió.
+Las dos se buscan por contenido (el estado del alumno, el ETag del
+roster), así que no quedan viejas: alcanza con invalidar el roster.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class Entrada:
+    """Valor cacheado con su huella (ETag) y el momento en que se leyó"""
+
+    __slots__ = ('valor', 'etag', 'modificado', 'expira')
+
+    def __init__(self, valor, ttl):
+        self.valor = valor
+        # La huella depende solo del contenido: dos workers que leen los
+        # mismos datos generan el mismo ETag
+        contenido = json.dumps(valor, default=str, sort_keys=True).encode('utf-8')
+        self.etag = hashlib.blake2b(contenido, digest_size=12).hexdigest()
+        self.modificado = datetime.now(timezone.utc).replace(microsecond=0)
+        self.expira = time.monotonic() + ttl
+
+
+class CacheTTL:
+    """Cache LRU con vencimiento, segura entre hilos
+
+    Las claves son tuplas cuyo primer elemento es el tipo de dato
+    ('asistencia', 'alumnos', ...), que es lo que se usa para invalidar.
+    """
+
+    def __init__(self, max_entradas=256, ttl=30.0):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        # Cuenta las invalidaciones: lo que se calculó antes de una no se guarda
+        self._generacion = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'vencidas': 0,
+            'desalojadas': 0,
+            'invalidadas': 0,
+        }
+
+    def obtener(self, clave):
+        """Entrada vigente para la clave, o None"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self._stats['misses'] += 1
+                return None
+            if entrada.expira <= time.monotonic():
+                del self._datos[clave]
+                self._stats['vencidas'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._datos.move_to_end(clave)
+            self._stats['hits'] += 1
+            return entrada
+
+    def guardar(self, clave, valor, generacion=None):
+        """Guardar el valor; si se pasa generacion y desde entonces hubo una invalidación, no se guarda"""
+        entrada = Entrada(valor, self.ttl)
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return entrada
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._stats['desalojadas'] += 1
+        return entrada
+
+    def obtener_o_calcular(self, clave, calcular):
+        """Entrada cacheada o, si no hay, calcular() y guardarla
+
+        Si calcular() devuelve None (error de base de datos) no se cachea nada
+        y se devuelve None. Si mientras se calculaba llegó una invalidación
+        (otro worker escribió), el valor se devuelve pero no se guarda:
+        puede haberse leído antes del cambio.
+        """
+        entrada = self.obtener(clave)
+        if entrada is not None:
+            return entrada
+        with self._lock:
+            generacion = self._generacion
+        valor = calcular()
+        if valor is None:
+            return None
+        return self.guardar(clave, valor, generacion)
+
+    def invalidar(self, *tipos):
+        """Borrar las entradas de esos tipos (o todas si no se indica ninguno)"""
+        with self._lock:
+            self._generacion += 1
+            if not tipos:
+                borradas = len(self._datos)
+                self._datos.clear()
+            else:
+                claves = [clave for clave in self._datos if clave[0] in tipos]
+                for clave in claves:
+                    del self._datos[clave]
+                borradas = len(claves)
+            self._stats['invalidadas'] += borradas
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos['entradas'] = len(self._datos)
+        consultas = datos['hits'] + datos['misses']
+        datos['hit_ratio'] = round(datos['hits'] / consultas, 3) if consultas else 0.0
+        datos['max_entradas'] = self.max_entradas
+        datos['ttl'] = self.ttl
+        return datos
+
+
+class CacheFragmentos:
+    """Cache LRU de fragmentos HTML, sin vencimiento
+
+    La clave incluye todo lo que se muestra en el fragmento, así que una
+    entrada nunca queda vieja: no hace falta invalidar ni calcular ETag.
+    """
+
+    def __init__(self, max_entradas=4096):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'desalojadas': 0}
+
+    def obtener_o_renderizar(self, clave, renderizar):
+        with self._lock:
+            html = self._datos.get(clave)
+            if html is not None:
+                self._datos.move_to_end(clave)
+                self._stats['hits'] += 1
+                return html
+            self._stats['misses'] += 1
+        html = renderizar()
+        with self._lock:
+            self._datos[clave] = html
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._stats['desalojadas'] += 1
+        return html
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos['entradas'] = len(self._datos)
+        consultas = datos['hits'] + datos['misses']
+        datos['hit_ratio'] = round(datos['hits'] / consultas, 3) if consultas else 0.0
+        datos['max_entradas'] = self.max_entradas
+        return datos
+
+
+def _env_num(nombre, defecto, tipo=float):
+    try:
+        return tipo(os.environ.get(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+roster = CacheTTL(
+    max_entradas=_env_num('CACHE_MAX_ENTRADAS', 256, int),
+    ttl=_env_num('CACHE_TTL', 30.0),
+)
+
+# HTML de cada tarjeta de /asistencia por (alumno, nombre, estado)
+tarjetas = CacheFragmentos(max_entradas=_env_num('CACHE_FRAGMENTOS', 4096, int))
+
+# Estados de las últimas versiones del roster del día, por ETag: lo que
+# tiene en pantalla un cliente que pide /asistencia/cambios?version=...
+versiones = CacheTTL(max_entradas=64, ttl=600.0)
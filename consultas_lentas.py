@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de consultas lentas con su plan de ejecución
+
+Desactivado salvo que se defina CONSULTAS_LENTAS_MS. Toda sentencia que
+tarde al menos ese umbral se imprime en el log con su duración y la forma
+de sus parámetros (tipos y largos, nunca los valores) y se guarda en un
+buffer circular que muestra /admin/consultas_lentas.
+
+A una muestra de las lentas (CONSULTAS_LENTAS_MUESTREO, como máximo una
+vez por minuto por sentencia) se le captura el plan en la misma conexión:
+
+- PostgreSQL: EXPLAIN (ANALYZE, BUFFERS) para SELECT; para el resto
+  (incluido el EXECUTE de una sentencia preparada), EXPLAIN sin ANALYZE,
+  que no ejecuta la sentencia. Dentro de una
+  transacción se hace en un SAVEPOINT para no abortarla si falla.
+- SQLite: EXPLAIN QUERY PLAN.
+
+Variables de entorno:
+    CONSULTAS_LENTAS_MS         umbral en milisegundos (sin definir: apagado)
+    CONSULTAS_LENTAS_MUESTREO   fracción de consultas lentas con EXPLAIN (0.1)
+    CONSULTAS_LENTAS_MAX        entradas que guarda el buffer (100)
+"""
+
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+def _env_num(nombre, defecto, tipo=float):
+    try:
+        return tipo(os.environ.get(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+_umbral_ms = _env_num('CONSULTAS_LENTAS_MS', 0.0)
+# Umbral en segundos; infinito si está apagado, así el chequeo en el cursor
+# es una sola comparación
+UMBRAL = _umbral_ms / 1000.0 if _umbral_ms > 0 else float('inf')
+MUESTREO = _env_num('CONSULTAS_LENTAS_MUESTREO', 0.1)
+MAX_ENTRADAS = _env_num('CONSULTAS_LENTAS_MAX', 100, int)
+
+# Segundos mínimos entre dos EXPLAIN de la misma sentencia
+INTERVALO_EXPLAIN = 60.0
+
+MAX_SQL = 4000
+
+_entradas = deque(maxlen=MAX_ENTRADAS)
+_ultimo_explain = {}
+_lock = threading.Lock()
+_local = threading.local()
+_stats = {'lentas': 0, 'explicadas': 0, 'errores_explain': 0}
+
+
+def activo():
+    return UMBRAL != float('inf')
+
+
+def _normalizar(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def forma_parametros(parametros, lote=False):
+    """Describir los parámetros sin exponer sus valores: (int, str[12], list[500])"""
+    if parametros is None:
+        return None
+    if lote:
+        # Un generador ya se consumió al ejecutar: no se puede describir
+        if not isinstance(parametros, (list, tuple)):
+            return 'iterador'
+        return f'{len(parametros)} filas de {forma_parametros(parametros[0])}' if parametros else '0 filas'
+    if isinstance(parametros, dict):
+        return '{' + ', '.join(f'{clave}: {_forma(valor)}' for clave, valor in parametros.items()) + '}'
+    if isinstance(parametros, (list, tuple)):
+        return '(' + ', '.join(_forma(valor) for valor in parametros) + ')'
+    return _forma(parametros)
+
+
+def _forma(valor):
+    if isinstance(valor, (str, bytes, list, tuple, set)):
+        return f'{type(valor).__name__}[{len(valor)}]'
+    return type(valor).__name__
+
+
+def _ruta():
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return None
+    if has_request_context():
+        return f'{request.method} {request.path}'
+    return None
+
+
+def registrar(cursor, sql, parametros, duracion, lote=False):
+    """Anotar una sentencia lenta (lo llama db_pool después de ejecutarla)"""
+    # Los EXPLAIN se ejecutan con el mismo tipo de cursor: no registrarlos
+    if getattr(_local, 'explicando', False):
+        return
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+    if not isinstance(sql, str):
+        sql = str(sql)
+
+    texto = _normalizar(sql)
+    entrada = {
+        'momento': datetime.now().isoformat(timespec='seconds'),
+        'ms': round(duracion * 1000, 2),
+        'sql': texto[:MAX_SQL],
+        'parametros': forma_parametros(parametros, lote),
+        'ruta': _ruta(),
+        'plan': None,
+        'plan_error': None,
+    }
+    print(f"Consulta lenta ({entrada['ms']} ms) {entrada['ruta'] or ''}: "
+          f"{texto[:300]} parámetros={entrada['parametros']}")
+
+    clave = texto[:MAX_SQL]
+    ahora = time.monotonic()
+    with _lock:
+        _stats['lentas'] += 1
+        explicar = (not lote and random.random() < MUESTREO
+                    and ahora - _ultimo_explain.get(clave, -INTERVALO_EXPLAIN) >= INTERVALO_EXPLAIN)
+        if explicar:
+            if len(_ultimo_explain) >= 10 * MAX_ENTRADAS:
+                _ultimo_explain.clear()
+            _ultimo_explain[clave] = ahora
+
+    if explicar:
+        _local.explicando = True
+        try:
+            entrada['plan'] = _explicar(cursor, sql, parametros)
+        except Exception as e:
+            entrada['plan_error'] = str(e).strip()
+        finally:
+            _local.explicando = False
+
+    with _lock:
+        if entrada['plan'] is not None:
+            _stats['explicadas'] += 1
+        elif entrada['plan_error'] is not None:
+            _stats['errores_explain'] += 1
+        _entradas.append(entrada)
+
+
+def _explicar(cursor, sql, parametros):
+    conn = cursor.connection
+    instruccion = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if instruccion not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'EXECUTE'):
+        return None
+
+    if isinstance(conn, sqlite3.Connection):
+        explain = conn.cursor()
+        try:
+            explain.execute('EXPLAIN QUERY PLAN ' + sql, parametros or ())
+            return _arbol_sqlite(explain.fetchall())
+        finally:
+            explain.close()
+
+    # Solo un SELECT simple se ejecuta con ANALYZE (un WITH o el EXECUTE de
+    # una sentencia preparada pueden escribir); los cursores con nombre
+    # (exportación) tampoco, porque recorren todo
+    analizar = instruccion == 'SELECT' and getattr(cursor, 'name', None) is None
+    prefijo = 'EXPLAIN (ANALYZE, BUFFERS) ' if analizar else 'EXPLAIN '
+
+    import psycopg2.extensions
+
+    en_transaccion = conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    explain = conn.cursor()
+    try:
+        if en_transaccion:
+            explain.execute('SAVEPOINT consultas_lentas')
+        try:
+            explain.execute(prefijo + sql, parametros)
+            plan = '\n'.join(fila[0] for fila in explain.fetchall())
+        except Exception:
+            if en_transaccion:
+                explain.execute('ROLLBACK TO SAVEPOINT consultas_lentas')
+            raise
+        finally:
+            if en_transaccion:
+                explain.execute('RELEASE SAVEPOINT consultas_lentas')
+        return plan
+    finally:
+        explain.close()
+
+
+def _arbol_sqlite(filas):
+    """Indentar las filas (id, parent, notused, detail) de EXPLAIN QUERY PLAN"""
+    niveles = {0: -1}
+    lineas = []
+    for fila in filas:
+        id_, padre, detalle = fila[0], fila[1], fila[3]
+        niveles[id_] = niveles.get(padre, -1) + 1
+        lineas.append('  ' * niveles[id_] + detalle)
+    return '\n'.join(lineas)
+
+
+def entradas():
+    """Consultas lentas guardadas, de la más reciente a la más vieja"""
+    with _lock:
+        return list(reversed(_entradas))
+
+
+def limpiar():
+    with _lock:
+        _entradas.clear()
+        _ultimo_explain.clear()
+
+
+def stats():
+    with _lock:
+        datos = dict(_stats)
+        datos['guardadas'] = len(_entradas)
+    datos.update({
+        'activo': activo(),
+        'umbral_ms': _umbral_ms if activo() else None,
+        'muestreo': MUESTREO,
+        'max_entradas': MAX_ENTRADAS,
+    })
+    return datos
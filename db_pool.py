@@ -0,0 +1,849 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool de conexiones para el Sistema de Asistencia Yoga
+
+- PostgreSQL: pool thread-safe con tamaño mínimo/máximo, chequeo de salud
+  al entregar una conexión y reciclado de conexiones viejas.
+- SQLite: una conexión persistente por hilo, en modo WAL, y un solo
+  hilo por proceso escribiendo a la vez (TurnosEscritura).
+
+La configuración se toma del entorno:
+    DATABASE_URL              URL de PostgreSQL (si falta, se usa SQLite)
+    SQLITE_PATH               archivo de la base SQLite (asistencia_yoga.db)
+    DB_POOL_MIN               conexiones abiertas al iniciar (1)
+    DB_POOL_MAX               conexiones máximas por proceso (10)
+    DB_POOL_TIMEOUT           segundos de espera por una conexión libre (10)
+    DB_POOL_MAX_LIFETIME      segundos antes de reciclar una conexión (1800)
+    DB_POOL_HEALTHCHECK_IDLE  segundos ociosa antes de verificarla con SELECT 1 (30)
+    SQLITE_BUSY_TIMEOUT       milisegundos de espera si otro proceso está escribiendo (5000)
+    SQLITE_TURNO_TIMEOUT      segundos de espera por el turno de escritura del proceso (10)
+    SQLITE_CACHE_KB           cache de páginas por conexión, en KB (8192)
+    SQLITE_MMAP_MB            parte del archivo leída con mmap, en MB (256)
+    DATABASE_URL_REPLICA      réplica de solo lectura (PostgreSQL, o sqlite:///ruta)
+    DB_REPLICA_MAX_LAG        segundos de atraso de la réplica tolerados (10)
+    DB_REPLICA_CHEQUEO        segundos entre mediciones del atraso (5)
+    DB_LECTURA_PROPIA         segundos después de escribir en que se lee del primario (5)
+
+Con réplica, conexion_lectura() presta una conexión de la réplica para
+consultas de solo lectura, salvo que convenga leer del primario: dentro
+de una transacción, en un pedido que escribió o que viene de escribir
+(leer_del_primario), si este proceso escribió hace menos de
+DB_LECTURA_PROPIA segundos, o si la réplica está atrasada o no responde.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import consultas_lentas
+import metricas
+
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'asistencia_yoga.db')
+
+# Sentencias compiladas que sqlite3 conserva por conexión (ver basedatos)
+CACHE_SENTENCIAS_SQLITE = 256
+
+
+class PoolAgotadoError(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+class TurnoAgotadoError(PoolAgotadoError):
+    """El turno de escritura de SQLite no llegó dentro del tiempo de espera"""
+
+
+def _medir(ejecutar, cursor, sql, parametros, lote=False):
+    """Ejecutar la sentencia informando su duración a metricas y consultas_lentas"""
+    inicio = time.perf_counter()
+    try:
+        resultado = ejecutar(sql, parametros)
+    finally:
+        duracion = time.perf_counter() - inicio
+        metricas.registrar_consulta(duracion)
+    if duracion >= consultas_lentas.UMBRAL:
+        consultas_lentas.registrar(cursor, sql, parametros, duracion, lote)
+    return resultado
+
+
+class CursorSQLite(sqlite3.Cursor):
+    """Cursor que mide cada sentencia (ver _medir)"""
+
+    def execute(self, sql, parametros=()):
+        return _medir(super().execute, self, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return _medir(super().executemany, self, sql, parametros, lote=True)
+
+
+class ConexionSQLite(sqlite3.Connection):
+    def cursor(self, factory=CursorSQLite):
+        return super().cursor(factory)
+
+
+_cursor_postgres = None
+
+
+def cursor_postgres():
+    """Clase de cursor psycopg2 que mide cada sentencia (se crea al primer uso)"""
+    global _cursor_postgres
+    if _cursor_postgres is None:
+        import psycopg2.extensions
+
+        class CursorPostgres(psycopg2.extensions.cursor):
+            def execute(self, query, vars=None):
+                return _medir(super().execute, self, query, vars)
+
+            def executemany(self, query, vars_list):
+                return _medir(super().executemany, self, query, vars_list, lote=True)
+
+            def copy_expert(self, sql, file, size=8192):
+                inicio = time.perf_counter()
+                try:
+                    return super().copy_expert(sql, file, size)
+                finally:
+                    metricas.registrar_consulta(time.perf_counter() - inicio)
+
+        _cursor_postgres = CursorPostgres
+    return _cursor_postgres
+
+
+class TurnosEscritura:
+    """Cola FIFO de escritores: un solo hilo del proceso escribe a la vez
+
+    SQLite admite un solo escritor por archivo. Si varios hilos piden la
+    escritura juntos, los que pierden reintentan a ciegas dentro del busy
+    timeout; con la cola esperan su turno en orden sin tocar el archivo y
+    solo compiten con los otros procesos (los workers de gunicorn), que
+    esperan con el busy timeout.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ocupado = False
+        self._cola = deque()
+
+    def esperar(self, timeout=None):
+        """Esperar el turno; devuelve True si hubo que esperar
+
+        Si pasan timeout segundos sin que llegue, sale de la cola y lanza
+        TurnoAgotadoError: un hilo no queda colgado para siempre detrás de
+        una escritura que no termina.
+        """
+        with self._lock:
+            if not self._ocupado:
+                self._ocupado = True
+                return False
+            turno = threading.Event()
+            self._cola.append(turno)
+        if turno.wait(timeout):
+            return True
+        with self._lock:
+            # liberar() pudo pasarle el turno justo después del timeout
+            if turno.is_set():
+                return True
+            self._cola.remove(turno)
+        raise TurnoAgotadoError(f'Sin turno de escritura después de {timeout}s')
+
+    def liberar(self):
+        """Pasar el turno al siguiente de la cola (sin despertar a los demás)"""
+        with self._lock:
+            if self._cola:
+                self._cola.popleft().set()
+            else:
+                self._ocupado = False
+
+
+def _stats_vacias():
+    return {
+        'checkouts': 0,
+        'esperas': 0,
+        'tiempo_espera_total': 0.0,
+        'tiempo_espera_max': 0.0,
+        'agotado': 0,
+        'creadas': 0,
+        'recicladas': 0,
+        'descartadas': 0,
+    }
+
+
+class PostgresPool:
+    """Pool de conexiones PostgreSQL seguro entre hilos"""
+
+    dialecto = 'postgresql'
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0,
+                 max_lifetime=1800.0, healthcheck_idle=30.0):
+        import psycopg2
+        import psycopg2.extensions
+
+        self._psycopg2 = psycopg2
+        self._idle = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = max(maxconn, minconn, 1)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.healthcheck_idle = healthcheck_idle
+
+        self._cond = threading.Condition()
+        self._libres = []    # (conn, creada_en, ultimo_uso)
+        self._en_uso = {}    # id(conn) -> creada_en
+        self._total = 0
+        self._stats = _stats_vacias()
+
+        for _ in range(minconn):
+            ahora = time.monotonic()
+            self._libres.append((self._crear(), ahora, ahora))
+            self._total += 1
+
+    def _crear(self):
+        conn = self._psycopg2.connect(self.dsn, cursor_factory=cursor_postgres())
+        conn.autocommit = True
+        with self._cond:
+            self._stats['creadas'] += 1
+        return conn
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _validar(self, conn, creada, usada):
+        """Devolver (conn, creada) sana, reemplazándola si hace falta"""
+        ahora = time.monotonic()
+        if not conn.closed and ahora - creada > self.max_lifetime:
+            self._cerrar(conn)
+            with self._cond:
+                self._stats['recicladas'] += 1
+            return self._crear(), time.monotonic()
+
+        if not conn.closed and ahora - usada > self.healthcheck_idle:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+                return conn, creada
+            except Exception:
+                self._cerrar(conn)
+        elif not conn.closed:
+            return conn, creada
+
+        with self._cond:
+            self._stats['descartadas'] += 1
+        return self._crear(), time.monotonic()
+
+    def obtener(self):
+        """Sacar una conexión del pool, esperando si están todas en uso"""
+        inicio_medicion = time.perf_counter()
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        conn = None
+        espero = False
+
+        with self._cond:
+            while True:
+                if self._libres:
+                    conn, creada, usada = self._libres.pop()
+                    break
+                if self._total < self.maxconn:
+                    self._total += 1
+                    break
+                espero = True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats['agotado'] += 1
+                    raise PoolAgotadoError(
+                        f'Sin conexiones libres después de {self.timeout}s '
+                        f'({self.maxconn} en uso)')
+                self._cond.wait(restante)
+
+            if espero:
+                espera = time.monotonic() - inicio
+                self._stats['esperas'] += 1
+                self._stats['tiempo_espera_total'] += espera
+                self._stats['tiempo_espera_max'] = max(self._stats['tiempo_espera_max'], espera)
+
+        try:
+            if conn is None:
+                conn, creada = self._crear(), time.monotonic()
+            else:
+                conn, creada = self._validar(conn, creada, usada)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._en_uso[id(conn)] = creada
+            self._stats['checkouts'] += 1
+        metricas.registrar_conexion(time.perf_counter() - inicio_medicion)
+        return conn
+
+    def devolver(self, conn, descartar=False):
+        """Devolver una conexión al pool (o cerrarla si quedó inservible)"""
+        if not descartar and not conn.closed:
+            try:
+                if conn.get_transaction_status() != self._idle:
+                    conn.rollback()
+            except Exception:
+                descartar = True
+
+        with self._cond:
+            creada = self._en_uso.pop(id(conn), time.monotonic())
+            if descartar or conn.closed:
+                self._total -= 1
+                self._stats['descartadas'] += 1
+            else:
+                self._libres.append((conn, creada, time.monotonic()))
+            self._cond.notify()
+
+        if descartar:
+            self._cerrar(conn)
+
+    @contextmanager
+    def conexion(self):
+        conn = self.obtener()
+        try:
+            yield conn
+        finally:
+            self.devolver(conn)
+
+    @contextmanager
+    def escritura(self, conn):
+        """Sin autocommit mientras dura la transacción"""
+        conn.autocommit = False
+        try:
+            yield
+        finally:
+            conn.autocommit = True
+
+    def cerrar(self):
+        """Cerrar las conexiones libres (al apagar el proceso)"""
+        with self._cond:
+            libres, self._libres = self._libres, []
+            self._total -= len(libres)
+        for conn, _, _ in libres:
+            self._cerrar(conn)
+
+    def stats(self):
+        with self._cond:
+            datos = dict(self._stats)
+            datos.update({
+                'dialecto': self.dialecto,
+                'en_uso': len(self._en_uso),
+                'libres': len(self._libres),
+                'total': self._total,
+                'min': self.minconn,
+                'max': self.maxconn,
+            })
+        return datos
+
+
+class SQLitePool:
+    """Una conexión SQLite persistente por hilo"""
+
+    dialecto = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH, busy_timeout=5000, cache_kb=8192, mmap_mb=256, turno_timeout=10.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.turno_timeout = turno_timeout
+        self.cache_kb = cache_kb
+        self.mmap_mb = mmap_mb
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexiones = []
+        self._stats = _stats_vacias()
+        self._stats.update(escrituras=0, esperas_escritura=0,
+                           tiempo_espera_escritura_total=0.0, tiempo_espera_escritura_max=0.0)
+        self._en_uso = 0
+        self._turnos = TurnosEscritura()
+
+    def _crear(self):
+        # check_same_thread=False solo para poder cerrarlas todas desde cerrar();
+        # cada conexión la usa únicamente el hilo que la creó.
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=ConexionSQLite,
+                               cached_statements=CACHE_SENTENCIAS_SQLITE, timeout=self.busy_timeout / 1000)
+        conn.row_factory = sqlite3.Row
+        # WAL: las lecturas no esperan a la escritura en curso ni la bloquean.
+        # Con WAL, synchronous=NORMAL no corrompe la base ante un corte de
+        # luz (a lo sumo se pierden las últimas transacciones confirmadas)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        conn.execute(f'PRAGMA cache_size={-int(self.cache_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_mb) * 1024 * 1024}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        with self._lock:
+            self._conexiones.append(conn)
+            self._stats['creadas'] += 1
+        return conn
+
+    def obtener(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            inicio = time.perf_counter()
+            conn = self._local.conn = self._crear()
+            self._local.profundidad = 0
+            metricas.registrar_conexion(time.perf_counter() - inicio)
+        if self._local.profundidad == 0:
+            with self._lock:
+                self._en_uso += 1
+        self._local.profundidad += 1
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return conn
+
+    def devolver(self, conn, descartar=False):
+        self._local.profundidad -= 1
+        if self._local.profundidad > 0:
+            return
+        with self._lock:
+            self._en_uso -= 1
+        if descartar:
+            with self._lock:
+                self._conexiones.remove(conn)
+                self._stats['descartadas'] += 1
+            self._local.conn = None
+            conn.close()
+        elif conn.in_transaction:
+            conn.rollback()
+
+    @contextmanager
+    def conexion(self):
+        conn = self.obtener()
+        try:
+            yield conn
+        finally:
+            self.devolver(conn)
+
+    @contextmanager
+    def escritura(self, conn):
+        """Turno de escritura del proceso y BEGIN IMMEDIATE
+
+        Con IMMEDIATE el lock de escritura del archivo se toma al empezar:
+        si otro proceso lo tiene se espera con el busy timeout, en vez de
+        fallar con "database is locked" al querer escribir después de leer.
+        """
+        if getattr(self._local, 'escribiendo', False):
+            # Transacción anidada: el turno ya es de este hilo
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            espero = self._turnos.esperar(self.turno_timeout)
+        except TurnoAgotadoError:
+            with self._lock:
+                self._stats['agotado'] += 1
+            raise
+        espera = time.perf_counter() - inicio
+        with self._lock:
+            self._stats['escrituras'] += 1
+            if espero:
+                self._stats['esperas_escritura'] += 1
+                self._stats['tiempo_espera_escritura_total'] += espera
+                self._stats['tiempo_espera_escritura_max'] = max(
+                    self._stats['tiempo_espera_escritura_max'], espera)
+        self._local.escribiendo = True
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield
+        finally:
+            self._local.escribiendo = False
+            self._turnos.liberar()
+
+    def cerrar(self):
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+        for conn in conexiones:
+            try:
+                # Estadísticas del planificador al día, como recomienda SQLite
+                conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            conn.close()
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos.update({
+                'dialecto': self.dialecto,
+                'en_uso': self._en_uso,
+                'libres': len(self._conexiones) - self._en_uso,
+                'total': len(self._conexiones),
+                'min': 0,
+                'max': None,
+            })
+        return datos
+
+
+def _env_num(nombre, defecto, tipo=float):
+    try:
+        return tipo(os.environ.get(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+def _sqlite_pool(path=SQLITE_PATH):
+    return SQLitePool(
+        path,
+        busy_timeout=_env_num('SQLITE_BUSY_TIMEOUT', 5000, int),
+        cache_kb=_env_num('SQLITE_CACHE_KB', 8192, int),
+        mmap_mb=_env_num('SQLITE_MMAP_MB', 256, int),
+        turno_timeout=_env_num('SQLITE_TURNO_TIMEOUT', 10.0),
+    )
+
+
+def _crear_pool_postgres(database_url, minconn):
+    return PostgresPool(
+        database_url,
+        minconn=minconn,
+        maxconn=_env_num('DB_POOL_MAX', 10, int),
+        timeout=_env_num('DB_POOL_TIMEOUT', 10.0),
+        max_lifetime=_env_num('DB_POOL_MAX_LIFETIME', 1800.0),
+        healthcheck_idle=_env_num('DB_POOL_HEALTHCHECK_IDLE', 30.0),
+    )
+
+
+def crear_pool():
+    """Construir el pool según DATABASE_URL"""
+    database_url = os.environ.get('DATABASE_URL')
+
+    if not database_url:
+        print("No DATABASE_URL found, using SQLite fallback")
+        return _sqlite_pool()
+
+    try:
+        pool = _crear_pool_postgres(database_url, _env_num('DB_POOL_MIN', 1, int))
+        print("Successfully connected to PostgreSQL")
+        return pool
+    except Exception as e:
+        print(f"Error conectando a PostgreSQL: {str(e)}")
+        print("Falling back to SQLite")
+        return _sqlite_pool()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools creados antes de un fork: se conservan sin cerrar para que el hijo
+# no termine las sesiones que siguen siendo del proceso padre.
+_heredados = []
+
+
+def get_pool():
+    """Pool del proceso actual (se crea la primera vez que se pide)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                if _pool is not None:
+                    _heredados.append(_pool)
+                _pool = crear_pool()
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def conexion():
+    """Context manager que presta una conexión del pool"""
+    return get_pool().conexion()
+
+
+_transacciones = threading.local()
+
+
+SQL_LAG_POSTGRES = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+
+class Replica:
+    """Pool de la réplica de lectura, su atraso y a dónde fue cada lectura
+
+    El pool se crea al primer uso y el atraso se mide como mucho cada
+    DB_REPLICA_CHEQUEO segundos (un solo hilo mide; los demás usan la
+    última medición). Si la réplica no responde se la vuelve a probar
+    después de ese mismo intervalo. Un standby de PostgreSQL informa su
+    atraso con pg_last_xact_replay_timestamp(); una base que no está en
+    recuperación (o un archivo SQLite) cuenta como al día.
+    """
+
+    def __init__(self, url, max_lag=10.0, chequeo=5.0):
+        self.url = url
+        self.max_lag = max_lag
+        self.chequeo = chequeo
+        self.pool = None
+        self._lock = threading.Lock()
+        self._lag = None
+        self._medido = None
+        self._midiendo = False
+        self._stats = {
+            'lecturas_replica': 0,
+            'lecturas_primario': 0,
+            'tiempo_replica_total': 0.0,
+            'tiempo_primario_total': 0.0,
+            'desvios_lectura_propia': 0,
+            'desvios_lag': 0,
+            'desvios_caida': 0,
+        }
+
+    def _crear_pool(self):
+        if self.url.startswith('sqlite:///'):
+            return _sqlite_pool(self.url[len('sqlite:///'):])
+        return _crear_pool_postgres(self.url, 0)
+
+    def _medir(self):
+        try:
+            if self.pool is None:
+                self.pool = self._crear_pool()
+            with self.pool.conexion() as conn:
+                if self.pool.dialecto == 'sqlite':
+                    conn.execute('SELECT 1')
+                    lag = 0.0
+                else:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(SQL_LAG_POSTGRES)
+                        lag = float(cursor.fetchone()[0])
+                    finally:
+                        cursor.close()
+        except Exception as e:
+            print(f"Réplica de lectura sin responder: {e}")
+            lag = None
+        with self._lock:
+            self._lag = lag
+            self._medido = time.monotonic()
+            self._midiendo = False
+
+    def lag(self):
+        """Último atraso medido en segundos (None si no responde); mide si toca"""
+        with self._lock:
+            vencido = self._medido is None or time.monotonic() - self._medido >= self.chequeo
+            medir = vencido and not self._midiendo
+            if medir:
+                self._midiendo = True
+            elif self._medido is None:
+                # Otro hilo está haciendo la primera medición
+                return None
+        if medir:
+            self._medir()
+        with self._lock:
+            return self._lag
+
+    def contar(self, destino, segundos, desvio=None):
+        with self._lock:
+            self._stats[f'lecturas_{destino}'] += 1
+            self._stats[f'tiempo_{destino}_total'] += segundos
+            if desvio:
+                self._stats[f'desvios_{desvio}'] += 1
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos['lag_segundos'] = self._lag if self._lag is not None else -1
+            datos['max_lag'] = self.max_lag
+        if self.pool is not None:
+            datos.update({f'pool_{clave}': valor for clave, valor in self.pool.stats().items()})
+        return datos
+
+    def cerrar(self):
+        if self.pool is not None:
+            self.pool.cerrar()
+            self.pool = None
+
+
+_replica = None
+_replica_pid = None
+_lecturas = threading.local()
+# time.monotonic() de la última escritura confirmada en este proceso
+_ultima_escritura = None
+
+
+def get_replica():
+    """Réplica del proceso actual, o None si no hay DATABASE_URL_REPLICA"""
+    global _replica, _replica_pid
+    url = os.environ.get('DATABASE_URL_REPLICA')
+    if not url:
+        return None
+    if _replica is None or _replica_pid != os.getpid():
+        with _pool_lock:
+            if _replica is None or _replica_pid != os.getpid():
+                if _replica is not None and _replica.pool is not None:
+                    _heredados.append(_replica.pool)
+                _replica = Replica(url, max_lag=_env_num('DB_REPLICA_MAX_LAG', 10.0),
+                                   chequeo=_env_num('DB_REPLICA_CHEQUEO', 5.0))
+                _replica_pid = os.getpid()
+    return _replica
+
+
+def leer_del_primario(primario):
+    """Que las lecturas de este hilo (el pedido en curso) vayan o no al primario
+
+    Se llama al empezar cada pedido; una escritura dentro del pedido lo
+    pasa a True solo.
+    """
+    _lecturas.primario = primario
+    _lecturas.escribio = False
+
+
+def escribio():
+    """Si este hilo confirmó una escritura desde el último leer_del_primario()"""
+    return getattr(_lecturas, 'escribio', False)
+
+
+def _destino_lectura(replica):
+    """('replica' o 'primario', motivo del desvío o None)"""
+    if getattr(_transacciones, 'al_confirmar', None) is not None or getattr(_lecturas, 'primario', False):
+        return 'primario', 'lectura_propia'
+    ultima = _ultima_escritura
+    if ultima is not None and time.monotonic() - ultima < _env_num('DB_LECTURA_PROPIA', 5.0):
+        return 'primario', 'lectura_propia'
+    lag = replica.lag()
+    if lag is None:
+        return 'primario', 'caida'
+    if lag > replica.max_lag:
+        return 'primario', 'lag'
+    return 'replica', None
+
+
+@contextmanager
+def conexion_lectura():
+    """Conexión para consultas de solo lectura: de la réplica si conviene, si no del primario"""
+    replica = get_replica()
+    if replica is None:
+        with conexion() as conn:
+            yield conn
+        return
+
+    destino, desvio = _destino_lectura(replica)
+    pool = replica.pool if destino == 'replica' else get_pool()
+    try:
+        conn = pool.obtener()
+    except Exception as e:
+        if destino != 'replica':
+            raise
+        print(f"Réplica de lectura sin responder: {e}")
+        destino, desvio, pool = 'primario', 'caida', get_pool()
+        conn = pool.obtener()
+    inicio = time.perf_counter()
+    try:
+        yield conn
+    finally:
+        pool.devolver(conn)
+        replica.contar(destino, time.perf_counter() - inicio, desvio)
+
+
+@contextmanager
+def transaccion_lectura():
+    """Conexión de lectura (conexion_lectura) dentro de una transacción de solo lectura
+
+    Para lo que necesita una transacción abierta sin escribir, como los
+    cursores con nombre de PostgreSQL. No toma el turno de escritura ni
+    cuenta como escritura, así que puede ir a la réplica y no manda al
+    primario las lecturas que siguen. En SQLite solo presta la conexión:
+    con WAL una lectura ve una instantánea fija sin frenar a los que
+    escriben.
+    """
+    with conexion_lectura() as conn:
+        if isinstance(conn, sqlite3.Connection):
+            yield conn
+            return
+        conn.autocommit = False
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SET TRANSACTION READ ONLY')
+            cursor.close()
+            yield conn
+        finally:
+            conn.rollback()
+            conn.autocommit = True
+
+
+@contextmanager
+def transaccion():
+    """Conexión del pool dentro de una transacción explícita
+
+    Hace commit al salir del bloque y rollback si se produce una excepción.
+    Después del commit ejecuta lo registrado con al_confirmar(). En SQLite
+    la transacción ya empieza con el lock de escritura (ver
+    SQLitePool.escritura).
+    """
+    pool = get_pool()
+    confirmar = []
+    anteriores = getattr(_transacciones, 'al_confirmar', None)
+    _transacciones.al_confirmar = confirmar
+    try:
+        with pool.conexion() as conn, pool.escritura(conn):
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        _transacciones.al_confirmar = anteriores
+
+    # Las lecturas que siguen a esta escritura no van a la réplica
+    global _ultima_escritura
+    _ultima_escritura = time.monotonic()
+    _lecturas.primario = True
+    _lecturas.escribio = True
+
+    for funcion in confirmar:
+        try:
+            funcion()
+        except Exception as e:
+            print(f"Error después de confirmar la transacción: {e}")
+
+
+def al_confirmar(funcion):
+    """Ejecutar funcion() cuando se confirme la transacción en curso de este hilo
+
+    Si la transacción se deshace no se ejecuta; fuera de una transacción se
+    ejecuta enseguida.
+    """
+    confirmar = getattr(_transacciones, 'al_confirmar', None)
+    if confirmar is None:
+        funcion()
+    else:
+        confirmar.append(funcion)
+
+
+def calentar():
+    """Crear el pool del proceso (y medir la réplica) antes del primer pedido"""
+    with get_pool().conexion():
+        pass
+    replica = get_replica()
+    if replica is not None:
+        replica.lag()
+
+
+def stats():
+    datos = get_pool().stats()
+    replica = get_replica()
+    if replica is not None:
+        datos['replica'] = replica.stats()
+    return datos
+
+
+def cerrar():
+    """Cerrar el pool del proceso (se vuelve a crear si se lo pide otra vez)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+        _pool = None
+        _pool_pid = None
+        if _replica is not None and _replica_pid == os.getpid():
+            _replica.cerrar()
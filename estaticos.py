@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archivos estáticos propios: CSS y JS servidos desde la aplicación
+
+Bootstrap, Popper, jQuery y Font Awesome están en static/vendor, en el
+repositorio (versiones fijas, verificadas contra su integridad al
+construir) y junto con los fuentes propios de static/src se arman en
+static/dist:
+
+- app.css       Bootstrap + Font Awesome + static/src/yoga.css
+- app.js        jQuery + Popper + Bootstrap
+- asistencia.js static/src/asistencia.js
+
+Cada archivo lleva en el nombre su huella (app.3f2a9c1b4d5e.css), así que
+se sirve con Cache-Control immutable por un año: un cambio da otro nombre.
+Al lado se guardan las variantes .gz y, con el paquete Brotli instalado,
+.br; /estaticos/ elige la que acepta el navegador sin comprimir nada al
+atender. static/dist/manifest.json relaciona cada nombre lógico con su
+archivo y es lo que usan las plantillas (estatico('app.css')).
+
+Sin construir (sin manifest.json), las plantillas usan las CDN como antes
+y los fuentes de static/src sin minificar.
+
+Las respuestas HTML se comprimen al vuelo (brotli o gzip según
+Accept-Encoding) desde COMPRIMIR_MIN_BYTES; COMPRIMIR_HTML=0 lo apaga
+(por ejemplo, si ya comprime un proxy adelante).
+
+    python estaticos.py               # construir (falla si vendor no está completo)
+    python estaticos.py --descargar   # volver a bajar vendor de las CDN
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(RAIZ, 'static')
+DIST = os.path.join(STATIC, 'dist')
+MANIFIESTO = os.path.join(DIST, 'manifest.json')
+
+# Versiones fijas de lo que antes venía de las CDN: ruta en static, URL de
+# la que se baja si falta e integridad (la SRI publicada para los CSS y JS)
+CDN_FA = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0'
+VENDOR = {
+    'vendor/bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+        'sha384-1BmE4kWBq78iYhFldvKuhfTAU6auU8tT94WrHftjDbrCEXSU1oBoqyl2QvZ6jIW3'),
+    'vendor/popper.min.js': (
+        'https://cdn.jsdelivr.net/npm/@popperjs/core@2.10.2/dist/umd/popper.min.js',
+        'sha384-7+zCNj/IqJ95wo16oMtfsKbZ9ccEh31eOz1HGyDuCQ6wgnyJNSYdrPa03rtR1zdB'),
+    'vendor/bootstrap.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.min.js',
+        'sha384-QJHtvGhmr9XOIpI6YVutG+2QOK9T+ZnN4kzFN1RtK3zEFEIsxhlmWl5/YESvpZ13'),
+    'vendor/jquery.min.js': (
+        'https://code.jquery.com/jquery-3.6.0.min.js',
+        'sha384-vtXRMe3mGCbOeY7l30aIg8H9p3GdeSe4IFlP6G8JMa7o7lXvnz3GFKzPxzJdPfGK'),
+    'vendor/fontawesome/css/all.min.css': (
+        f'{CDN_FA}/css/all.min.css',
+        'sha384-3B6NwesSXE7YJlcLI9RpRqGf2p/EgVH8BgoKTaUrmKNDkHPStTQ3EyoYjCGXaOTS'),
+    'vendor/fontawesome/webfonts/fa-brands-400.woff2': (
+        f'{CDN_FA}/webfonts/fa-brands-400.woff2',
+        'sha384-K0oO3lgfzCR21mC2MtrmDvfaePYJ0kObdjG0XBaj9BpbrfNCvP7zfJePDUKYUfNg'),
+    'vendor/fontawesome/webfonts/fa-brands-400.ttf': (
+        f'{CDN_FA}/webfonts/fa-brands-400.ttf',
+        'sha384-y7y16nC7jZ8a61w+7TUAkRrn2JcLlRfiH8s3d4Bom0Rc24vOFFfHidJJ1u3PSf2+'),
+    'vendor/fontawesome/webfonts/fa-regular-400.woff2': (
+        f'{CDN_FA}/webfonts/fa-regular-400.woff2',
+        'sha384-0oBEwJwxzA2GSAdhmFtu95H/IktlISPyPn1QrPHWkSprdRx/awhNvKXWgsDzYLkF'),
+    'vendor/fontawesome/webfonts/fa-regular-400.ttf': (
+        f'{CDN_FA}/webfonts/fa-regular-400.ttf',
+        'sha384-sOCXV3/bWeJG/yVqjPdYCvrbRww1hfWgsb7TTQdAVu7BbHm2VmhTTPy3N3GGQzr5'),
+    'vendor/fontawesome/webfonts/fa-solid-900.woff2': (
+        f'{CDN_FA}/webfonts/fa-solid-900.woff2',
+        'sha384-S46FmqZ47S5h3fMjlByi6EM1R//zc6OTMQtNCVwEKuk8RoJSUpjViXnIPQuBFZG/'),
+    'vendor/fontawesome/webfonts/fa-solid-900.ttf': (
+        f'{CDN_FA}/webfonts/fa-solid-900.ttf',
+        'sha384-M/hyedEsR1+cg5ImGfJFWBQq038c68dpWtpADWNHYurE2wqI3gRBV6sKiX2Q+6xc'),
+    'vendor/fontawesome/webfonts/fa-v4compatibility.woff2': (
+        f'{CDN_FA}/webfonts/fa-v4compatibility.woff2',
+        'sha384-pGzeCSsvTxg9ixjxqrpa2CfvXLOfZsbmJhb4ESMzSpVGxbmZT2q7Y8ToQnm1Ge44'),
+    'vendor/fontawesome/webfonts/fa-v4compatibility.ttf': (
+        f'{CDN_FA}/webfonts/fa-v4compatibility.ttf',
+        'sha384-nZitnY/s3LAvyV2jkrGM3TbWWsPikoLZ4rgbprNcn6itbC2iDW7U2aEHEadcZkLU'),
+}
+
+PAQUETES = {
+    'app.css': ('vendor/bootstrap.min.css', 'vendor/fontawesome/css/all.min.css', 'src/yoga.css'),
+    # jQuery primero: el "use strict" con que empieza popper.min.js no
+    # tiene que quedar al principio del paquete (lo haría estricto entero)
+    'app.js': ('vendor/jquery.min.js', 'vendor/popper.min.js', 'vendor/bootstrap.min.js'),
+    'asistencia.js': ('src/asistencia.js',),
+}
+
+# Variantes precomprimidas, en orden de preferencia
+VARIANTES = (('br', '.br'), ('gzip', '.gz'))
+
+UN_ANIO = 365 * 24 * 3600
+
+COMPRIMIR_HTML = os.environ.get('COMPRIMIR_HTML', '1') == '1'
+COMPRIMIR_MIN_BYTES = int(os.environ.get('COMPRIMIR_MIN_BYTES', 1024))
+COMPRIMIBLES = {'text/html'}
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/ttf', '.ttf')
+
+URL_CSS = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+MAPA_FUENTE = re.compile(r'^\s*/[/*]# sourceMappingURL=.*$', re.M)
+
+
+# --- Construcción ---------------------------------------------------------
+
+class VendorError(Exception):
+    """Un archivo de static/vendor falta y no se pudo bajar, o no es el esperado"""
+
+
+def _es_relativa(url):
+    return not url.startswith(('data:', 'http:', 'https:', '/', '#'))
+
+
+def _integridad(datos):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(datos).digest()).decode('ascii')
+
+
+def _bajar(url, destino):
+    pedido = urllib.request.Request(url, headers={'User-Agent': 'yoga-estaticos'})
+    with urllib.request.urlopen(pedido, timeout=30) as respuesta:
+        datos = respuesta.read()
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(destino, 'wb') as archivo:
+        archivo.write(datos)
+    print(f"  {os.path.relpath(destino, STATIC)} ({len(datos)} bytes)")
+    return datos
+
+
+def descargar(forzar=False):
+    """Verificar static/vendor contra VENDOR, bajando lo que falte (o todo con forzar)
+
+    Los archivos están en el repositorio, así que construir no necesita
+    red. VendorError si falta uno y no se puede bajar, o si el contenido
+    no coincide con su integridad.
+    """
+    for relativa, (url, integridad) in VENDOR.items():
+        destino = os.path.join(STATIC, relativa)
+        if forzar or not os.path.exists(destino):
+            try:
+                datos = _bajar(url, destino)
+            except OSError as e:
+                raise VendorError(f'Falta static/{relativa} y no se pudo bajar de {url} ({e}). '
+                                  f'Los archivos de static/vendor van en el repositorio: '
+                                  f'restaurarlos con git checkout -- static/vendor') from e
+        else:
+            with open(destino, 'rb') as archivo:
+                datos = archivo.read()
+        if _integridad(datos) != integridad:
+            raise VendorError(f'static/{relativa} no coincide con su integridad ({integridad}): '
+                              f'restaurarlo con git checkout o volver a bajarlo con --descargar')
+
+
+def minificar_css(css):
+    """Quitar comentarios y espacios sobrantes (para los fuentes propios)"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip() + '\n'
+
+
+def minificar_js(js):
+    """Minificación conservadora: sangría, líneas vacías y comentarios de línea entera
+
+    No toca nada dentro de una línea, así que no hay que entender cadenas
+    ni expresiones regulares, y los saltos de línea quedan donde estaban
+    (la inserción automática de punto y coma no cambia).
+    """
+    lineas = (linea.strip() for linea in js.splitlines())
+    return '\n'.join(linea for linea in lineas if linea and not linea.startswith('//')) + '\n'
+
+
+def _huella(datos):
+    return hashlib.sha256(datos).hexdigest()[:12]
+
+
+def _con_huella(nombre, datos):
+    base, extension = os.path.splitext(nombre)
+    return f'{base}.{_huella(datos)}{extension}'
+
+
+def _escribir(nombre, datos):
+    """Guardar un archivo de dist con sus variantes comprimidas; devuelve los tamaños"""
+    ruta = os.path.join(DIST, nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as archivo:
+        archivo.write(datos)
+    tamanios = {'archivo': nombre, 'bytes': len(datos)}
+    variantes = [('gzip', '.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.insert(0, ('br', '.br', lambda d: brotli.compress(d, quality=11)))
+    for codificacion, sufijo, comprimir in variantes:
+        comprimido = comprimir(datos)
+        # woff2 ya viene comprimido: no vale la pena guardar la variante
+        if len(comprimido) < len(datos) * 0.9:
+            with open(ruta + sufijo, 'wb') as archivo:
+                archivo.write(comprimido)
+            tamanios[codificacion] = len(comprimido)
+    return tamanios
+
+
+def _css_de(relativa, archivos, tamanios):
+    """Leer una hoja de estilos y pasar sus URLs relativas a los archivos con huella de dist"""
+    origen = os.path.join(STATIC, relativa)
+    with open(origen, encoding='utf-8') as archivo:
+        css = archivo.read()
+
+    def reemplazar(coincidencia):
+        referencia = coincidencia.group(2)
+        if not _es_relativa(referencia):
+            return coincidencia.group(0)
+        limpia = referencia.split('?')[0].split('#')[0]
+        resto = referencia[len(limpia):]
+        local = os.path.normpath(os.path.join(os.path.dirname(origen), limpia))
+        if local not in archivos:
+            with open(local, 'rb') as archivo:
+                datos = archivo.read()
+            archivos[local] = posixpath.join('fuentes', _con_huella(os.path.basename(local), datos))
+            tamanios.append(_escribir(archivos[local], datos))
+        # ?#iefix y parecidos quedan, solo cambia la ruta
+        return f'url({archivos[local]}{resto})'
+
+    return URL_CSS.sub(reemplazar, css)
+
+
+def construir():
+    """Armar static/dist y su manifest.json; devuelve los tamaños de cada archivo"""
+    descargar()
+    shutil.rmtree(DIST, ignore_errors=True)
+    manifiesto = {}
+    tamanios = []
+    fuentes = {}
+    for nombre, partes in PAQUETES.items():
+        textos = []
+        for relativa in partes:
+            if nombre.endswith('.css'):
+                texto = _css_de(relativa, fuentes, tamanios)
+            else:
+                with open(os.path.join(STATIC, relativa), encoding='utf-8') as archivo:
+                    texto = archivo.read()
+            if relativa.startswith('src/'):
+                texto = minificar_css(texto) if nombre.endswith('.css') else minificar_js(texto)
+            textos.append(MAPA_FUENTE.sub('', texto).strip())
+        # ';' entre scripts por si alguno no termina la última sentencia
+        datos = ('\n' if nombre.endswith('.css') else '\n;\n').join(textos).encode('utf-8') + b'\n'
+        manifiesto[nombre] = _con_huella(nombre, datos)
+        tamanios.append(_escribir(manifiesto[nombre], datos))
+    with open(MANIFIESTO, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, indent=2, sort_keys=True)
+    cargar()
+    return tamanios
+
+
+# --- Servir ---------------------------------------------------------------
+
+_manifiesto = None
+_servibles = frozenset()
+
+
+def cargar():
+    """Leer (o volver a leer) static/dist/manifest.json; sin construir queda vacío"""
+    global _manifiesto, _servibles
+    try:
+        with open(MANIFIESTO, encoding='utf-8') as archivo:
+            _manifiesto = json.load(archivo)
+    except FileNotFoundError:
+        _manifiesto = {}
+    servibles = set(_manifiesto.values())
+    fuentes = os.path.join(DIST, 'fuentes')
+    if os.path.isdir(fuentes):
+        servibles.update(posixpath.join('fuentes', nombre) for nombre in os.listdir(fuentes)
+                         if not nombre.endswith(('.gz', '.br')))
+    _servibles = frozenset(servibles)
+    return _manifiesto
+
+
+def manifiesto():
+    return _manifiesto if _manifiesto is not None else cargar()
+
+
+def version():
+    """Huella del manifest ('' sin construir), para los ETag del HTML que lo referencia"""
+    return _huella(json.dumps(manifiesto(), sort_keys=True).encode()) if manifiesto() else ''
+
+
+def url(nombre):
+    """URL de un estático por su nombre lógico: la versión con huella o, sin construir, el fuente"""
+    from flask import url_for
+
+    archivo = manifiesto().get(nombre)
+    if archivo is None:
+        return url_for('static', filename=f'src/{nombre}')
+    return url_for('estaticos', archivo=archivo)
+
+
+def servir(archivo):
+    """Un archivo de dist, en la variante precomprimida que acepte el navegador"""
+    from flask import abort, request, send_from_directory
+
+    if archivo not in _servibles:
+        abort(404)
+    tipo = mimetypes.guess_type(archivo)[0] or 'application/octet-stream'
+    for codificacion, sufijo in VARIANTES:
+        if request.accept_encodings[codificacion] and os.path.exists(os.path.join(DIST, archivo + sufijo)):
+            respuesta = send_from_directory(DIST, archivo + sufijo, mimetype=tipo, max_age=UN_ANIO)
+            respuesta.headers['Content-Encoding'] = codificacion
+            # Sin el nombre del .gz/.br: para el navegador es el mismo archivo
+            respuesta.headers.pop('Content-Disposition', None)
+            break
+    else:
+        respuesta = send_from_directory(DIST, archivo, mimetype=tipo, max_age=UN_ANIO)
+    respuesta.cache_control.public = True
+    respuesta.cache_control.immutable = True
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+
+def _codificacion(aceptadas):
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+def comprimir(respuesta):
+    """Comprimir una respuesta HTML si el navegador lo acepta (hook after_request)"""
+    from flask import request
+
+    if (respuesta.mimetype not in COMPRIMIBLES or respuesta.direct_passthrough
+            or respuesta.is_streamed or respuesta.status_code != 200
+            or 'Content-Encoding' in respuesta.headers):
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = _codificacion(request.accept_encodings)
+    datos = respuesta.get_data()
+    if codificacion is None or len(datos) < COMPRIMIR_MIN_BYTES:
+        return respuesta
+    if codificacion == 'br':
+        # Calidad media: se comprime en cada pedido
+        respuesta.set_data(brotli.compress(datos, quality=5))
+    else:
+        respuesta.set_data(gzip.compress(datos, compresslevel=6))
+    respuesta.headers['Content-Encoding'] = codificacion
+    # La versión comprimida no es idéntica byte a byte: el ETag pasa a débil
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(etag, weak=True)
+    return respuesta
+
+
+def instalar(app):
+    """Registrar /estaticos/, estatico() en las plantillas y la compresión del HTML"""
+    app.add_url_rule('/estaticos/<path:archivo>', 'estaticos', servir)
+
+    @app.context_processor
+    def _estaticos():
+        return {'estatico': url, 'estaticos_construidos': bool(manifiesto())}
+
+    if COMPRIMIR_HTML:
+        app.after_request(comprimir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Construir los estáticos de static/dist')
+    parser.add_argument('--descargar', action='store_true', help='volver a bajar static/vendor')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.descargar:
+            descargar(forzar=True)
+        tamanios = construir()
+    except VendorError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"\n{'archivo':42} {'bytes':>9} {'gzip':>9} {'br':>9}")
+    for fila in tamanios:
+        print(f"{fila['archivo']:42} {fila['bytes']:>9} {fila.get('gzip', '-'):>9} {fila.get('br', '-'):>9}")
+    if brotli is None:
+        print('\nSin el paquete Brotli: solo variantes .gz')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
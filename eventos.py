@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cambios de asistencia en vivo para todos los dispositivos (Server-Sent Events)
+
+/asistencia/eventos deja abierto un stream por dispositivo. Toda escritura
+de asistencia (asistencia_mensual.guardar_asistencias, que usan el toggle,
+el batch y la versión de escritorio) publica sus cambios con publicar(),
+dentro de la misma transacción:
+
+- PostgreSQL: pg_notify en el canal 'asistencia'. El aviso se entrega al
+  confirmar la transacción a todos los procesos que escuchan (LISTEN):
+  cada uno tiene un hilo con una conexión propia, fuera del pool, que
+  invalida la cache del roster del proceso y reparte lo que llega entre
+  sus streams. Las altas de alumnos avisan también (avisar_alumnos), solo
+  para invalidar la cache.
+- SQLite: un broker en memoria del proceso, que reparte los cambios
+  cuando se confirma la transacción (db_pool.al_confirmar).
+
+Cada stream ocupa un hilo mientras está abierto, así que con gunicorn se
+usa el worker gthread (ver gunicorn.conf.py) en lugar del sync, que
+dedicaría un proceso entero a cada stream. EVENTOS_MAX_STREAMS limita los
+streams por proceso para que siempre queden hilos para los pedidos
+normales, y cada stream se cierra a los EVENTOS_DURACION segundos (el
+navegador se reconecta solo y se pone al día con /asistencia/cambios).
+
+Variables de entorno:
+    EVENTOS_MAX_STREAMS   streams abiertos por proceso (8)
+    EVENTOS_DURACION      segundos que dura un stream antes de reconectar (300)
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+import basedatos
+import cache
+import db_pool
+
+CANAL = 'asistencia'
+
+# Un NOTIFY admite hasta 8000 bytes: los lotes grandes se parten
+CAMBIOS_POR_AVISO = 200
+
+# Eventos que puede acumular un stream que no lee antes de pedirle al
+# cliente que se ponga al día
+MAX_COLA = 256
+
+# Segundos entre comentarios de latido (mantienen viva la conexión a
+# través de proxies y detectan los clientes que se fueron)
+LATIDO = 15.0
+
+# Milisegundos que espera el navegador antes de reconectar
+REINTENTO_CLIENTE_MS = 3000
+
+# Segundos antes de volver a conectar el LISTEN si se cae
+REINTENTO_ESCUCHA = 5.0
+
+# Evento que le pide al cliente que recargue los cambios con /asistencia/cambios
+RESINCRONIZAR = object()
+
+# Aviso de altas de alumnos: no va a los streams, solo invalida la cache
+ALTA_ALUMNOS = {'alumnos': True}
+
+
+def _env_num(nombre, defecto, tipo=float):
+    try:
+        return tipo(os.environ.get(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+MAX_STREAMS = _env_num('EVENTOS_MAX_STREAMS', 8, int)
+DURACION = _env_num('EVENTOS_DURACION', 300.0)
+
+
+class Broker:
+    """Reparte los eventos entre los streams abiertos del proceso"""
+
+    def __init__(self, max_streams=MAX_STREAMS):
+        self.max_streams = max_streams
+        self._colas = set()
+        self._lock = threading.Lock()
+        self._stats = {'publicados': 0, 'desbordados': 0, 'rechazados': 0}
+
+    def suscribir(self):
+        """Cola de eventos para un stream nuevo, o None si ya hay demasiados"""
+        with self._lock:
+            if len(self._colas) >= self.max_streams:
+                self._stats['rechazados'] += 1
+                return None
+            cola = queue.Queue(maxsize=MAX_COLA)
+            self._colas.add(cola)
+            return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._colas.discard(cola)
+
+    def repartir(self, evento):
+        with self._lock:
+            colas = list(self._colas)
+            self._stats['publicados'] += 1
+        for cola in colas:
+            try:
+                cola.put_nowait(evento)
+            except queue.Full:
+                # El cliente no lee: se descarta lo acumulado y se le pide
+                # que se ponga al día cuando vuelva a leer
+                with cola.mutex:
+                    cola.queue.clear()
+                cola.put_nowait(RESINCRONIZAR)
+                with self._lock:
+                    self._stats['desbordados'] += 1
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos['streams'] = len(self._colas)
+        datos['max_streams'] = self.max_streams
+        return datos
+
+
+broker = Broker()
+
+
+def _invalidar_cache(evento):
+    """Borrar del roster de este proceso lo que cambió un aviso (de cualquier worker)"""
+    if evento is RESINCRONIZAR:
+        cache.roster.invalidar()
+    elif 'alumnos' in evento:
+        cache.roster.invalidar('alumnos', 'asistencia', 'asistencias_hoy', 'resumen')
+    else:
+        cache.roster.invalidar('asistencia', 'asistencias_hoy', 'resumen')
+
+
+class Escucha(threading.Thread):
+    """Hilo que recibe los NOTIFY de PostgreSQL: invalida la cache y los pasa al broker"""
+
+    def __init__(self, dsn):
+        super().__init__(name='eventos-listen', daemon=True)
+        self.dsn = dsn
+        self.conectado = False
+        self._parar = threading.Event()
+
+    def run(self):
+        reconexion = False
+        while not self._parar.is_set():
+            try:
+                self._escuchar(reconexion)
+            except Exception as e:
+                print(f"Eventos: se cortó el LISTEN ({e}); reintentando en {REINTENTO_ESCUCHA:.0f}s")
+            self.conectado = False
+            reconexion = True
+            self._parar.wait(REINTENTO_ESCUCHA)
+
+    def _escuchar(self, reconexion):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f'LISTEN {CANAL}')
+            cursor.close()
+            self.conectado = True
+            if reconexion:
+                # Lo publicado mientras no se escuchaba se perdió
+                _invalidar_cache(RESINCRONIZAR)
+                broker.repartir(RESINCRONIZAR)
+
+            while not self._parar.is_set():
+                if select.select([conn], [], [], LATIDO) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = conn.notifies.pop(0)
+                    try:
+                        evento = json.loads(aviso.payload)
+                    except ValueError:
+                        print(f"Eventos: aviso inválido en {CANAL}: {aviso.payload[:200]}")
+                        continue
+                    _invalidar_cache(evento)
+                    if 'alumnos' not in evento:
+                        broker.repartir(evento)
+        finally:
+            conn.close()
+
+    def parar(self):
+        self._parar.set()
+
+
+_escucha = None
+_escucha_pid = None
+_escucha_lock = threading.Lock()
+
+
+def asegurar_escucha():
+    """Arrancar el hilo de LISTEN del proceso (solo con PostgreSQL)
+
+    Lo arranca cada worker al calentar, aunque no tenga streams, para que
+    su cache se entere de lo que escriben los demás.
+    """
+    global _escucha, _escucha_pid
+    pool = db_pool.get_pool()
+    if pool.dialecto != 'postgresql':
+        return
+    with _escucha_lock:
+        # Después de un fork el hilo del padre no existe en el hijo
+        if _escucha is None or _escucha_pid != os.getpid() or not _escucha.is_alive():
+            _escucha = Escucha(pool.dsn)
+            _escucha_pid = os.getpid()
+            _escucha.start()
+
+
+def publicar(conn, fecha, cambios):
+    """Avisar a los streams los cambios [(alumno_id, presente)] de una fecha
+
+    Se llama dentro de la transacción que los escribe: el aviso sale
+    solamente si se confirma.
+    """
+    if not cambios:
+        return
+    cambios = [[alumno_id, bool(presente)] for alumno_id, presente in cambios]
+    eventos = [{'fecha': fecha.isoformat(), 'cambios': cambios[i:i + CAMBIOS_POR_AVISO]}
+               for i in range(0, len(cambios), CAMBIOS_POR_AVISO)]
+
+    if basedatos.dialecto() != 'postgresql':
+        for evento in eventos:
+            db_pool.al_confirmar(lambda evento=evento: broker.repartir(evento))
+        return
+
+    cursor = conn.cursor()
+    try:
+        for evento in eventos:
+            basedatos.ejecutar_en(cursor, 'SELECT pg_notify(%s, %s)',
+                                  (CANAL, json.dumps(evento, separators=(',', ':'))))
+    finally:
+        cursor.close()
+
+
+def avisar_alumnos(cursor):
+    """Avisar a los demás workers que hubo altas de alumnos (al confirmar, solo PostgreSQL)
+
+    Con SQLite no hace falta: la ruta que da el alta invalida la cache de
+    su proceso.
+    """
+    if basedatos.dialecto() == 'postgresql':
+        basedatos.ejecutar_en(cursor, 'SELECT pg_notify(%s, %s)',
+                              (CANAL, json.dumps(ALTA_ALUMNOS, separators=(',', ':'))))
+
+
+def suscribir():
+    """Cola de eventos para un stream nuevo, o None si el proceso ya tiene demasiados"""
+    asegurar_escucha()
+    return broker.suscribir()
+
+
+def stream(cola):
+    """Cuerpo text/event-stream de un stream suscrito con suscribir()"""
+    try:
+        yield f'retry: {REINTENTO_CLIENTE_MS}\n\n'
+        fin = time.monotonic() + DURACION
+        while True:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                evento = cola.get(timeout=min(LATIDO, restante))
+            except queue.Empty:
+                yield ': latido\n\n'
+                continue
+            if evento is RESINCRONIZAR:
+                yield 'event: resincronizar\ndata: {}\n\n'
+            else:
+                yield f'data: {json.dumps(evento, separators=(",", ":"))}\n\n'
+    finally:
+        broker.desuscribir(cola)
+
+
+def stats():
+    datos = broker.stats()
+    datos['escuchando'] = bool(_escucha is not None and _escucha.conectado)
+    return datos
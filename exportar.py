@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportación de asistencias por rango de fechas en CSV o NDJSON
+
+Las filas se leen de a LOTE con un cursor del lado del servidor en
+PostgreSQL (cursor con nombre) o iterando el cursor en SQLite, y se van
+escribiendo a medida que llegan: la memoria usada no depende del rango.
+abrir() ejecuta la consulta y trae el primer lote antes de responder, así
+un error de la base llega a la ruta (400/503) y no corta la descarga.
+"""
+
+import csv
+import io
+import json
+import uuid
+
+import basedatos
+import db_pool
+
+LOTE = 2000
+
+# Mayor id de alumno posible (SERIAL de PostgreSQL)
+MAX_ALUMNO_ID = 2 ** 31 - 1
+
+COLUMNAS = ('fecha', 'alumno_id', 'apellido', 'nombre', 'estado')
+
+
+def filas_asistencia(desde, hasta, alumnos=None):
+    """Generar (fecha, alumno_id, apellido, nombre, presente) entre dos fechas
+
+    Mantiene una conexión del pool prestada mientras se recorre; se devuelve
+    al terminar o al cerrar el generador (por ejemplo, si el cliente corta).
+    """
+    postgresql = basedatos.dialecto() == 'postgresql'
+
+    condiciones = ['ast.fecha BETWEEN %s AND %s']
+    params = [desde, hasta]
+    if alumnos:
+        condiciones.append(f'ast.alumno_id IN ({basedatos.marcadores(len(alumnos))})')
+        params.extend(alumnos)
+
+    # Orden de (fecha, alumno_id): sigue al índice idx_asistencias_fecha_alumno
+    sql = f'''
+        SELECT ast.fecha, a.id, a.apellido, a.nombre, ast.presente
+        FROM asistencias ast
+        JOIN alumnos a ON a.id = ast.alumno_id
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY ast.fecha, ast.alumno_id
+    '''
+
+    # Los cursores con nombre de psycopg2 necesitan una transacción abierta;
+    # es de solo lectura, así que no frena a los que marcan asistencia
+    # mientras el cliente baja el archivo (en SQLite ni siquiera se abre)
+    with db_pool.transaccion_lectura() as conn:
+        if postgresql:
+            cursor = conn.cursor(name=f'exportar_{uuid.uuid4().hex}')
+            cursor.itersize = LOTE
+        else:
+            cursor = conn.cursor()
+        try:
+            basedatos.ejecutar_en(cursor, sql, params)
+            while True:
+                filas = cursor.fetchmany(LOTE)
+                if not filas:
+                    break
+                for fila in filas:
+                    yield tuple(fila)
+        finally:
+            cursor.close()
+
+
+def abrir(desde, hasta, alumnos=None):
+    """filas_asistencia() ya ejecutada, con el primer lote leído
+
+    Los errores de la base (pool o réplica sin responder, consulta que
+    falla) se producen acá, antes de armar la respuesta, y no mientras el
+    servidor la está enviando.
+    """
+    filas = filas_asistencia(desde, hasta, alumnos)
+    try:
+        primera = next(filas)
+    except StopIteration:
+        return iter(())
+    return _desde(primera, filas)
+
+
+def _desde(primera, filas):
+    """La fila ya leída y las que siguen; cerrarlo devuelve la conexión"""
+    try:
+        yield primera
+        yield from filas
+    finally:
+        filas.close()
+
+
+def _estado(presente):
+    if presente is None:
+        return 'Sin marcar'
+    return 'Presente' if presente else 'Ausente'
+
+
+# Comienzos de celda que Excel toma como fórmula
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _celda(texto):
+    """Texto para una celda del CSV, con ' adelante si Excel lo tomaría como fórmula"""
+    if texto and texto.startswith(INICIOS_FORMULA):
+        return "'" + texto
+    return texto
+
+
+def generar_csv(filas):
+    """Convertir las filas en trozos de CSV (UTF-8 con BOM para Excel)
+
+    Los nombres los carga cualquiera (registro, importación): los que
+    empiezan como una fórmula se escriben como texto.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(COLUMNAS)
+
+    for n, (fecha, alumno_id, apellido, nombre, presente) in enumerate(filas, 1):
+        escritor.writerow((str(fecha)[:10], alumno_id, _celda(apellido), _celda(nombre), _estado(presente)))
+        if n % LOTE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+def generar_ndjson(filas):
+    """Convertir las filas en trozos de NDJSON (un objeto por línea)"""
+    lineas = []
+    for fecha, alumno_id, apellido, nombre, presente in filas:
+        lineas.append(json.dumps({
+            'fecha': str(fecha)[:10],
+            'alumno_id': alumno_id,
+            'apellido': apellido,
+            'nombre': nombre,
+            'presente': None if presente is None else bool(presente),
+        }, ensure_ascii=False))
+        if len(lineas) == LOTE:
+            yield ('\n'.join(lineas) + '\n').encode('utf-8')
+            lineas = []
+
+    if lineas:
+        yield ('\n'.join(lineas) + '\n').encode('utf-8')
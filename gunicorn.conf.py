@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración de gunicorn (se lee sola al arrancar desde este directorio)
+
+Los streams de /asistencia/eventos quedan abiertos mientras la página
+está a la vista. Con el worker sync cada uno ocuparía un worker entero;
+con gthread ocupa un hilo que pasa casi todo el tiempo esperando. La
+cantidad de workers sigue saliendo de WEB_CONCURRENCY (o de --workers).
+
+La aplicación sale de la fábrica app:create_app() y se carga en el
+maestro antes de crear los workers (preload): las migraciones y la
+compilación de plantillas se hacen una vez, y cada worker arranca con
+eso hecho y solo abre su pool (post_fork). GUNICORN_PRELOAD=0 vuelve a
+preparar la aplicación en cada worker.
+"""
+
+import os
+
+wsgi_app = 'app:create_app()'
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+worker_class = 'gthread'
+
+# Hilos por worker: alcanzan para EVENTOS_MAX_STREAMS streams más los
+# pedidos normales
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+
+def pre_fork(server, worker):
+    # Las conexiones que abrió el maestro al preparar la aplicación no se
+    # comparten con los workers
+    import db_pool
+
+    db_pool.cerrar()
+
+
+def post_fork(server, worker):
+    # Preparar (si no vino hecho del maestro) y abrir el pool antes de
+    # aceptar pedidos: /readyz da 503 hasta que termina
+    import app
+
+    app.create_app()
+    app.calentar()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historial de cambios para sincronizar clientes (tabla cambios)
+
+Las escrituras de asistencia (asistencia_mensual.guardar_asistencias) y
+las altas de alumnos (registro e importación) agregan una fila por cambio
+en la misma transacción. /api/changes?since=<cursor> devuelve, en orden,
+las filas con id mayor al cursor: un cliente que ya tiene la lista baja
+solo lo nuevo en lugar de la página entera.
+
+Para que un cursor no se saltee nada, un cliente no puede recibir un
+cambio mientras una transacción anterior todavía puede confirmar otros.
+En SQLite las escrituras ya están serializadas y el cursor es el id. En
+PostgreSQL los ids salen de la secuencia sin bloquear nada y cada fila
+guarda además la transacción que la escribió (xid, txid_current()); el
+orden es (xid, id) y solo se entregan las filas de transacciones
+anteriores a la más vieja que sigue en curso (txid_snapshot_xmin): una
+vez entregada una fila, lo que se confirme después siempre queda
+adelante. El cursor es el texto "xid:id"; un id solo (los cursores de
+antes de la migración 12) equivale a "0:id". Una escritura larga demora
+la entrega de lo posterior hasta que termina, pero no lo frena.
+"""
+
+import basedatos
+
+ANOTAR = basedatos.Sentencia('anotar_cambio', '''
+    INSERT INTO cambios (tipo, alumno_id, fecha, presente) VALUES (%s, %s, %s, %s)
+''')
+
+LISTAR = basedatos.Sentencia('listar_cambios', '''
+    SELECT c.id, 0 AS xid, c.tipo, c.alumno_id, c.fecha, c.presente, c.momento,
+           a.nombre, a.apellido, a.telefono
+    FROM cambios c
+    LEFT JOIN alumnos a ON c.tipo = 'alumno' AND a.id = c.alumno_id
+    WHERE c.id > %s
+    ORDER BY c.id
+    LIMIT %s
+''')
+
+LISTAR_POSTGRESQL = basedatos.Sentencia('listar_cambios_xid', '''
+    SELECT c.id, c.xid, c.tipo, c.alumno_id, c.fecha, c.presente, c.momento,
+           a.nombre, a.apellido, a.telefono
+    FROM cambios c
+    LEFT JOIN alumnos a ON c.tipo = 'alumno' AND a.id = c.alumno_id
+    WHERE (c.xid, c.id) > (%s, %s) AND c.xid < %s
+    ORDER BY c.xid, c.id
+    LIMIT %s
+''')
+
+# Transacción más vieja en curso: lo anterior ya está confirmado (o deshecho)
+SQL_HORIZONTE = 'SELECT txid_snapshot_xmin(txid_current_snapshot()) AS xid'
+
+
+def _postgresql():
+    return basedatos.dialecto() == 'postgresql'
+
+
+def anotar(cursor, filas):
+    """Agregar cambios (tipo, alumno_id, fecha, presente) en la transacción del cursor
+
+    tipo es 'asistencia' o 'alumno' (alta; fecha y presente en None).
+    """
+    if not filas:
+        return
+    basedatos.guardar_filas(cursor, ANOTAR, '''
+        INSERT INTO cambios (tipo, alumno_id, fecha, presente) VALUES %s
+    ''', filas)
+
+
+def leer_cursor(texto):
+    """(xid, id) de un cursor de /api/changes; ValueError si no es válido"""
+    partes = texto.split(':')
+    if len(partes) > (2 if _postgresql() else 1):
+        raise ValueError(texto)
+    numeros = [int(parte) for parte in partes]
+    if any(numero < 0 for numero in numeros):
+        raise ValueError(texto)
+    return (0, numeros[0]) if len(numeros) == 1 else tuple(numeros)
+
+
+def _texto(cursor):
+    xid, id_ = cursor
+    return f'{xid}:{id_}' if _postgresql() else str(id_)
+
+
+def ultimo():
+    """Cursor actual (texto): desde ahí se entrega solo lo que se confirme después"""
+    if _postgresql():
+        return _texto((basedatos.consultar_uno(SQL_HORIZONTE).xid, 0))
+    return _texto((0, basedatos.consultar_uno('SELECT COALESCE(MAX(id), 0) AS id FROM cambios')['id']))
+
+
+def listar(desde, limite):
+    """Hasta limite cambios posteriores al cursor desde (xid, id); devuelve (cambios, cursor, hay_mas)"""
+    if _postgresql():
+        horizonte = basedatos.consultar_uno(SQL_HORIZONTE).xid
+        filas = basedatos.consultar(LISTAR_POSTGRESQL, (desde[0], desde[1], horizonte, limite + 1))
+    else:
+        horizonte = None
+        filas = basedatos.consultar(LISTAR, (desde[1], limite + 1))
+    cambios = []
+    cursor = desde
+    for fila in filas[:limite]:
+        cambio = {'id': fila.id, 'tipo': fila.tipo, 'alumno_id': fila.alumno_id,
+                  'momento': str(fila.momento)[:19]}
+        if fila.tipo == 'alumno':
+            cambio.update(nombre=fila.nombre, apellido=fila.apellido, telefono=fila.telefono)
+        else:
+            cambio.update(fecha=str(fila.fecha), presente=bool(fila.presente))
+        cambios.append(cambio)
+        cursor = (fila.xid, fila.id)
+    hay_mas = len(filas) > limite
+    if horizonte is not None and not hay_mas:
+        # Ya no queda nada anterior al horizonte: el cursor puede avanzar
+        # hasta ahí aunque no haya cambios
+        cursor = max(cursor, (horizonte, 0))
+    return cambios, _texto(cursor), hay_mas
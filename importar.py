@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importación masiva de alumnos desde un CSV
+
+El archivo trae las columnas nombre, apellido y telefono (con encabezado,
+en cualquier orden, o sin encabezado en ese orden), separadas por coma,
+punto y coma o tabulador. Cada fila se valida igual que en el formulario
+de registro y las filas válidas se cargan en una tabla temporal de una
+sola vez:
+
+- PostgreSQL: COPY ... FROM STDIN
+- SQLite: executemany en lotes de LOTE filas, en la misma transacción
+
+Desde ahí un único INSERT ... SELECT agrega los alumnos que no existen
+todavía. Un alumno es el mismo si coinciden nombre y apellido (sin
+distinguir mayúsculas) y teléfono; los repetidos dentro del archivo se
+cargan una sola vez.
+
+    python importar.py alumnos.csv
+"""
+
+import csv
+import io
+import time
+
+import basedatos
+import db_pool
+import eventos
+import historial
+from alumnos import validar_alumno
+
+LOTE = 1000
+
+# Errores de validación que se devuelven en el resultado (el resto se cuenta)
+MAX_ERRORES = 100
+
+COLUMNAS = ('nombre', 'apellido', 'telefono')
+
+SQL_STAGING = {
+    'postgresql': '''
+        CREATE TEMP TABLE alumnos_import (
+            linea INTEGER NOT NULL,
+            nombre VARCHAR(100) NOT NULL,
+            apellido VARCHAR(100) NOT NULL,
+            telefono VARCHAR(20)
+        ) ON COMMIT DROP
+    ''',
+    # La conexión SQLite es persistente: la tabla se borra a mano al final
+    'sqlite': '''
+        CREATE TEMP TABLE IF NOT EXISTS alumnos_import (
+            linea INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            apellido TEXT NOT NULL,
+            telefono TEXT
+        )
+    ''',
+}
+
+# De cada grupo repetido en el archivo queda la primera línea, y solo si
+# no hay ya un alumno igual
+SQL_MERGE = {
+    'postgresql': '''
+        INSERT INTO alumnos (nombre, apellido, telefono)
+        SELECT nombre, apellido, telefono
+        FROM (
+            SELECT DISTINCT ON (lower(nombre), lower(apellido), COALESCE(telefono, ''))
+                   linea, nombre, apellido, telefono
+            FROM alumnos_import
+            ORDER BY lower(nombre), lower(apellido), COALESCE(telefono, ''), linea
+        ) i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM alumnos a
+            WHERE lower(a.apellido) = lower(i.apellido)
+              AND lower(a.nombre) = lower(i.nombre)
+              AND COALESCE(a.telefono, '') = COALESCE(i.telefono, '')
+        )
+        ORDER BY linea
+    ''',
+    # "= ... COLLATE NOCASE" puede usar los índices NOCASE de la migración 5
+    'sqlite': '''
+        INSERT INTO alumnos (nombre, apellido, telefono)
+        SELECT nombre, apellido, telefono
+        FROM alumnos_import i
+        WHERE linea IN (
+            SELECT MIN(linea) FROM alumnos_import
+            GROUP BY nombre COLLATE NOCASE, apellido COLLATE NOCASE, COALESCE(telefono, '')
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM alumnos a
+            WHERE a.apellido = i.apellido COLLATE NOCASE
+              AND a.nombre = i.nombre COLLATE NOCASE
+              AND COALESCE(a.telefono, '') = COALESCE(i.telefono, '')
+        )
+        ORDER BY linea
+    ''',
+}
+
+
+class ArchivoInvalidoError(Exception):
+    """El archivo no se puede leer como CSV de alumnos"""
+
+
+def leer_csv(contenido):
+    """Leer el archivo (bytes o texto) y devolver (validas, errores, leidas)
+
+    validas es una lista de (linea, nombre, apellido, telefono) y errores
+    una lista de {'linea', 'message'}.
+    """
+    if isinstance(contenido, bytes):
+        try:
+            texto = contenido.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            # Excel en Windows guarda en cp1252 si no se elige UTF-8
+            texto = contenido.decode('cp1252', errors='replace')
+    else:
+        texto = contenido.lstrip('\ufeff')
+
+    if not texto.strip():
+        raise ArchivoInvalidoError('El archivo está vacío')
+
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+
+    lector = csv.reader(io.StringIO(texto), dialecto)
+    posiciones = dict(zip(COLUMNAS, range(len(COLUMNAS))))
+
+    validas = []
+    errores = []
+    leidas = 0
+    for numero, fila in enumerate(lector, 1):
+        if not any(celda.strip() for celda in fila):
+            continue
+
+        if numero == 1:
+            encabezado = [celda.strip().lower() for celda in fila]
+            if 'nombre' in encabezado and 'apellido' in encabezado:
+                posiciones = {columna: encabezado.index(columna)
+                              for columna in COLUMNAS if columna in encabezado}
+                continue
+
+        leidas += 1
+        valores = {columna: fila[i] if i < len(fila) else ''
+                   for columna, i in posiciones.items()}
+        datos, error = validar_alumno(**valores)
+        if error:
+            errores.append({'linea': numero, 'message': error})
+        else:
+            validas.append((numero,) + datos)
+
+    return validas, errores, leidas
+
+
+def _cargar_staging(cursor, dialecto, validas):
+    if dialecto == 'postgresql':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(validas)
+        buffer.seek(0)
+        cursor.copy_expert(
+            'COPY alumnos_import (linea, nombre, apellido, telefono) FROM STDIN WITH (FORMAT csv)',
+            buffer)
+    else:
+        cursor.execute('DELETE FROM alumnos_import')
+        for inicio in range(0, len(validas), LOTE):
+            cursor.executemany(
+                'INSERT INTO alumnos_import (linea, nombre, apellido, telefono) VALUES (?, ?, ?, ?)',
+                validas[inicio:inicio + LOTE])
+
+
+def importar_alumnos(contenido):
+    """Importar alumnos desde el contenido de un CSV
+
+    Devuelve un dict con las filas leídas, importadas, duplicadas (ya
+    existían o se repetían en el archivo), inválidas, los errores de
+    validación y los segundos que tardó.
+    """
+    inicio = time.perf_counter()
+    validas, errores, leidas = leer_csv(contenido)
+
+    importadas = 0
+    if validas:
+        dialecto = basedatos.dialecto()
+        with db_pool.transaccion() as conn:
+            cursor = conn.cursor()
+            try:
+                # Que dos importaciones (o un registro) simultáneas no
+                # agreguen el mismo alumno dos veces (en SQLite las
+                # transacciones ya se excluyen entre sí)
+                if dialecto == 'postgresql':
+                    cursor.execute('LOCK TABLE alumnos IN SHARE ROW EXCLUSIVE MODE')
+                cursor.execute(SQL_STAGING[dialecto])
+                _cargar_staging(cursor, dialecto, validas)
+                # Con la tabla bloqueada, los ids mayores al máximo actual
+                # son exactamente los que agrega esta importación
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM alumnos')
+                ultimo_id = cursor.fetchone()[0]
+                cursor.execute(SQL_MERGE[dialecto])
+                importadas = cursor.rowcount
+                if importadas:
+                    basedatos.ejecutar_en(cursor, 'SELECT id FROM alumnos WHERE id > %s ORDER BY id',
+                                          (ultimo_id,))
+                    historial.anotar(cursor, [('alumno', fila[0], None, None) for fila in cursor.fetchall()])
+                    eventos.avisar_alumnos(cursor)
+                if dialecto == 'sqlite':
+                    cursor.execute('DROP TABLE temp.alumnos_import')
+            finally:
+                cursor.close()
+
+    return {
+        'leidas': leidas,
+        'importadas': importadas,
+        'duplicadas': len(validas) - importadas,
+        'invalidas': len(errores),
+        'errores': errores[:MAX_ERRORES],
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Uso: python importar.py alumnos.csv")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'rb') as archivo:
+        resultado = importar_alumnos(archivo.read())
+
+    print(f"Leídas: {resultado['leidas']}  Importadas: {resultado['importadas']}  "
+          f"Duplicadas: {resultado['duplicadas']}  Inválidas: {resultado['invalidas']}  "
+          f"({resultado['segundos']}s)")
+    for error in resultado['errores']:
+        print(f"  línea {error['linea']}: {error['message']}")
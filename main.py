@@ -1,318 +1,455 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-Sistema de Asistencia para Clases de Yoga
-Versión Básica
-"""
-
-import tkinter as tk
-from tkinter import ttk, messagebox
-import sqlite3
-from datetime import datetime, date
-import os
-
-class SistemaAsistenciaYoga:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Sistema de Asistencia - Clases de Yoga")
-        self.root.geometry("800x600")
-        
-        # Crear base de datos
-        self.crear_base_datos()
-        
-        # Crear interfaz
-        self.crear_interfaz()
-        
-    def crear_base_datos(self):
-        """Crear la base de datos SQLite"""
-        self.conn = sqlite3.connect('asistencia_yoga.db')
-        self.cursor = self.conn.cursor()
-        
-        # Crear tabla de alumnos
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alumnos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                apellido TEXT NOT NULL,
-                telefono TEXT,
-                fecha_registro DATE DEFAULT CURRENT_DATE
-            )
-        ''')
-        
-        # Crear tabla de asistencias
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS asistencias (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                alumno_id INTEGER,
-                fecha DATE NOT NULL,
-                presente BOOLEAN DEFAULT 0,
-                FOREIGN KEY (alumno_id) REFERENCES alumnos (id)
-            )
-        ''')
-        
-        self.conn.commit()
-    
-    def crear_interfaz(self):
-        """Crear la interfaz principal"""
-        # Frame principal
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Título
-        titulo = ttk.Label(main_frame, text="Sistema de Asistencia - Clases de Yoga", 
-                          font=("Arial", 16, "bold"))
-        titulo.grid(row=0, column=0, columnspan=2, pady=(0, 20))
-        
-        # Botones principales
-        btn_registrar = ttk.Button(main_frame, text="Registrar Alumno", 
-                                  command=self.abrir_registro_alumno)
-        btn_registrar.grid(row=1, column=0, padx=5, pady=5, sticky=(tk.W, tk.E))
-        
-        btn_asistencia = ttk.Button(main_frame, text="Marcar Asistencia", 
-                                   command=self.abrir_marcar_asistencia)
-        btn_asistencia.grid(row=1, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
-        
-        btn_ver_alumnos = ttk.Button(main_frame, text="Ver Alumnos", 
-                                    command=self.ver_alumnos)
-        btn_ver_alumnos.grid(row=2, column=0, padx=5, pady=5, sticky=(tk.W, tk.E))
-        
-        btn_ver_asistencias = ttk.Button(main_frame, text="Ver Asistencias de Hoy", 
-                                        command=self.ver_asistencias_hoy)
-        btn_ver_asistencias.grid(row=2, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
-        
-        # Configurar columnas
-        main_frame.columnconfigure(0, weight=1)
-        main_frame.columnconfigure(1, weight=1)
-    
-    def abrir_registro_alumno(self):
-        """Abrir ventana para registrar nuevo alumno"""
-        ventana = tk.Toplevel(self.root)
-        ventana.title("Registrar Nuevo Alumno")
-        ventana.geometry("400x300")
-        ventana.grab_set()  # Hacer modal
-        
-        frame = ttk.Frame(ventana, padding="20")
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Campos del formulario
-        ttk.Label(frame, text="Nombre:").grid(row=0, column=0, sticky=tk.W, pady=5)
-        entry_nombre = ttk.Entry(frame, width=30)
-        entry_nombre.grid(row=0, column=1, pady=5)
-        
-        ttk.Label(frame, text="Apellido:").grid(row=1, column=0, sticky=tk.W, pady=5)
-        entry_apellido = ttk.Entry(frame, width=30)
-        entry_apellido.grid(row=1, column=1, pady=5)
-        
-        ttk.Label(frame, text="Teléfono:").grid(row=2, column=0, sticky=tk.W, pady=5)
-        entry_telefono = ttk.Entry(frame, width=30)
-        entry_telefono.grid(row=2, column=1, pady=5)
-        
-        def guardar_alumno():
-            nombre = entry_nombre.get().strip()
-            apellido = entry_apellido.get().strip()
-            telefono = entry_telefono.get().strip()
-            
-            if not nombre or not apellido:
-                messagebox.showerror("Error", "Nombre y apellido son obligatorios")
-                return
-            
-            try:
-                self.cursor.execute('''
-                    INSERT INTO alumnos (nombre, apellido, telefono)
-                    VALUES (?, ?, ?)
-                ''', (nombre, apellido, telefono))
-                self.conn.commit()
-                messagebox.showinfo("Éxito", "Alumno registrado correctamente")
-                ventana.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al registrar alumno: {str(e)}")
-        
-        # Botones
-        btn_guardar = ttk.Button(frame, text="Guardar", command=guardar_alumno)
-        btn_guardar.grid(row=3, column=0, pady=20)
-        
-        btn_cancelar = ttk.Button(frame, text="Cancelar", command=ventana.destroy)
-        btn_cancelar.grid(row=3, column=1, pady=20)
-    
-    def abrir_marcar_asistencia(self):
-        """Abrir ventana para marcar asistencia"""
-        ventana = tk.Toplevel(self.root)
-        ventana.title("Marcar Asistencia")
-        ventana.geometry("600x500")
-        ventana.grab_set()
-        
-        frame = ttk.Frame(ventana, padding="20")
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Título con fecha
-        fecha_hoy = date.today().strftime("%d/%m/%Y")
-        ttk.Label(frame, text=f"Asistencia del día: {fecha_hoy}", 
-                 font=("Arial", 12, "bold")).pack(pady=(0, 20))
-        
-        # Obtener lista de alumnos
-        self.cursor.execute("SELECT id, nombre, apellido FROM alumnos ORDER BY apellido, nombre")
-        alumnos = self.cursor.fetchall()
-        
-        if not alumnos:
-            ttk.Label(frame, text="No hay alumnos registrados").pack()
-            return
-        
-        # Frame para la lista de alumnos
-        frame_lista = ttk.Frame(frame)
-        frame_lista.pack(fill=tk.BOTH, expand=True)
-        
-        # Crear Treeview para mostrar alumnos
-        columns = ("Nombre", "Apellido", "Asistencia")
-        tree = ttk.Treeview(frame_lista, columns=columns, show="headings", height=15)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=150)
-        
-        # Variables para checkboxes
-        checkboxes = {}
-        
-        for alumno in alumnos:
-            alumno_id, nombre, apellido = alumno
-            
-            # Verificar si ya tiene asistencia marcada hoy
-            self.cursor.execute('''
-                SELECT presente FROM asistencias 
-                WHERE alumno_id = ? AND fecha = ?
-            ''', (alumno_id, date.today()))
-            resultado = self.cursor.fetchone()
-            presente = resultado[0] if resultado else False
-            
-            # Insertar en treeview
-            item_id = tree.insert("", "end", values=(nombre, apellido, "✓" if presente else "✗"))
-            checkboxes[item_id] = (alumno_id, presente)
-        
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(frame_lista, orient=tk.VERTICAL, command=tree.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        tree.configure(yscrollcommand=scrollbar.set)
-        
-        def toggle_asistencia(event):
-            item = tree.selection()[0]
-            alumno_id, estado_actual = checkboxes[item]
-            nuevo_estado = not estado_actual
-            
-            # Actualizar en base de datos
-            if nuevo_estado:
-                # Marcar como presente
-                self.cursor.execute('''
-                    INSERT OR REPLACE INTO asistencias (alumno_id, fecha, presente)
-                    VALUES (?, ?, 1)
-                ''', (alumno_id, date.today()))
-            else:
-                # Marcar como ausente
-                self.cursor.execute('''
-                    INSERT OR REPLACE INTO asistencias (alumno_id, fecha, presente)
-                    VALUES (?, ?, 0)
-                ''', (alumno_id, date.today()))
-            
-            self.conn.commit()
-            
-            # Actualizar visualización
-            checkboxes[item] = (alumno_id, nuevo_estado)
-            tree.item(item, values=(tree.item(item)['values'][0], 
-                                   tree.item(item)['values'][1], 
-                                   "✓" if nuevo_estado else "✗"))
-        
-        tree.bind("<Double-1>", toggle_asistencia)
-        
-        # Botón cerrar
-        ttk.Button(frame, text="Cerrar", command=ventana.destroy).pack(pady=20)
-    
-    def ver_alumnos(self):
-        """Mostrar lista de todos los alumnos"""
-        ventana = tk.Toplevel(self.root)
-        ventana.title("Lista de Alumnos")
-        ventana.geometry("600x400")
-        
-        frame = ttk.Frame(ventana, padding="20")
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Título
-        ttk.Label(frame, text="Lista de Alumnos", 
-                 font=("Arial", 12, "bold")).pack(pady=(0, 20))
-        
-        # Obtener alumnos
-        self.cursor.execute("SELECT nombre, apellido, telefono, fecha_registro FROM alumnos ORDER BY apellido, nombre")
-        alumnos = self.cursor.fetchall()
-        
-        if not alumnos:
-            ttk.Label(frame, text="No hay alumnos registrados").pack()
-            return
-        
-        # Crear Treeview
-        columns = ("Nombre", "Apellido", "Teléfono", "Fecha Registro")
-        tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        
-        for alumno in alumnos:
-            tree.insert("", "end", values=alumno)
-        
-        tree.pack(fill=tk.BOTH, expand=True)
-        
-        # Botón cerrar
-        ttk.Button(frame, text="Cerrar", command=ventana.destroy).pack(pady=20)
-    
-    def ver_asistencias_hoy(self):
-        """Mostrar asistencias del día actual"""
-        ventana = tk.Toplevel(self.root)
-        ventana.title("Asistencias de Hoy")
-        ventana.geometry("500x400")
-        
-        frame = ttk.Frame(ventana, padding="20")
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        fecha_hoy = date.today().strftime("%d/%m/%Y")
-        ttk.Label(frame, text=f"Asistencias del día: {fecha_hoy}", 
-                 font=("Arial", 12, "bold")).pack(pady=(0, 20))
-        
-        # Obtener asistencias de hoy
-        self.cursor.execute('''
-            SELECT a.nombre, a.apellido, ast.presente
-            FROM alumnos a
-            LEFT JOIN asistencias ast ON a.id = ast.alumno_id AND ast.fecha = ?
-            ORDER BY a.apellido, a.nombre
-        ''', (date.today(),))
-        
-        asistencias = self.cursor.fetchall()
-        
-        if not asistencias:
-            ttk.Label(frame, text="No hay alumnos registrados").pack()
-            return
-        
-        # Crear Treeview
-        columns = ("Nombre", "Apellido", "Estado")
-        tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        
-        for asistencia in asistencias:
-            nombre, apellido, presente = asistencia
-            estado = "Presente" if presente else "Ausente" if presente is not None else "Sin marcar"
-            tree.insert("", "end", values=(nombre, apellido, estado))
-        
-        tree.pack(fill=tk.BOTH, expand=True)
-        
-        # Botón cerrar
-        ttk.Button(frame, text="Cerrar", command=ventana.destroy).pack(pady=20)
-    
-    def run(self):
-        """Ejecutar la aplicación"""
-        self.root.mainloop()
-        self.conn.close()
-
-if __name__ == "__main__":
-    app = SistemaAsistenciaYoga()
-    app.run()
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Asistencia para Clases de Yoga
+Versión Básica
+
+Todo el trabajo con la base corre en un hilo aparte (Trabajador), así la
+ventana no se congela mientras se consulta o se guarda. Las listas se
+cargan con una sola consulta y se insertan en el Treeview de a tandas.
+
+Con SINCRONIZAR_URL la base local se sincroniza en segundo plano con la
+versión web (ver sincronizar.py): se trabaja igual sin conexión y los
+cambios suben cuando vuelve.
+"""
+
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import datetime, date
+import os
+
+import asistencia_mensual
+import basedatos
+import db_pool
+import migraciones
+import particiones
+import sincronizar
+from alumnos import ROSTER_DEL_DIA, insertar_alumno, validar_alumno
+
+# Milisegundos entre revisiones de los resultados del trabajador
+REVISAR_CADA_MS = 30
+
+# Filas que se insertan en un Treeview antes de dejar que Tk dibuje
+FILAS_POR_TANDA = 300
+
+# Milisegundos entre actualizaciones del estado de la sincronización
+ESTADO_SINCRONIZACION_MS = 2000
+
+
+class Trabajador(threading.Thread):
+    """Hilo que hace las consultas y escrituras fuera del hilo de Tk
+
+    Los widgets solo se pueden tocar desde el hilo de Tk: el resultado de
+    cada encargo vuelve por una cola que la ventana revisa con after() y
+    se entrega a al_terminar (o el error a al_fallar) en ese hilo. Los
+    encargos se hacen de a uno y en orden.
+    """
+
+    def __init__(self, root):
+        super().__init__(name='trabajador-db', daemon=True)
+        self.root = root
+        self._encargos = queue.Queue()
+        self._resultados = queue.Queue()
+        self.start()
+        self._revisar()
+
+    def encargar(self, funcion, al_terminar=None, al_fallar=None):
+        self._encargos.put((funcion, al_terminar, al_fallar))
+
+    def run(self):
+        while True:
+            funcion, al_terminar, al_fallar = self._encargos.get()
+            if funcion is None:
+                break
+            try:
+                self._resultados.put((al_terminar, funcion()))
+            except Exception as e:
+                self._resultados.put((al_fallar or _mostrar_error, e))
+
+    def _revisar(self):
+        while True:
+            try:
+                entregar, valor = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            if entregar is not None:
+                entregar(valor)
+        self.root.after(REVISAR_CADA_MS, self._revisar)
+
+    def parar(self):
+        """Terminar después de los encargos pendientes"""
+        self._encargos.put((None, None, None))
+        self.join()
+
+
+def _mostrar_error(error):
+    messagebox.showerror("Error", f"Error con la base de datos: {error}")
+
+
+def llenar_por_partes(tree, filas, valores, al_insertar=None):
+    """Insertar filas en el Treeview de a FILAS_POR_TANDA, sin congelar la ventana
+
+    Entre una tanda y la siguiente Tk dibuja y atiende eventos, así que
+    las primeras filas se ven enseguida aunque sean miles.
+    """
+    def tanda(inicio):
+        if not tree.winfo_exists():
+            return
+        for fila in filas[inicio:inicio + FILAS_POR_TANDA]:
+            item = tree.insert("", "end", values=valores(fila))
+            if al_insertar is not None:
+                al_insertar(item, fila)
+        if inicio + FILAS_POR_TANDA < len(filas):
+            tree.after(1, tanda, inicio + FILAS_POR_TANDA)
+    tanda(0)
+
+
+class SistemaAsistenciaYoga:
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title("Sistema de Asistencia - Clases de Yoga")
+        self.root.geometry("800x600")
+        
+        # Crear base de datos
+        self.crear_base_datos()
+        self.trabajador = Trabajador(self.root)
+        self.sincronizador = None
+        if sincronizar.activo():
+            self.sincronizador = sincronizar.Sincronizador(sincronizar.ClienteHTTP(sincronizar.URL))
+            self.sincronizador.start()
+        
+        # Crear interfaz
+        self.crear_interfaz()
+        
+    def crear_base_datos(self):
+        """Preparar la base de datos (la misma que usa la versión web)"""
+        migraciones.migrar()
+        particiones.asegurar()
+    
+    def avisar_cambio(self):
+        """Que el sincronizador suba enseguida lo que se acaba de encolar"""
+        if self.sincronizador is not None:
+            self.sincronizador.avisar()
+    
+    def mostrar_sincronizacion(self):
+        """Actualizar la línea de estado de la sincronización"""
+        estado = self.sincronizador.estado
+        if estado['error']:
+            texto = f"Sincronización: {estado['error']}"
+        elif estado['ultima'] is None:
+            texto = "Sincronizando..."
+        else:
+            texto = f"Sincronizado a las {estado['ultima'].strftime('%H:%M')}"
+        if estado['pendientes']:
+            texto += f" ({estado['pendientes']} cambios por enviar)"
+        self.etiqueta_sincronizacion.config(text=texto)
+        self.root.after(ESTADO_SINCRONIZACION_MS, self.mostrar_sincronizacion)
+    
+    def crear_interfaz(self):
+        """Crear la interfaz principal"""
+        # Frame principal
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Título
+        titulo = ttk.Label(main_frame, text="Sistema de Asistencia - Clases de Yoga", 
+                          font=("Arial", 16, "bold"))
+        titulo.grid(row=0, column=0, columnspan=2, pady=(0, 20))
+        
+        # Botones principales
+        btn_registrar = ttk.Button(main_frame, text="Registrar Alumno", 
+                                  command=self.abrir_registro_alumno)
+        btn_registrar.grid(row=1, column=0, padx=5, pady=5, sticky=(tk.W, tk.E))
+        
+        btn_asistencia = ttk.Button(main_frame, text="Marcar Asistencia", 
+                                   command=self.abrir_marcar_asistencia)
+        btn_asistencia.grid(row=1, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+        
+        btn_ver_alumnos = ttk.Button(main_frame, text="Ver Alumnos", 
+                                    command=self.ver_alumnos)
+        btn_ver_alumnos.grid(row=2, column=0, padx=5, pady=5, sticky=(tk.W, tk.E))
+        
+        btn_ver_asistencias = ttk.Button(main_frame, text="Ver Asistencias de Hoy", 
+                                        command=self.ver_asistencias_hoy)
+        btn_ver_asistencias.grid(row=2, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+        
+        # Estado de la sincronización con la versión web
+        if self.sincronizador is not None:
+            self.etiqueta_sincronizacion = ttk.Label(main_frame, text="Sincronizando...")
+            self.etiqueta_sincronizacion.grid(row=3, column=0, columnspan=2, pady=(20, 0))
+            self.mostrar_sincronizacion()
+        
+        # Configurar columnas
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+    
+    def abrir_registro_alumno(self):
+        """Abrir ventana para registrar nuevo alumno"""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Registrar Nuevo Alumno")
+        ventana.geometry("400x300")
+        ventana.grab_set()  # Hacer modal
+        
+        frame = ttk.Frame(ventana, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Campos del formulario
+        ttk.Label(frame, text="Nombre:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        entry_nombre = ttk.Entry(frame, width=30)
+        entry_nombre.grid(row=0, column=1, pady=5)
+        
+        ttk.Label(frame, text="Apellido:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        entry_apellido = ttk.Entry(frame, width=30)
+        entry_apellido.grid(row=1, column=1, pady=5)
+        
+        ttk.Label(frame, text="Teléfono:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        entry_telefono = ttk.Entry(frame, width=30)
+        entry_telefono.grid(row=2, column=1, pady=5)
+        
+        def guardar_alumno():
+            datos, error = validar_alumno(entry_nombre.get(), entry_apellido.get(), entry_telefono.get())
+            if error:
+                messagebox.showerror("Error", error)
+                return
+            
+            def registrado(_):
+                messagebox.showinfo("Éxito", "Alumno registrado correctamente")
+                if ventana.winfo_exists():
+                    ventana.destroy()
+            
+            def fallo(e):
+                messagebox.showerror("Error", f"Error al registrar alumno: {str(e)}")
+                if ventana.winfo_exists():
+                    btn_guardar.state(['!disabled'])
+            
+            # El alta y su pendiente de sincronización, en la misma transacción
+            def registrar():
+                with db_pool.transaccion() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        alumno_id = insertar_alumno(cursor, *datos)
+                        sincronizar.encolar(cursor, [('alumno', alumno_id, None, None)])
+                    finally:
+                        cursor.close()
+                self.avisar_cambio()
+            
+            # Deshabilitado mientras se guarda, para no registrarlo dos veces
+            btn_guardar.state(['disabled'])
+            self.trabajador.encargar(registrar, registrado, fallo)
+        
+        # Botones
+        btn_guardar = ttk.Button(frame, text="Guardar", command=guardar_alumno)
+        btn_guardar.grid(row=3, column=0, pady=20)
+        
+        btn_cancelar = ttk.Button(frame, text="Cancelar", command=ventana.destroy)
+        btn_cancelar.grid(row=3, column=1, pady=20)
+    
+    def abrir_marcar_asistencia(self):
+        """Abrir ventana para marcar asistencia"""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Marcar Asistencia")
+        ventana.geometry("600x500")
+        ventana.grab_set()
+        
+        frame = ttk.Frame(ventana, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Título con fecha
+        hoy = date.today()
+        fecha_hoy = hoy.strftime("%d/%m/%Y")
+        ttk.Label(frame, text=f"Asistencia del día: {fecha_hoy}", 
+                 font=("Arial", 12, "bold")).pack(pady=(0, 20))
+        
+        # Botón cerrar (abajo, antes de que llegue la lista)
+        ttk.Button(frame, text="Cerrar", command=ventana.destroy).pack(side=tk.BOTTOM, pady=20)
+        cargando = ttk.Label(frame, text="Cargando alumnos...")
+        cargando.pack()
+        
+        def mostrar(alumnos):
+            if not ventana.winfo_exists():
+                return
+            cargando.destroy()
+            
+            if not alumnos:
+                ttk.Label(frame, text="No hay alumnos registrados").pack()
+                return
+            
+            # Frame para la lista de alumnos
+            frame_lista = ttk.Frame(frame)
+            frame_lista.pack(fill=tk.BOTH, expand=True)
+            
+            # Crear Treeview para mostrar alumnos
+            columns = ("Nombre", "Apellido", "Asistencia")
+            tree = ttk.Treeview(frame_lista, columns=columns, show="headings", height=15)
+            
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=150)
+            
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            
+            # Scrollbar
+            scrollbar = ttk.Scrollbar(frame_lista, orient=tk.VERTICAL, command=tree.yview)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.configure(yscrollcommand=scrollbar.set)
+            
+            # Estado de cada fila: (alumno_id, presente); los que se están
+            # guardando quedan en pendientes hasta que responde la base
+            checkboxes = {}
+            pendientes = set()
+            
+            def recordar(item, alumno):
+                checkboxes[item] = (alumno.id, bool(alumno.presente))
+            
+            llenar_por_partes(tree, alumnos,
+                              lambda alumno: (alumno.nombre, alumno.apellido, "✓" if alumno.presente else "✗"),
+                              recordar)
+            
+            def marcar(item, texto):
+                valores = tree.item(item)['values']
+                tree.item(item, values=(valores[0], valores[1], texto))
+            
+            def toggle_asistencia(event):
+                seleccion = tree.selection()
+                if not seleccion or seleccion[0] in pendientes:
+                    return
+                item = seleccion[0]
+                alumno_id, estado_actual = checkboxes[item]
+                nuevo_estado = not estado_actual
+                pendientes.add(item)
+                marcar(item, "…")
+                
+                # Mismo camino que la versión web, que mantiene también el
+                # acumulado mensual; la marca queda pendiente de sincronizar
+                def guardar():
+                    with db_pool.transaccion() as conn:
+                        guardados = asistencia_mensual.guardar_asistencias(conn, [(alumno_id, hoy, nuevo_estado)])
+                        cursor = conn.cursor()
+                        try:
+                            if guardados:
+                                sincronizar.encolar(cursor, [('asistencia', alumno_id, hoy, nuevo_estado)])
+                        finally:
+                            cursor.close()
+                    self.avisar_cambio()
+                
+                def guardado(_):
+                    pendientes.discard(item)
+                    if tree.winfo_exists():
+                        checkboxes[item] = (alumno_id, nuevo_estado)
+                        marcar(item, "✓" if nuevo_estado else "✗")
+                
+                def fallo(e):
+                    pendientes.discard(item)
+                    if tree.winfo_exists():
+                        marcar(item, "✓" if estado_actual else "✗")
+                    _mostrar_error(e)
+                
+                self.trabajador.encargar(guardar, guardado, fallo)
+            
+            tree.bind("<Double-1>", toggle_asistencia)
+        
+        # Una sola consulta, como la versión web: alumnos con su asistencia de hoy
+        self.trabajador.encargar(lambda: basedatos.consultar(ROSTER_DEL_DIA, (hoy,)), mostrar)
+    
+    def ver_alumnos(self):
+        """Mostrar lista de todos los alumnos"""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Lista de Alumnos")
+        ventana.geometry("600x400")
+        
+        frame = ttk.Frame(ventana, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Título
+        ttk.Label(frame, text="Lista de Alumnos", 
+                 font=("Arial", 12, "bold")).pack(pady=(0, 20))
+        
+        # Botón cerrar
+        ttk.Button(frame, text="Cerrar", command=ventana.destroy).pack(side=tk.BOTTOM, pady=20)
+        cargando = ttk.Label(frame, text="Cargando alumnos...")
+        cargando.pack()
+        
+        def mostrar(alumnos):
+            if not ventana.winfo_exists():
+                return
+            cargando.destroy()
+            
+            if not alumnos:
+                ttk.Label(frame, text="No hay alumnos registrados").pack()
+                return
+            
+            # Crear Treeview
+            columns = ("Nombre", "Apellido", "Teléfono", "Fecha Registro")
+            tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
+            
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=120)
+            
+            tree.pack(fill=tk.BOTH, expand=True)
+            llenar_por_partes(tree, alumnos, lambda alumno: (alumno['nombre'], alumno['apellido'],
+                                                             alumno['telefono'], alumno['fecha_registro']))
+        
+        # Obtener alumnos
+        self.trabajador.encargar(lambda: basedatos.consultar(
+            "SELECT nombre, apellido, telefono, fecha_registro FROM alumnos ORDER BY apellido, nombre"), mostrar)
+    
+    def ver_asistencias_hoy(self):
+        """Mostrar asistencias del día actual"""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Asistencias de Hoy")
+        ventana.geometry("500x400")
+        
+        frame = ttk.Frame(ventana, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        fecha_hoy = date.today().strftime("%d/%m/%Y")
+        ttk.Label(frame, text=f"Asistencias del día: {fecha_hoy}", 
+                 font=("Arial", 12, "bold")).pack(pady=(0, 20))
+        
+        # Botón cerrar
+        ttk.Button(frame, text="Cerrar", command=ventana.destroy).pack(side=tk.BOTTOM, pady=20)
+        cargando = ttk.Label(frame, text="Cargando asistencias...")
+        cargando.pack()
+        
+        def estado(asistencia):
+            presente = asistencia['presente']
+            return (asistencia['nombre'], asistencia['apellido'],
+                    "Presente" if presente else "Ausente" if presente is not None else "Sin marcar")
+        
+        def mostrar(asistencias):
+            if not ventana.winfo_exists():
+                return
+            cargando.destroy()
+            
+            if not asistencias:
+                ttk.Label(frame, text="No hay alumnos registrados").pack()
+                return
+            
+            # Crear Treeview
+            columns = ("Nombre", "Apellido", "Estado")
+            tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
+            
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=120)
+            
+            tree.pack(fill=tk.BOTH, expand=True)
+            llenar_por_partes(tree, asistencias, estado)
+        
+        # Obtener asistencias de hoy
+        self.trabajador.encargar(lambda: basedatos.consultar(ROSTER_DEL_DIA, (date.today(),)), mostrar)
+    
+    def run(self):
+        """Ejecutar la aplicación"""
+        self.root.mainloop()
+        if self.sincronizador is not None:
+            self.sincronizador.parar()
+        self.trabajador.parar()
+        db_pool.cerrar()
+
+if __name__ == "__main__":
+    app = SistemaAsistenciaYoga()
+    app.run()
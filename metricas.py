@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas de la aplicación en formato Prometheus (/metrics)
+
+Por cada pedido se registra, con la ruta (la regla de Flask, no la URL)
+como etiqueta:
+
+- yoga_http_duracion_segundos          latencia del pedido
+- yoga_http_pedidos_total              pedidos por ruta, método y código
+- yoga_db_consultas_por_pedido         sentencias ejecutadas
+- yoga_db_tiempo_consultas_segundos    tiempo total en la base
+- yoga_db_tiempo_conexion_segundos     tiempo en obtener conexiones del pool
+
+Las consultas y las conexiones las informa db_pool (ver CursorSQLite y
+cursor_postgres) al hilo que atiende el pedido, así que se cuentan
+también las que no pasan por execute_query. El costo es un par de sumas
+por sentencia y una toma de lock por pedido; se desactiva con
+METRICAS=0.
+
+Con varios workers de gunicorn cada proceso tiene sus propios contadores:
+cada scrape de /metrics ve los del worker que lo atiende (la etiqueta pid
+permite distinguirlos).
+"""
+
+import bisect
+import os
+import threading
+import time
+
+ACTIVAS = os.environ.get('METRICAS', '1') == '1'
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_local = threading.local()
+
+
+class Histograma:
+    """Histograma con buckets fijos por combinación de etiquetas (sin lock propio)"""
+
+    def __init__(self, nombre, ayuda, buckets, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(buckets)
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}    # valores de etiquetas -> [conteos por bucket..., suma, total]
+
+    def observar(self, valores, valor):
+        serie = self._series.get(valores)
+        if serie is None:
+            serie = self._series[valores] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        serie[bisect.bisect_left(self.buckets, valor)] += 1
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def exponer(self, pid):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        for valores, serie in sorted(self._series.items()):
+            etiquetas = _etiquetas(self.etiquetas, valores, pid)
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float('inf'),), serie):
+                acumulado += conteo
+                le = '+Inf' if limite == float('inf') else _numero(limite)
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas},le="{le}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{{{etiquetas}}} {_numero(serie[-2])}')
+            lineas.append(f'{self.nombre}_count{{{etiquetas}}} {serie[-1]}')
+        return lineas
+
+
+class Contador:
+    """Contador por combinación de etiquetas (sin lock propio)"""
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+
+    def sumar(self, valores, n=1):
+        self._series[valores] = self._series.get(valores, 0) + n
+
+    def exponer(self, pid):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} counter']
+        for valores, total in sorted(self._series.items()):
+            lineas.append(f'{self.nombre}{{{_etiquetas(self.etiquetas, valores, pid)}}} {total}')
+        return lineas
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, pid):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    pares.append(f'pid="{pid}"')
+    return ','.join(pares)
+
+
+class Registro:
+    """Métricas de pedidos del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duracion = Histograma(
+            'yoga_http_duracion_segundos', 'Latencia de los pedidos HTTP',
+            BUCKETS_SEGUNDOS, ('ruta', 'metodo'))
+        self.pedidos = Contador(
+            'yoga_http_pedidos_total', 'Pedidos HTTP atendidos', ('ruta', 'metodo', 'codigo'))
+        self.consultas = Histograma(
+            'yoga_db_consultas_por_pedido', 'Sentencias SQL ejecutadas por pedido',
+            BUCKETS_CONSULTAS, ('ruta',))
+        self.tiempo_consultas = Histograma(
+            'yoga_db_tiempo_consultas_segundos', 'Tiempo en la base de datos por pedido',
+            BUCKETS_SEGUNDOS, ('ruta',))
+        self.tiempo_conexion = Histograma(
+            'yoga_db_tiempo_conexion_segundos', 'Tiempo obteniendo conexiones del pool por pedido',
+            BUCKETS_SEGUNDOS, ('ruta',))
+
+    def observar_pedido(self, ruta, metodo, codigo, duracion, consultas, tiempo_db, tiempo_conexion):
+        with self._lock:
+            self.duracion.observar((ruta, metodo), duracion)
+            self.pedidos.sumar((ruta, metodo, codigo))
+            self.consultas.observar((ruta,), consultas)
+            self.tiempo_consultas.observar((ruta,), tiempo_db)
+            self.tiempo_conexion.observar((ruta,), tiempo_conexion)
+
+    def exponer(self):
+        pid = os.getpid()
+        with self._lock:
+            lineas = []
+            for metrica in (self.duracion, self.pedidos, self.consultas,
+                            self.tiempo_consultas, self.tiempo_conexion):
+                lineas.extend(metrica.exponer(pid))
+        return lineas
+
+
+registro = Registro()
+
+
+# --- Acumulado del pedido en curso (uno por hilo) ---
+
+def iniciar_pedido():
+    _local.pedido = [time.perf_counter(), 0, 0.0, 0.0]
+
+
+def registrar_consulta(segundos):
+    """Sumar una sentencia al pedido en curso (lo llama db_pool)"""
+    pedido = getattr(_local, 'pedido', None)
+    if pedido is not None:
+        pedido[1] += 1
+        pedido[2] += segundos
+
+
+def registrar_conexion(segundos):
+    """Sumar el tiempo de obtener una conexión al pedido en curso (lo llama db_pool)"""
+    pedido = getattr(_local, 'pedido', None)
+    if pedido is not None:
+        pedido[3] += segundos
+
+
+def terminar_pedido(ruta, metodo, codigo):
+    pedido = getattr(_local, 'pedido', None)
+    if pedido is None:
+        return
+    _local.pedido = None
+    inicio, consultas, tiempo_db, tiempo_conexion = pedido
+    registro.observar_pedido(ruta, metodo, str(codigo), time.perf_counter() - inicio,
+                             consultas, tiempo_db, tiempo_conexion)
+
+
+def _gauges(prefijo, ayuda, datos, pid):
+    lineas = []
+    for clave, valor in sorted(datos.items()):
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            continue
+        nombre = f'{prefijo}_{clave}'
+        lineas.append(f'# HELP {nombre} {ayuda} ({clave})')
+        lineas.append(f'# TYPE {nombre} gauge')
+        lineas.append(f'{nombre}{{pid="{pid}"}} {_numero(valor)}')
+    return lineas
+
+
+def exponer(pool_stats=None, cache_stats=None, eventos_stats=None):
+    """Texto de /metrics: histogramas de pedidos más el estado del pool, la cache y los streams"""
+    pid = os.getpid()
+    lineas = registro.exponer()
+    if pool_stats:
+        lineas.extend(_gauges('yoga_pool', 'Pool de conexiones', pool_stats, pid))
+        if pool_stats.get('replica'):
+            lineas.extend(_gauges('yoga_replica', 'Réplica de lectura y lecturas por destino',
+                                  pool_stats['replica'], pid))
+    if cache_stats:
+        lineas.extend(_gauges('yoga_cache', 'Cache del roster', cache_stats, pid))
+    if eventos_stats:
+        lineas.extend(_gauges('yoga_eventos', 'Streams de asistencia en vivo', eventos_stats, pid))
+    return '\n'.join(lineas) + '\n'
+
+
+def instalar(app):
+    """Registrar los hooks de Flask que miden cada pedido"""
+    if not ACTIVAS:
+        return
+
+    from flask import request
+
+    @app.before_request
+    def _iniciar_medicion():
+        iniciar_pedido()
+
+    @app.after_request
+    def _guardar_codigo(response):
+        _local.codigo = response.status_code
+        return response
+
+    @app.teardown_request
+    def _terminar_medicion(error=None):
+        codigo = getattr(_local, 'codigo', None) or 500
+        _local.codigo = None
+        ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        terminar_pedido(ruta, request.method, codigo)
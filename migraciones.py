@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migraciones versionadas del esquema
+
+Cada migración se aplica una sola vez y queda registrada en la tabla
+schema_version. Un paso puede ser una sentencia SQL o una función que
+recibe el cursor, para lo que depende de los datos (ver particiones).
+Se ejecutan al iniciar el proceso (ver app.py) o a mano:
+
+    python migraciones.py
+    flask --app app migrar
+"""
+
+import basedatos
+import db_pool
+import particiones
+
+# Clave del advisory lock de PostgreSQL que serializa a los workers que
+# arrancan a la vez
+LOCK_MIGRACIONES = 727001
+
+# (versión, descripción, {dialecto: [sentencias o funciones(cursor)]})
+MIGRACIONES = [
+    (1, 'Tablas alumnos y asistencias', {
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS alumnos (
+                id SERIAL PRIMARY KEY,
+                nombre VARCHAR(100) NOT NULL,
+                apellido VARCHAR(100) NOT NULL,
+                telefono VARCHAR(20),
+                fecha_registro DATE DEFAULT CURRENT_DATE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS asistencias (
+                id SERIAL PRIMARY KEY,
+                alumno_id INTEGER,
+                fecha DATE NOT NULL,
+                presente BOOLEAN DEFAULT FALSE,
+                FOREIGN KEY (alumno_id) REFERENCES alumnos (id)
+            )
+            ''',
+        ],
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS alumnos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre TEXT NOT NULL,
+                apellido TEXT NOT NULL,
+                telefono TEXT,
+                fecha_registro DATE DEFAULT CURRENT_DATE
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS asistencias (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                alumno_id INTEGER,
+                fecha DATE NOT NULL,
+                presente BOOLEAN DEFAULT 0,
+                FOREIGN KEY (alumno_id) REFERENCES alumnos (id)
+            )
+            ''',
+        ],
+    }),
+    (2, 'Una sola asistencia por alumno y fecha (UNIQUE alumno_id, fecha)', {
+        # Antes no había restricción: se conserva la marca más reciente
+        'postgresql': [
+            '''
+            DELETE FROM asistencias a
+            USING asistencias b
+            WHERE a.alumno_id = b.alumno_id
+              AND a.fecha = b.fecha
+              AND a.id < b.id
+            ''',
+            '''
+            ALTER TABLE asistencias
+            ADD CONSTRAINT asistencias_alumno_fecha_key UNIQUE (alumno_id, fecha)
+            ''',
+        ],
+        'sqlite': [
+            '''
+            DELETE FROM asistencias
+            WHERE rowid NOT IN (
+                SELECT MAX(rowid) FROM asistencias GROUP BY alumno_id, fecha
+            )
+            ''',
+            '''
+            CREATE UNIQUE INDEX IF NOT EXISTS asistencias_alumno_fecha_key
+            ON asistencias (alumno_id, fecha)
+            ''',
+        ],
+    }),
+    (3, 'Índice asistencias (fecha, alumno_id)', {
+        'postgresql': [
+            'CREATE INDEX IF NOT EXISTS idx_asistencias_fecha_alumno ON asistencias (fecha, alumno_id)',
+        ],
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_asistencias_fecha_alumno ON asistencias (fecha, alumno_id)',
+        ],
+    }),
+    (4, 'Índice alumnos (apellido, nombre)', {
+        'postgresql': [
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_apellido_nombre ON alumnos (apellido, nombre)',
+        ],
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_apellido_nombre ON alumnos (apellido, nombre)',
+        ],
+    }),
+    (5, 'Índices para paginar y buscar alumnos y contar registrados por fecha', {
+        # (apellido, nombre, id) cubre el ORDER BY y la condición de keyset;
+        # reemplaza al índice de la migración 4
+        'postgresql': [
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_orden ON alumnos (apellido, nombre, id)',
+            'DROP INDEX IF EXISTS idx_alumnos_apellido_nombre',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_apellido_prefijo ON alumnos (lower(apellido) text_pattern_ops)',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_nombre_prefijo ON alumnos (lower(nombre) text_pattern_ops)',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_telefono_prefijo ON alumnos (telefono text_pattern_ops)',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_fecha_registro ON alumnos (fecha_registro)',
+        ],
+        # LIKE 'texto%' usa un índice solo si tiene collation NOCASE
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_orden ON alumnos (apellido, nombre, id)',
+            'DROP INDEX IF EXISTS idx_alumnos_apellido_nombre',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_apellido_prefijo ON alumnos (apellido COLLATE NOCASE)',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_nombre_prefijo ON alumnos (nombre COLLATE NOCASE)',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_telefono_prefijo ON alumnos (telefono COLLATE NOCASE)',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_fecha_registro ON alumnos (fecha_registro)',
+        ],
+    }),
+    (6, 'Acumulado mensual de asistencia por alumno (asistencias_mensuales)', {
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS asistencias_mensuales (
+                alumno_id INTEGER NOT NULL REFERENCES alumnos (id),
+                mes DATE NOT NULL,
+                presentes INTEGER NOT NULL DEFAULT 0,
+                ausentes INTEGER NOT NULL DEFAULT 0,
+                marcadas INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (alumno_id, mes)
+            )
+            ''',
+            '''
+            INSERT INTO asistencias_mensuales (alumno_id, mes, presentes, ausentes, marcadas)
+            SELECT alumno_id,
+                   date_trunc('month', fecha)::date,
+                   SUM(CASE WHEN presente THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN presente THEN 0 ELSE 1 END),
+                   COUNT(*)
+            FROM asistencias
+            WHERE presente IS NOT NULL AND alumno_id IS NOT NULL
+            GROUP BY alumno_id, date_trunc('month', fecha)
+            ''',
+        ],
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS asistencias_mensuales (
+                alumno_id INTEGER NOT NULL REFERENCES alumnos (id),
+                mes DATE NOT NULL,
+                presentes INTEGER NOT NULL DEFAULT 0,
+                ausentes INTEGER NOT NULL DEFAULT 0,
+                marcadas INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (alumno_id, mes)
+            )
+            ''',
+            '''
+            INSERT INTO asistencias_mensuales (alumno_id, mes, presentes, ausentes, marcadas)
+            SELECT alumno_id,
+                   date(fecha, 'start of month'),
+                   SUM(CASE WHEN presente THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN presente THEN 0 ELSE 1 END),
+                   COUNT(*)
+            FROM asistencias
+            WHERE presente IS NOT NULL AND alumno_id IS NOT NULL
+            GROUP BY alumno_id, date(fecha, 'start of month')
+            ''',
+        ],
+    }),
+    (7, 'Historial de cambios para sincronizar clientes (cambios)', {
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS cambios (
+                id BIGSERIAL PRIMARY KEY,
+                tipo VARCHAR(20) NOT NULL,
+                alumno_id INTEGER NOT NULL,
+                fecha DATE,
+                presente BOOLEAN,
+                momento TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+        ],
+        # AUTOINCREMENT: un id nunca se reutiliza, aunque se borren filas
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS cambios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                alumno_id INTEGER NOT NULL,
+                fecha DATE,
+                presente BOOLEAN,
+                momento TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+        ],
+    }),
+    (8, 'Asistencias particionadas por mes (PostgreSQL) o por año (SQLite)', {
+        # La clave primaria pasa a ser (alumno_id, fecha): en una tabla
+        # particionada toda restricción única tiene que incluir la fecha.
+        # id se conserva, con la misma secuencia, pero ya no es la clave.
+        'postgresql': [
+            'ALTER TABLE asistencias RENAME TO asistencias_sin_particionar',
+            'ALTER INDEX IF EXISTS asistencias_pkey RENAME TO asistencias_sin_particionar_pkey',
+            'ALTER INDEX IF EXISTS idx_asistencias_fecha_alumno RENAME TO idx_asistencias_sin_particionar',
+            '''
+            CREATE TABLE asistencias (
+                id INTEGER NOT NULL DEFAULT nextval('asistencias_id_seq'),
+                alumno_id INTEGER NOT NULL REFERENCES alumnos (id),
+                fecha DATE NOT NULL,
+                presente BOOLEAN DEFAULT FALSE,
+                CONSTRAINT asistencias_pkey PRIMARY KEY (alumno_id, fecha)
+            ) PARTITION BY RANGE (fecha)
+            ''',
+            'ALTER SEQUENCE asistencias_id_seq OWNED BY asistencias.id',
+            'CREATE INDEX idx_asistencias_fecha_alumno ON asistencias (fecha, alumno_id)',
+            particiones.copiar_tabla_anterior,
+            'DROP TABLE asistencias_sin_particionar',
+        ],
+        # Una tabla por año detrás de la vista asistencias
+        'sqlite': [
+            'ALTER TABLE asistencias RENAME TO asistencias_sin_particionar',
+            particiones.copiar_tabla_anterior,
+            'DROP TABLE asistencias_sin_particionar',
+        ],
+    }),
+    (9, 'Días presentes y marcados del mes como bits (asistencias_mensuales)', {
+        # Bit d - 1 para el día d. Los meses de particiones archivadas
+        # quedan con los bits en cero
+        'postgresql': [
+            '''
+            ALTER TABLE asistencias_mensuales
+                ADD COLUMN dias_presentes INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN dias_marcados INTEGER NOT NULL DEFAULT 0
+            ''',
+            '''
+            UPDATE asistencias_mensuales m
+            SET dias_presentes = b.presentes, dias_marcados = b.marcadas
+            FROM (
+                SELECT alumno_id,
+                       date_trunc('month', fecha)::date AS mes,
+                       SUM(CASE WHEN presente THEN 1 << (EXTRACT(DAY FROM fecha)::int - 1) ELSE 0 END) AS presentes,
+                       SUM(1 << (EXTRACT(DAY FROM fecha)::int - 1)) AS marcadas
+                FROM asistencias
+                WHERE presente IS NOT NULL
+                GROUP BY alumno_id, date_trunc('month', fecha)
+            ) b
+            WHERE m.alumno_id = b.alumno_id AND m.mes = b.mes
+            ''',
+        ],
+        'sqlite': [
+            'ALTER TABLE asistencias_mensuales ADD COLUMN dias_presentes INTEGER NOT NULL DEFAULT 0',
+            'ALTER TABLE asistencias_mensuales ADD COLUMN dias_marcados INTEGER NOT NULL DEFAULT 0',
+            '''
+            UPDATE asistencias_mensuales
+            SET (dias_presentes, dias_marcados) = (
+                SELECT COALESCE(SUM(CASE WHEN presente THEN 1 << (CAST(strftime('%d', fecha) AS INTEGER) - 1)
+                                         ELSE 0 END), 0),
+                       COALESCE(SUM(1 << (CAST(strftime('%d', fecha) AS INTEGER) - 1)), 0)
+                FROM asistencias
+                WHERE alumno_id = asistencias_mensuales.alumno_id
+                  AND fecha >= asistencias_mensuales.mes
+                  AND fecha < date(asistencias_mensuales.mes, '+1 month')
+                  AND presente IS NOT NULL
+            )
+            ''',
+        ],
+    }),
+    (10, 'Cola de pendientes y estado de la sincronización (escritorio)', {
+        # Solo la versión de escritorio (SQLite) sincroniza con una web
+        'postgresql': [],
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS pendientes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo VARCHAR(20) NOT NULL,
+                alumno_id INTEGER NOT NULL,
+                fecha DATE,
+                presente BOOLEAN,
+                creado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS alumnos_remotos (
+                alumno_id INTEGER PRIMARY KEY REFERENCES alumnos (id),
+                remoto_id INTEGER NOT NULL
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_alumnos_remotos_remoto ON alumnos_remotos (remoto_id)',
+            '''
+            CREATE TABLE IF NOT EXISTS sincronizacion (
+                clave VARCHAR(50) PRIMARY KEY,
+                valor TEXT
+            )
+            ''',
+        ],
+    }),
+    (11, 'Ids de asistencias sin repetir entre las tablas de cada año (SQLite)', {
+        # En PostgreSQL todas las particiones usan asistencias_id_seq
+        'postgresql': [],
+        'sqlite': [
+            particiones.separar_ids_sqlite,
+        ],
+    }),
+    (12, 'Transacción de cada cambio para ordenar /api/changes sin bloquear (PostgreSQL)', {
+        # Las filas anteriores quedan con xid 0: los cursores de antes (un
+        # id solo) siguen valiendo como "0:id"
+        'postgresql': [
+            'ALTER TABLE cambios ADD COLUMN IF NOT EXISTS xid BIGINT NOT NULL DEFAULT 0',
+            'ALTER TABLE cambios ALTER COLUMN xid SET DEFAULT txid_current()',
+            'CREATE INDEX IF NOT EXISTS idx_cambios_xid_id ON cambios (xid, id)',
+        ],
+        # Las escrituras ya están serializadas: alcanza con el id
+        'sqlite': [],
+    }),
+    (13, 'Año con cuatro cifras en las tablas de asistencias anteriores al año 1000 (SQLite)', {
+        # En PostgreSQL las particiones se encuentran por pg_inherits, sin
+        # importar el nombre
+        'postgresql': [],
+        'sqlite': [
+            particiones.completar_nombres_sqlite,
+        ],
+    }),
+]
+
+SQL_SCHEMA_VERSION = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        descripcion VARCHAR(200),
+        aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def migrar():
+    """Aplicar las migraciones pendientes; devuelve las versiones aplicadas"""
+    dialecto = basedatos.dialecto()
+    postgresql = dialecto == 'postgresql'
+
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            # Tomar el lock antes de leer las versiones: si dos procesos
+            # arrancan juntos, el segundo ve lo que aplicó el primero (en
+            # SQLite la transacción ya empieza con el lock de escritura)
+            if postgresql:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', (LOCK_MIGRACIONES,))
+
+            cursor.execute(SQL_SCHEMA_VERSION)
+            cursor.execute('SELECT version FROM schema_version')
+            aplicadas = {fila[0] for fila in cursor.fetchall()}
+
+            nuevas = []
+            for version, descripcion, sentencias in MIGRACIONES:
+                if version in aplicadas:
+                    continue
+                for paso in sentencias[dialecto]:
+                    if callable(paso):
+                        paso(cursor)
+                    else:
+                        cursor.execute(paso)
+                basedatos.ejecutar_en(
+                    cursor, 'INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)',
+                    (version, descripcion))
+                nuevas.append(version)
+        finally:
+            cursor.close()
+
+    if nuevas:
+        print(f"Migraciones aplicadas: {', '.join(str(v) for v in nuevas)}")
+    return nuevas
+
+
+def version_actual():
+    """Última versión del esquema aplicada (0 si no hay ninguna)"""
+    with db_pool.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT MAX(version) FROM schema_version')
+            fila = cursor.fetchone()
+            return fila[0] or 0
+        finally:
+            cursor.close()
+
+
+if __name__ == '__main__':
+    migrar()
+    print(f"Esquema en versión {version_actual()}")
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Particiones de la tabla asistencias por fecha
+
+- PostgreSQL: asistencias es una tabla particionada por rango de fecha
+  (PARTITION BY RANGE), con una partición por mes: asistencias_AAAA_MM.
+  Las consultas que filtran por fecha, que son todas las de la
+  aplicación, leen solo las particiones de esos meses.
+- SQLite: una tabla por año, asistencias_AAAA, y una vista asistencias
+  que las une (UNION ALL). SQLite lleva la condición sobre fecha a cada
+  tabla de la vista, así que las lecturas no cambian; las escrituras van
+  a la tabla del año (tabla_de), porque una vista no admite upsert.
+  Cada tabla numera sus ids en su propio rango (IDS_POR_ANIO), así que
+  un id no se repite en la vista.
+
+Las particiones se crean solas: al iniciar el proceso, la del mes en
+curso y las de los PARTICIONES_ADELANTE meses siguientes (asegurar), y al
+escribir, la de cualquier fecha que todavía no tenga (asegurar_fechas).
+
+Los meses viejos se archivan con archivar(). En PostgreSQL la partición
+se separa con DETACH PARTITION ... CONCURRENTLY, que no bloquea las
+lecturas ni las escrituras del resto de la tabla, y se mueve al esquema
+archivo. En SQLite la tabla del año sale de la vista y queda como
+archivo_asistencias_AAAA. Los reportes no pierden nada: leen del
+acumulado mensual (asistencias_mensuales), que conserva esos meses.
+
+    python particiones.py                  # crear las que falten y listarlas
+    python particiones.py archivar 2024-12 # archivar hasta ese mes inclusive
+    flask --app app archivar-asistencias 2024-12
+
+Variables de entorno:
+    PARTICIONES_ADELANTE   meses futuros con partición creada de antemano (3)
+"""
+
+import os
+import threading
+from datetime import date
+
+import basedatos
+import db_pool
+
+# Clave del advisory lock de PostgreSQL que serializa la creación de
+# particiones entre procesos
+LOCK_PARTICIONES = 727002
+
+ESQUEMA_ARCHIVO = 'archivo'
+
+PREFIJO = 'asistencias_'
+
+# En SQLite cada tabla del año numera sus ids desde AAAA * IDS_POR_ANIO
+# (AUTOINCREMENT a partir de ese valor), así que en la vista asistencias no
+# se repiten entre años, como con la secuencia única de PostgreSQL
+IDS_POR_ANIO = 10 ** 9
+
+SQL_TABLA_SQLITE = '''
+    CREATE TABLE {tabla} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        alumno_id INTEGER NOT NULL REFERENCES alumnos (id),
+        fecha DATE NOT NULL CHECK (fecha >= '{inicio}' AND fecha < '{fin}'),
+        presente BOOLEAN DEFAULT 0,
+        UNIQUE (alumno_id, fecha)
+    )
+'''
+
+
+def _env_num(nombre, defecto, tipo=float):
+    try:
+        return tipo(os.environ.get(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+ADELANTE = _env_num('PARTICIONES_ADELANTE', 3, int)
+
+# Períodos que ya tienen partición, para no consultar el catálogo en cada
+# escritura
+_conocidas = set()
+_lock = threading.Lock()
+
+
+def _postgresql():
+    return basedatos.dialecto() == 'postgresql'
+
+
+def _sumar_meses(fecha, meses):
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def periodo(fecha, postgresql):
+    """Primer día del período de la partición de una fecha (mes o año)"""
+    return fecha.replace(day=1) if postgresql else fecha.replace(month=1, day=1)
+
+
+def _fin(inicio, postgresql):
+    return _sumar_meses(inicio, 1 if postgresql else 12)
+
+
+def _nombre(inicio, postgresql):
+    # El año siempre con cuatro cifras (%Y no las completa antes del año
+    # 1000), para que la tabla coincida con la búsqueda de _existentes
+    if postgresql:
+        return f'{PREFIJO}{inicio.year:04d}_{inicio.month:02d}'
+    return f'{PREFIJO}{inicio.year:04d}'
+
+
+def _inicio(nombre):
+    partes = nombre[len(PREFIJO):].split('_')
+    return date(int(partes[0]), int(partes[1]) if len(partes) > 1 else 1, 1)
+
+
+def _periodos(desde, hasta, postgresql):
+    inicio = periodo(desde, postgresql)
+    while inicio <= hasta:
+        yield inicio
+        inicio = _fin(inicio, postgresql)
+
+
+def tabla_de(fecha):
+    """Tabla en la que se escribe una asistencia de esa fecha"""
+    if _postgresql():
+        return 'asistencias'
+    return _nombre(periodo(fecha, False), False)
+
+
+def _existentes(cursor, postgresql):
+    """{inicio del período: tabla} de las particiones que forman asistencias"""
+    if postgresql:
+        cursor.execute('''
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'asistencias'::regclass
+        ''')
+    else:
+        cursor.execute('''
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name GLOB 'asistencias_[0-9][0-9][0-9][0-9]'
+        ''')
+    return {_inicio(fila[0]): fila[0] for fila in cursor.fetchall()}
+
+
+def _recrear_vista(cursor, tablas):
+    cursor.execute('DROP VIEW IF EXISTS asistencias')
+    cursor.execute('CREATE VIEW asistencias AS ' + ' UNION ALL '.join(
+        f'SELECT id, alumno_id, fecha, presente FROM {tabla}' for tabla in sorted(tablas)))
+
+
+def _crear_tabla_sqlite(cursor, tabla, inicio):
+    """Crear la tabla del año con su índice y su rango de ids"""
+    cursor.execute(SQL_TABLA_SQLITE.format(tabla=tabla, inicio=inicio, fin=_fin(inicio, False)))
+    cursor.execute(f'CREATE INDEX idx_{tabla}_fecha_alumno ON {tabla} (fecha, alumno_id)')
+    basedatos.ejecutar_en(cursor, 'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                          (tabla, inicio.year * IDS_POR_ANIO))
+
+
+def _crear_faltantes(cursor, postgresql, periodos):
+    """Crear en la transacción del cursor las particiones de esos períodos que falten"""
+    if postgresql:
+        basedatos.ejecutar_en(cursor, 'SELECT pg_advisory_xact_lock(%s)', (LOCK_PARTICIONES,))
+    existentes = _existentes(cursor, postgresql)
+
+    nuevas = []
+    for inicio in sorted(set(periodos) - set(existentes)):
+        tabla = _nombre(inicio, postgresql)
+        fin = _fin(inicio, postgresql)
+        if postgresql:
+            cursor.execute(f"CREATE TABLE {tabla} PARTITION OF asistencias "
+                           f"FOR VALUES FROM ('{inicio}') TO ('{fin}')")
+        else:
+            _crear_tabla_sqlite(cursor, tabla, inicio)
+        existentes[inicio] = tabla
+        nuevas.append(tabla)
+
+    if nuevas and not postgresql:
+        _recrear_vista(cursor, existentes.values())
+
+    def recordar():
+        with _lock:
+            _conocidas.update(existentes)
+    db_pool.al_confirmar(recordar)
+    return nuevas
+
+
+def _por_delante(postgresql):
+    hoy = date.today()
+    return _periodos(hoy, _sumar_meses(hoy, ADELANTE), postgresql)
+
+
+def asegurar(desde=None, hasta=None):
+    """Crear las particiones que falten entre dos fechas; devuelve las tablas creadas
+
+    Sin fechas, las del mes en curso y los PARTICIONES_ADELANTE siguientes.
+    """
+    postgresql = _postgresql()
+    if desde is None and hasta is None:
+        periodos = list(_por_delante(postgresql))
+    else:
+        hoy = date.today()
+        periodos = list(_periodos(desde or hoy, hasta or hoy, postgresql))
+
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            nuevas = _crear_faltantes(cursor, postgresql, periodos)
+        finally:
+            cursor.close()
+
+    if nuevas:
+        print(f"Particiones de asistencias creadas: {', '.join(nuevas)}")
+    return nuevas
+
+
+def asegurar_fechas(cursor, fechas):
+    """Crear, en la transacción del cursor, las particiones que falten para esas fechas
+
+    Es lo que hace que una escritura nunca falle por falta de partición,
+    aunque el proceso lleve meses sin reiniciarse. Solo va al catálogo
+    cuando alguna fecha cae en un período que este proceso no vio.
+    """
+    postgresql = _postgresql()
+    faltan = {periodo(fecha, postgresql) for fecha in fechas} - _conocidas
+    if faltan:
+        _crear_faltantes(cursor, postgresql, faltan | set(_por_delante(postgresql)))
+
+
+def primera(cursor):
+    """Inicio del período más viejo que sigue en asistencias, o None"""
+    existentes = _existentes(cursor, _postgresql())
+    return min(existentes) if existentes else None
+
+
+def listar():
+    """Tablas que forman asistencias, de la más vieja a la más nueva"""
+    with db_pool.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            existentes = _existentes(cursor, _postgresql())
+        finally:
+            cursor.close()
+    return [existentes[inicio] for inicio in sorted(existentes)]
+
+
+def archivar(hasta):
+    """Sacar de asistencias los períodos que terminan en el mes de hasta o antes
+
+    En SQLite los períodos son años: un año se archiva cuando termina
+    antes del mes siguiente a hasta. Devuelve las tablas archivadas.
+    """
+    limite = _sumar_meses(hasta, 1)
+    if limite > date.today().replace(day=1):
+        raise ValueError('Solo se pueden archivar meses anteriores al mes en curso')
+
+    if _postgresql():
+        archivadas = _archivar_postgresql(limite)
+    else:
+        archivadas = _archivar_sqlite(limite)
+
+    with _lock:
+        for tabla in archivadas:
+            _conocidas.discard(_inicio(tabla))
+    if archivadas:
+        print(f"Particiones de asistencias archivadas: {', '.join(archivadas)}")
+    return archivadas
+
+
+def _archivar_postgresql(limite):
+    # Fuera de transacción: DETACH ... CONCURRENTLY no puede ir dentro de una
+    with db_pool.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            viejas = [tabla for inicio, tabla in sorted(_existentes(cursor, True).items())
+                      if _fin(inicio, True) <= limite]
+
+            # Antes de PostgreSQL 14 no hay CONCURRENTLY: el DETACH común
+            # bloquea asistencias entera mientras dura (es instantáneo)
+            concurrente = conn.server_version >= 140000
+            pendientes = set()
+            if concurrente:
+                # Un DETACH CONCURRENTLY interrumpido deja la partición a
+                # medio separar: se completa con FINALIZE
+                cursor.execute('''
+                    SELECT c.relname
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'asistencias'::regclass AND i.inhdetachpending
+                ''')
+                pendientes = {fila[0] for fila in cursor.fetchall()}
+
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {ESQUEMA_ARCHIVO}')
+            for tabla in viejas:
+                if tabla in pendientes:
+                    cursor.execute(f'ALTER TABLE asistencias DETACH PARTITION {tabla} FINALIZE')
+                elif concurrente:
+                    cursor.execute(f'ALTER TABLE asistencias DETACH PARTITION {tabla} CONCURRENTLY')
+                else:
+                    cursor.execute(f'ALTER TABLE asistencias DETACH PARTITION {tabla}')
+                cursor.execute(f'ALTER TABLE {tabla} SET SCHEMA {ESQUEMA_ARCHIVO}')
+            return viejas
+        finally:
+            cursor.close()
+
+
+def _archivar_sqlite(limite):
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            existentes = _existentes(cursor, False)
+            viejas = [tabla for inicio, tabla in sorted(existentes.items())
+                      if _fin(inicio, False) <= limite]
+            if viejas:
+                # Sin la vista primero: SQLite reescribiría sus referencias
+                # a la tabla renombrada
+                cursor.execute('DROP VIEW IF EXISTS asistencias')
+                for tabla in viejas:
+                    cursor.execute(f'ALTER TABLE {tabla} RENAME TO archivo_{tabla}')
+                _recrear_vista(cursor, set(existentes.values()) - set(viejas))
+            return viejas
+        finally:
+            cursor.close()
+
+
+def copiar_tabla_anterior(cursor):
+    """Migración 8: crear las particiones y pasarles asistencias_sin_particionar"""
+    postgresql = _postgresql()
+    cursor.execute('SELECT MIN(fecha), MAX(fecha) FROM asistencias_sin_particionar')
+    primera_fecha, ultima_fecha = cursor.fetchone()
+    hoy = date.today()
+    if isinstance(primera_fecha, str):
+        primera_fecha = date.fromisoformat(primera_fecha[:10])
+        ultima_fecha = date.fromisoformat(ultima_fecha[:10])
+    periodos = set(_por_delante(postgresql))
+    if primera_fecha is not None:
+        periodos.update(_periodos(primera_fecha, ultima_fecha, postgresql))
+    periodos.add(periodo(hoy, postgresql))
+    _crear_faltantes(cursor, postgresql, periodos)
+
+    # Las filas sin alumno no se podían leer desde ninguna pantalla: no pasan
+    if postgresql:
+        cursor.execute('''
+            INSERT INTO asistencias (id, alumno_id, fecha, presente)
+            SELECT id, alumno_id, fecha, presente
+            FROM asistencias_sin_particionar
+            WHERE alumno_id IS NOT NULL
+        ''')
+        return
+    for inicio, tabla in _existentes(cursor, False).items():
+        basedatos.ejecutar_en(cursor, f'''
+            INSERT INTO {tabla} (id, alumno_id, fecha, presente)
+            SELECT id, alumno_id, fecha, presente
+            FROM asistencias_sin_particionar
+            WHERE alumno_id IS NOT NULL AND fecha >= %s AND fecha < %s
+        ''', (inicio.isoformat(), _fin(inicio, False).isoformat()))
+
+
+
+def separar_ids_sqlite(cursor):
+    """Migración 11: pasar cada tabla del año a su propio rango de ids
+
+    Las tablas creadas antes numeraban cada una desde su máximo, así que
+    dos años podían repetir un id en la vista. Cada fila pasa a
+    AAAA * IDS_POR_ANIO + id, que no se repite porque id no se repetía
+    dentro de su tabla. Las tablas ya creadas con rango no se tocan.
+    """
+    existentes = _existentes(cursor, False)
+    viejas = {}
+    for inicio, tabla in existentes.items():
+        basedatos.ejecutar_en(cursor, "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (tabla,))
+        if 'AUTOINCREMENT' not in cursor.fetchone()[0].upper():
+            viejas[inicio] = tabla
+    if not viejas:
+        return
+
+    # Sin la vista primero: SQLite reescribiría sus referencias a las
+    # tablas renombradas
+    cursor.execute('DROP VIEW IF EXISTS asistencias')
+    for inicio, tabla in sorted(viejas.items()):
+        cursor.execute(f'DROP INDEX IF EXISTS idx_{tabla}_fecha_alumno')
+        cursor.execute(f'ALTER TABLE {tabla} RENAME TO {tabla}_anterior')
+        _crear_tabla_sqlite(cursor, tabla, inicio)
+        basedatos.ejecutar_en(cursor, f'''
+            INSERT INTO {tabla} (id, alumno_id, fecha, presente)
+            SELECT %s + id, alumno_id, fecha, presente FROM {tabla}_anterior
+        ''', (inicio.year * IDS_POR_ANIO,))
+        cursor.execute(f'DROP TABLE {tabla}_anterior')
+    _recrear_vista(cursor, existentes.values())
+
+
+def completar_nombres_sqlite(cursor):
+    """Migración 13: dar cuatro cifras al año de las tablas anteriores al año 1000
+
+    Se creaban como asistencias_999, que _existentes no encuentra: sus
+    filas quedaban fuera de la vista. Se renombran, vuelven a la vista y
+    pasan a su rango de ids si no lo tenían.
+    """
+    cursor.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND (name GLOB 'asistencias_[0-9]' OR name GLOB 'asistencias_[0-9][0-9]'
+                                  OR name GLOB 'asistencias_[0-9][0-9][0-9]')
+    ''')
+    cortas = [fila[0] for fila in cursor.fetchall()]
+    if not cortas:
+        return
+
+    cursor.execute('DROP VIEW IF EXISTS asistencias')
+    for tabla in cortas:
+        nueva = _nombre(_inicio(tabla), False)
+        cursor.execute(f'DROP INDEX IF EXISTS idx_{tabla}_fecha_alumno')
+        cursor.execute(f'ALTER TABLE {tabla} RENAME TO {nueva}')
+        cursor.execute(f'CREATE INDEX idx_{nueva}_fecha_alumno ON {nueva} (fecha, alumno_id)')
+    _recrear_vista(cursor, _existentes(cursor, False).values())
+    separar_ids_sqlite(cursor)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) == 3 and sys.argv[1] == 'archivar':
+        anio, mes = sys.argv[2].split('-')
+        archivar(date(int(anio), int(mes), 1))
+    elif len(sys.argv) == 1:
+        asegurar()
+    else:
+        print("Uso: python particiones.py [archivar AAAA-MM]")
+        sys.exit(1)
+    print(f"Particiones de asistencias: {', '.join(listar())}")
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sincronización de la versión de escritorio con la versión web
+
+La versión de escritorio trabaja siempre contra su SQLite local, con o
+sin conexión. Cada marca de asistencia y cada alta se guardan además en
+la tabla pendientes, en la misma transacción (migración 10). Un hilo
+Sincronizador, cada SINCRONIZAR_CADA segundos o apenas hay algo nuevo:
+
+1. Envía los pendientes a POST /api/sync en lotes de hasta LOTE, como
+   JSON comprimido con gzip. La web da de alta a los alumnos que no
+   conoce (o reconoce a los que ya tiene, con alumnos.buscar_alumno) y
+   guarda las asistencias; los pendientes se borran solo cuando la web
+   confirmó el lote, así que un corte a mitad de camino se reintenta.
+2. Trae de /api/changes lo que cambió en la web desde el último cursor
+   y lo aplica localmente sin volver a encolarlo. La primera vez parte
+   de GET /api/roster (todos los alumnos y la asistencia de hoy).
+
+Los ids de la web no son los locales: alumnos_remotos guarda la
+correspondencia. Si el mismo alumno y fecha se marcan en los dos lados,
+queda la última marca que llega a la web; mientras una marca local
+espera para subir, los cambios que bajan de la web para ese alumno y
+fecha se ignoran (al subir, la local pisa a la de la web).
+
+recibir() es el lado de la web: aplica un lote de POST /api/sync.
+
+    SINCRONIZAR_URL=https://asistencia.ejemplo.com python main.py
+"""
+
+import gzip
+import json
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from datetime import date, datetime, timedelta
+
+import asistencia_mensual
+import basedatos
+import db_pool
+from alumnos import buscar_alumno, insertar_alumno, validar_alumno
+
+# Versión web con la que sincroniza la de escritorio; vacío: no sincroniza
+URL = os.environ.get('SINCRONIZAR_URL', '').rstrip('/')
+
+# Segundos entre sincronizaciones cuando no hay cambios locales
+CADA = db_pool._env_num('SINCRONIZAR_CADA', 30.0)
+
+# Segundos que se espera después de un cambio local para juntar varios
+# en el mismo envío
+AGRUPAR = 2.0
+
+# Pendientes por envío, y máximo de operaciones que acepta la web en uno
+LOTE = 500
+MAX_OPERACIONES = 1000
+
+# Cambios por página al traer de /api/changes
+PAGINA = 1000
+
+# Segundos de espera de cada pedido HTTP
+TIMEOUT = 15
+
+# Tamaño máximo de un lote ya descomprimido (la web corta antes de
+# descomprimir de más)
+MAX_BYTES = 5 * 1024 * 1024
+
+# Año más viejo que acepta la web en un lote: antes es un reloj mal puesto
+# (y crearía particiones de años que nadie usa)
+ANIO_MINIMO = db_pool._env_num('SINCRONIZAR_ANIO_MINIMO', 2000, int)
+
+
+class SinConexionError(Exception):
+    """La versión web no respondió (sin red, caída o error del servidor)"""
+
+
+def activo():
+    """Si la versión de escritorio tiene una web con la que sincronizar"""
+    return bool(URL)
+
+
+# ----------------------------------------------------------------------
+# Lado de escritorio
+# ----------------------------------------------------------------------
+
+ENCOLAR = basedatos.Sentencia('encolar_pendiente', '''
+    INSERT INTO pendientes (tipo, alumno_id, fecha, presente) VALUES (%s, %s, %s, %s)
+''')
+
+
+def encolar(cursor, filas):
+    """Agregar operaciones (tipo, alumno_id, fecha, presente) a pendientes en la transacción del cursor
+
+    Las mismas filas que historial.anotar. Sin SINCRONIZAR_URL no se
+    encola nada.
+    """
+    if filas and activo():
+        basedatos.guardar_filas(cursor, ENCOLAR, '''
+            INSERT INTO pendientes (tipo, alumno_id, fecha, presente) VALUES %s
+        ''', filas)
+
+
+def _leer(clave):
+    fila = basedatos.consultar_uno('SELECT valor FROM sincronizacion WHERE clave = %s', (clave,))
+    return fila['valor'] if fila else None
+
+
+def _escribir(cursor, clave, valor):
+    basedatos.ejecutar_en(cursor, basedatos.upsert('sincronizacion', ('clave', 'valor'), ('clave',)),
+                          (clave, str(valor)))
+
+
+def contar_pendientes():
+    return basedatos.consultar_uno('SELECT COUNT(*) AS n FROM pendientes')['n']
+
+
+class ClienteHTTP:
+    """Pedidos JSON a la versión web; los cuerpos van comprimidos con gzip"""
+
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _pedir(self, pedido):
+        pedido.add_header('Accept', 'application/json')
+        pedido.add_header('Accept-Encoding', 'gzip')
+        try:
+            with urllib.request.urlopen(pedido, timeout=self.timeout) as respuesta:
+                cuerpo = respuesta.read()
+                if respuesta.headers.get('Content-Encoding') == 'gzip':
+                    cuerpo = gzip.decompress(cuerpo)
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                raise SinConexionError(f'{pedido.full_url}: HTTP {e.code}') from e
+            raise ValueError(f'{pedido.full_url}: HTTP {e.code} {e.read()[:200]!r}') from e
+        except (urllib.error.URLError, OSError) as e:
+            raise SinConexionError(f'{pedido.full_url}: {e}') from e
+        return json.loads(cuerpo.decode('utf-8'))
+
+    def obtener(self, ruta, parametros=None):
+        url = self.url + ruta
+        if parametros:
+            url += '?' + urllib.parse.urlencode(parametros)
+        return self._pedir(urllib.request.Request(url))
+
+    def enviar(self, ruta, datos):
+        cuerpo = gzip.compress(json.dumps(datos, separators=(',', ':')).encode('utf-8'))
+        pedido = urllib.request.Request(self.url + ruta, data=cuerpo, method='POST')
+        pedido.add_header('Content-Type', 'application/json')
+        pedido.add_header('Content-Encoding', 'gzip')
+        return self._pedir(pedido)
+
+
+def _remotos():
+    """{alumno_id local: id en la web}"""
+    return {fila[0]: fila[1] for fila in basedatos.consultar('SELECT alumno_id, remoto_id FROM alumnos_remotos')}
+
+
+def enviar_pendientes(cliente):
+    """Enviar un lote de pendientes; devuelve cuántos se sacaron de la cola"""
+    pendientes = basedatos.consultar('''
+        SELECT id, tipo, alumno_id, fecha, presente FROM pendientes ORDER BY id LIMIT %s
+    ''', (LOTE,))
+    if not pendientes:
+        return 0
+    remotos = _remotos()
+
+    # Alta de los alumnos que la web todavía no conoce: los encolados y los
+    # que ya estaban antes de activar la sincronización. ref es el id local
+    sin_remoto = {p.alumno_id for p in pendientes if p.alumno_id not in remotos}
+    altas = []
+    if sin_remoto:
+        for alumno in basedatos.consultar(f'''
+            SELECT id, nombre, apellido, telefono FROM alumnos
+            WHERE id IN ({basedatos.marcadores(len(sin_remoto))})
+        ''', sorted(sin_remoto)):
+            altas.append({'ref': str(alumno.id), 'nombre': alumno.nombre,
+                          'apellido': alumno.apellido, 'telefono': alumno.telefono or ''})
+
+    # Si el mismo alumno y fecha se marcó varias veces, sube la última
+    marcas = {}
+    for p in pendientes:
+        if p.tipo != 'asistencia':
+            continue
+        marca = {'fecha': str(p.fecha)[:10], 'presente': bool(p.presente)}
+        if p.alumno_id in remotos:
+            marca['alumno_id'] = remotos[p.alumno_id]
+        else:
+            marca['ref'] = str(p.alumno_id)
+        marcas.pop((p.alumno_id, marca['fecha']), None)
+        marcas[(p.alumno_id, marca['fecha'])] = marca
+
+    respuesta = cliente.enviar('/api/sync', {'alumnos': altas, 'asistencias': list(marcas.values())})
+    if not respuesta.get('success'):
+        raise ValueError(respuesta.get('message', 'La web rechazó el lote'))
+    for rechazo in respuesta.get('rechazadas', []):
+        print(f"Sincronización: la web rechazó {rechazo}")
+
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            basedatos.ejecutar_muchos_en(
+                cursor, basedatos.upsert('alumnos_remotos', ('alumno_id', 'remoto_id'), ('alumno_id',)),
+                [(int(ref), remoto_id) for ref, remoto_id in respuesta.get('alumnos', {}).items()])
+            basedatos.ejecutar_en(cursor, 'DELETE FROM pendientes WHERE id <= %s', (pendientes[-1].id,))
+        finally:
+            cursor.close()
+    return len(pendientes)
+
+
+def aplicar_cambios(cambios, cursor_remoto):
+    """Aplicar localmente cambios de la web (formato de /api/changes) y guardar el cursor
+
+    No se encolan: ya están en la web. Los alumnos que no se conocen se
+    reconocen por nombre, apellido y teléfono o se dan de alta.
+    """
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            # Si dos alumnos locales son el mismo de la web, vale el primero
+            cursor.execute('SELECT alumno_id, remoto_id FROM alumnos_remotos ORDER BY alumno_id DESC')
+            locales = {remoto_id: alumno_id for alumno_id, remoto_id in cursor.fetchall()}
+            basedatos.ejecutar_en(cursor, "SELECT alumno_id, fecha FROM pendientes WHERE tipo = 'asistencia'")
+            esperando = {(alumno_id, str(fecha)[:10]) for alumno_id, fecha in cursor.fetchall()}
+
+            marcas = {}
+            for cambio in cambios:
+                remoto_id = cambio['alumno_id']
+                if cambio['tipo'] == 'alumno':
+                    if remoto_id in locales:
+                        continue
+                    datos = (cambio['nombre'], cambio['apellido'], cambio.get('telefono') or '')
+                    alumno_id = buscar_alumno(cursor, *datos) or insertar_alumno(cursor, *datos)
+                    basedatos.ejecutar_en(cursor, basedatos.upsert(
+                        'alumnos_remotos', ('alumno_id', 'remoto_id'), ('alumno_id',)), (alumno_id, remoto_id))
+                    locales[remoto_id] = alumno_id
+                elif remoto_id in locales and (locales[remoto_id], cambio['fecha']) not in esperando:
+                    marcas[(locales[remoto_id], cambio['fecha'])] = cambio['presente']
+
+            if marcas:
+                asistencia_mensual.guardar_asistencias(conn, [
+                    (alumno_id, date.fromisoformat(fecha), presente)
+                    for (alumno_id, fecha), presente in marcas.items()])
+            _escribir(cursor, 'cursor', cursor_remoto)
+        finally:
+            cursor.close()
+    return len(marcas)
+
+
+def traer_cambios(cliente):
+    """Traer y aplicar lo que cambió en la web; devuelve cuántas marcas se aplicaron"""
+    aplicadas = 0
+    desde = _leer('cursor')
+    if desde is None:
+        # Primera vez: todos los alumnos y la asistencia de hoy, y desde
+        # ahí los cambios
+        hoy = date.today().isoformat()
+        roster = cliente.obtener('/api/roster', {'fecha': hoy})
+        cambios = [{'tipo': 'alumno', 'alumno_id': a['id'], 'nombre': a['nombre'],
+                    'apellido': a['apellido'], 'telefono': a['telefono']} for a in roster['alumnos']]
+        cambios += [{'tipo': 'asistencia', 'alumno_id': a['id'], 'fecha': hoy, 'presente': a['presente']}
+                    for a in roster['alumnos'] if a['presente'] is not None]
+        aplicadas += aplicar_cambios(cambios, roster['cursor'])
+        desde = roster['cursor']
+
+    while True:
+        pagina = cliente.obtener('/api/changes', {'since': desde, 'limit': PAGINA})
+        if pagina['cambios'] or pagina['cursor'] != desde:
+            aplicadas += aplicar_cambios(pagina['cambios'], pagina['cursor'])
+        desde = pagina['cursor']
+        if not pagina['hay_mas']:
+            return aplicadas
+
+
+def sincronizar(cliente):
+    """Una vuelta completa: enviar todos los pendientes y traer los cambios"""
+    enviadas = 0
+    while True:
+        enviados = enviar_pendientes(cliente)
+        enviadas += enviados
+        if enviados < LOTE:
+            break
+    return {'enviadas': enviadas, 'recibidas': traer_cambios(cliente)}
+
+
+class Sincronizador(threading.Thread):
+    """Hilo que sincroniza cada CADA segundos, o enseguida después de avisar()
+
+    estado es un dict que la ventana puede leer desde otro hilo: ultima
+    (datetime de la última sincronización completa), error (texto o None)
+    y pendientes.
+    """
+
+    def __init__(self, cliente, cada=CADA):
+        super().__init__(name='sincronizador', daemon=True)
+        self.cliente = cliente
+        self.cada = cada
+        self._despertar = threading.Event()
+        self._parar = threading.Event()
+        self.estado = {'ultima': None, 'error': None, 'pendientes': 0}
+
+    def avisar(self):
+        """Hay cambios locales nuevos: sincronizar sin esperar a la próxima vuelta"""
+        self._despertar.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                sincronizar(self.cliente)
+                self.estado.update(ultima=datetime.now(), error=None)
+            except SinConexionError as e:
+                self.estado['error'] = 'sin conexión'
+                print(f"Sincronización: {e}")
+            except Exception as e:
+                self.estado['error'] = str(e)
+                print(f"Error al sincronizar: {e}")
+            try:
+                self.estado['pendientes'] = contar_pendientes()
+            except Exception:
+                pass
+            if self._despertar.wait(self.cada):
+                self._despertar.clear()
+                self._parar.wait(AGRUPAR)
+
+    def parar(self, espera=TIMEOUT):
+        """Terminar la vuelta en curso (si la hay) y parar"""
+        self._parar.set()
+        self._despertar.set()
+        self.join(espera)
+
+
+# ----------------------------------------------------------------------
+# Lado de la web
+# ----------------------------------------------------------------------
+
+def leer_lote(cuerpo, codificacion):
+    """JSON de un POST /api/sync, descomprimido si vino con gzip; ValueError si no sirve"""
+    if codificacion == 'gzip':
+        descomprimir = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            cuerpo = descomprimir.decompress(cuerpo, MAX_BYTES)
+        except zlib.error as e:
+            raise ValueError('gzip inválido') from e
+        if descomprimir.unconsumed_tail:
+            raise ValueError(f'El lote supera los {MAX_BYTES // (1024 * 1024)} MB')
+    elif codificacion not in (None, '', 'identity'):
+        raise ValueError(f'Content-Encoding no soportado: {codificacion}')
+    try:
+        datos = json.loads(cuerpo.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError('JSON inválido') from e
+    if not isinstance(datos, dict):
+        raise ValueError('Se esperaba un objeto JSON')
+    return datos
+
+
+def _validar_forma(altas, marcas):
+    """ValueError si algún elemento del lote no tiene la forma del protocolo
+
+    Los datos que no sirven (un nombre vacío, una fecha imposible) se
+    rechazan uno por uno en recibir(); esto es para lo que ningún cliente
+    nuestro manda, y se responde con 400 indicando el elemento.
+    """
+    for n, alta in enumerate(altas):
+        if not isinstance(alta, dict):
+            raise ValueError(f'alumnos[{n}]: se esperaba un objeto')
+        ref = alta.get('ref')
+        if ref is not None and (isinstance(ref, bool) or not isinstance(ref, (str, int))):
+            raise ValueError(f'alumnos[{n}].ref: se esperaba texto o número')
+        for campo in ('nombre', 'apellido', 'telefono'):
+            if alta.get(campo) is not None and not isinstance(alta[campo], str):
+                raise ValueError(f'alumnos[{n}].{campo}: se esperaba texto')
+    for n, marca in enumerate(marcas):
+        if not isinstance(marca, dict):
+            raise ValueError(f'asistencias[{n}]: se esperaba un objeto')
+
+
+def recibir(datos):
+    """Aplicar un lote de la versión de escritorio en una sola transacción
+
+    datos es {"alumnos": [{"ref", "nombre", "apellido", "telefono"}],
+    "asistencias": [{"alumno_id" o "ref", "fecha", "presente"}]}; una
+    asistencia con ref es de un alumno del mismo lote. Reenviar un lote
+    no duplica nada: los alumnos se reconocen por nombre, apellido y
+    teléfono y las asistencias son upserts. Devuelve {"alumnos": {ref:
+    id}, "aplicadas": n, "rechazadas": [...]}; ValueError si el lote no
+    tiene la forma esperada.
+    """
+    altas = datos.get('alumnos') or []
+    marcas = datos.get('asistencias') or []
+    if not isinstance(altas, list) or not isinstance(marcas, list):
+        raise ValueError('alumnos y asistencias deben ser listas')
+    if len(altas) + len(marcas) > MAX_OPERACIONES:
+        raise ValueError(f'Máximo {MAX_OPERACIONES} operaciones por lote')
+    _validar_forma(altas, marcas)
+
+    rechazadas = []
+    validas = []
+    for alta in altas:
+        ref = alta.get('ref')
+        if ref is None or ref == '':
+            rechazadas.append({'ref': None, 'message': 'Alta sin ref'})
+            continue
+        alumno, error = validar_alumno(alta.get('nombre'), alta.get('apellido'), alta.get('telefono'))
+        if error:
+            rechazadas.append({'ref': ref, 'message': error})
+        else:
+            validas.append((str(ref), alumno))
+
+    # Un día de margen por la diferencia horaria con el escritorio
+    manana = date.today() + timedelta(days=1)
+    minima = date(ANIO_MINIMO, 1, 1)
+    filas = []
+    for marca in marcas:
+        try:
+            fecha = date.fromisoformat(marca['fecha'])
+            if not minima <= fecha <= manana:
+                raise ValueError(fecha)
+            presente = bool(marca['presente'])
+            destino = int(marca['alumno_id']) if marca.get('alumno_id') is not None else str(marca['ref'])
+        except (KeyError, TypeError, ValueError):
+            rechazadas.append({'asistencia': marca, 'message': 'Asistencia inválida'})
+            continue
+        filas.append((destino, fecha, presente, marca))
+
+    ids = {}
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            if validas and basedatos.dialecto() == 'postgresql':
+                # Como la importación: que dos lotes con el mismo alumno
+                # nuevo no lo den de alta dos veces
+                cursor.execute('LOCK TABLE alumnos IN SHARE ROW EXCLUSIVE MODE')
+            for ref, alumno in validas:
+                ids[ref] = buscar_alumno(cursor, *alumno) or insertar_alumno(cursor, *alumno)
+        finally:
+            cursor.close()
+
+        guardar = {}
+        for destino, fecha, presente, marca in filas:
+            alumno_id = ids.get(destino) if isinstance(destino, str) else destino
+            if alumno_id is None:
+                rechazadas.append({'asistencia': marca, 'message': 'Alumno inexistente'})
+                continue
+            guardar.pop((alumno_id, fecha), None)
+            guardar[(alumno_id, fecha)] = (presente, marca)
+        guardados = set()
+        if guardar:
+            guardados = asistencia_mensual.guardar_asistencias(
+                conn, [(alumno_id, fecha, presente) for (alumno_id, fecha), (presente, _) in guardar.items()])
+
+    for (alumno_id, _), (_, marca) in guardar.items():
+        if alumno_id not in guardados:
+            rechazadas.append({'asistencia': marca, 'message': 'Alumno inexistente'})
+    return {
+        'alumnos': ids,
+        'aplicadas': sum(1 for alumno_id, _ in guardar if alumno_id in guardados),
+        'rechazadas': rechazadas,
+    }
@@ -0,0 +1,301 @@
+// Marcar asistencia (/asistencia): toques en lote, sincronización y avisos
+// en vivo. Las URLs vienen en los data-url-* de #tarjetas.
+$(document).ready(function() {
+    const contenedor = $('#tarjetas');
+    if (contenedor.length === 0) {
+        return;
+    }
+    
+    // Nodo de cada tarjeta por alumno: se arma una vez y las respuestas de
+    // /asistencia/cambios reemplazan solo los nodos que cambiaron
+    const tarjetas = {};
+    contenedor.children().each(function() {
+        tarjetas[$(this).find('.attendance-card').data('alumno-id')] = $(this);
+    });
+    let version = contenedor.data('version');
+    const fecha = contenedor.data('fecha');
+    const URL_BATCH = contenedor.data('url-batch');
+    const URL_CAMBIOS = contenedor.data('url-cambios');
+    const URL_EVENTOS = contenedor.data('url-eventos');
+    
+    // Los contadores vienen del servidor y se ajustan con cada cambio,
+    // sin volver a recorrer todas las tarjetas
+    const contadores = {
+        presentes: Number($('#contador-presentes').text()),
+        ausentes: Number($('#contador-ausentes').text()),
+        sin_marcar: Number($('#contador-sin-marcar').text())
+    };
+    
+    // Los cambios de otros dispositivos llegan en vivo por /asistencia/eventos;
+    // sin stream, cada SINCRONIZAR_CADA ms (con la página visible) se piden
+    // a /asistencia/cambios
+    const SINCRONIZAR_CADA = 30000;
+    let sincronizando = false;
+    
+    // Los cambios se acumulan y se envían juntos a /asistencia/batch:
+    // al pasar FLUSH_DELAY ms sin toques, o al juntar FLUSH_MAX cambios
+    const FLUSH_DELAY = 600;
+    const FLUSH_MAX = 40;
+    let pendientes = {};      // alumnoId -> {status, previo}
+    let enviando = null;      // lote en vuelo
+    let flushTimer = null;
+    
+    // Manejar clic en tarjetas de asistencia (delegado: sigue andando en
+    // las tarjetas que se reemplazan)
+    contenedor.on('click', '.attendance-toggle', function() {
+        const card = $(this).closest('.attendance-card');
+        const alumnoId = card.data('alumno-id');
+        const currentStatus = estadoTarjeta(card);
+        
+        // Determinar nuevo estado
+        let newStatus;
+        if (currentStatus === null || currentStatus === 0) {
+            newStatus = 1; // Presente
+        } else {
+            newStatus = 0; // Ausente
+        }
+        
+        // Mostrar el cambio enseguida; se revierte si el servidor lo rechaza
+        const previo = pendientes[alumnoId] ? pendientes[alumnoId].previo : currentStatus;
+        pendientes[alumnoId] = {status: newStatus, previo: previo};
+        updateAttendanceCard(card, newStatus);
+        updateCounters(currentStatus, newStatus);
+        scheduleFlush();
+    });
+    
+    function scheduleFlush() {
+        clearTimeout(flushTimer);
+        if (Object.keys(pendientes).length >= FLUSH_MAX) {
+            flushPendientes();
+        } else {
+            flushTimer = setTimeout(flushPendientes, FLUSH_DELAY);
+        }
+    }
+    
+    function flushPendientes() {
+        clearTimeout(flushTimer);
+        if (enviando || Object.keys(pendientes).length === 0) {
+            return;
+        }
+        
+        enviando = pendientes;
+        pendientes = {};
+        const cambios = Object.keys(enviando).map(function(id) {
+            return {alumno_id: Number(id), presente: enviando[id].status};
+        });
+        
+        $.ajax({
+            url: URL_BATCH,
+            method: 'POST',
+            contentType: 'application/json',
+            data: JSON.stringify({cambios: cambios}),
+            success: function(response) {
+                let errores = 0;
+                (response.resultados || []).forEach(function(resultado) {
+                    if (!resultado.success) {
+                        errores++;
+                        revertirCambio(resultado.alumno_id);
+                    }
+                });
+                if (errores > 0) {
+                    showAlert('error', `No se pudo actualizar la asistencia de ${errores} alumno(s)`);
+                }
+            },
+            error: function() {
+                Object.keys(enviando).forEach(revertirCambio);
+                showAlert('error', 'Error de conexión');
+            },
+            complete: function() {
+                enviando = null;
+                if (Object.keys(pendientes).length > 0) {
+                    scheduleFlush();
+                } else {
+                    sincronizar();
+                }
+            }
+        });
+    }
+    
+    function sincronizar() {
+        if (sincronizando || enviando || Object.keys(pendientes).length > 0) {
+            return;
+        }
+        sincronizando = true;
+        $.getJSON(URL_CAMBIOS, {version: version})
+            .done(function(response) {
+                // Si hubo toques mientras tanto, la respuesta ya no sirve:
+                // se sincroniza de nuevo después de enviarlos
+                if (enviando || Object.keys(pendientes).length > 0) {
+                    return;
+                }
+                let faltantes = false;
+                response.tarjetas.forEach(function(tarjeta) {
+                    const actual = tarjetas[tarjeta.alumno_id];
+                    if (!actual) {
+                        faltantes = true;
+                        return;
+                    }
+                    const estado = tarjeta.estado === null ? null : (tarjeta.estado ? 1 : 0);
+                    if (estadoTarjeta(actual.find('.attendance-card')) === estado) {
+                        return;
+                    }
+                    const nueva = $(tarjeta.html.trim());
+                    actual.replaceWith(nueva);
+                    tarjetas[tarjeta.alumno_id] = nueva;
+                });
+                if (faltantes) {
+                    // Alumnos nuevos: van en orden alfabético, más simple recargar
+                    window.location.reload();
+                    return;
+                }
+                version = response.version;
+                Object.assign(contadores, response.contadores);
+                pintarContadores();
+            })
+            .always(function() {
+                sincronizando = false;
+            });
+    }
+    
+    let fuente = null;
+    if (window.EventSource) {
+        let conectado = false;
+        fuente = new EventSource(URL_EVENTOS);
+        fuente.onmessage = function(e) {
+            aplicarEvento(JSON.parse(e.data));
+        };
+        fuente.addEventListener('resincronizar', sincronizar);
+        fuente.onopen = function() {
+            // Al reconectar, ponerse al día con lo que pasó mientras tanto
+            if (conectado) {
+                sincronizar();
+            }
+            conectado = true;
+        };
+    }
+    
+    function aplicarEvento(evento) {
+        if (evento.fecha !== fecha) {
+            return;
+        }
+        evento.cambios.forEach(function(cambio) {
+            const alumnoId = cambio[0];
+            const estado = cambio[1] ? 1 : 0;
+            // Un toque propio sin confirmar manda sobre el aviso
+            if (pendientes[alumnoId] || (enviando && enviando[alumnoId]) || !tarjetas[alumnoId]) {
+                return;
+            }
+            const card = tarjetas[alumnoId].find('.attendance-card');
+            const actual = estadoTarjeta(card);
+            if (actual !== estado) {
+                updateCounters(actual, estado);
+                updateAttendanceCard(card, estado);
+            }
+        });
+    }
+    
+    setInterval(function() {
+        const enVivo = fuente && fuente.readyState !== EventSource.CLOSED;
+        if (!enVivo && document.visibilityState === 'visible') {
+            sincronizar();
+        }
+    }, SINCRONIZAR_CADA);
+    $(document).on('visibilitychange', function() {
+        if (document.visibilityState === 'visible') {
+            sincronizar();
+        }
+    });
+    
+    function revertirCambio(alumnoId) {
+        // Si hubo otro toque mientras se enviaba, ese cambio manda
+        if (pendientes[alumnoId] || !enviando[alumnoId]) {
+            return;
+        }
+        const card = tarjetas[alumnoId].find('.attendance-card');
+        const previo = enviando[alumnoId].previo;
+        updateCounters(estadoTarjeta(card), previo);
+        updateAttendanceCard(card, previo);
+    }
+    
+    // No perder los últimos toques si se cierra o se abandona la página
+    $(window).on('pagehide', function() {
+        if (Object.keys(pendientes).length === 0 || !navigator.sendBeacon) {
+            return;
+        }
+        const cambios = Object.keys(pendientes).map(function(id) {
+            return {alumno_id: Number(id), presente: pendientes[id].status};
+        });
+        navigator.sendBeacon(URL_BATCH,
+            new Blob([JSON.stringify({cambios: cambios})], {type: 'application/json'}));
+    });
+    
+    function estadoTarjeta(card) {
+        const cardBody = card.find('.attendance-toggle');
+        return cardBody.hasClass('presente') ? 1 : cardBody.hasClass('ausente') ? 0 : null;
+    }
+    
+    function updateAttendanceCard(card, status) {
+        const cardBody = card.find('.attendance-toggle');
+        const statusIcon = cardBody.find('.status-icon');
+        
+        // Remover clases anteriores
+        cardBody.removeClass('presente ausente sin-marcar');
+        
+        if (status === 1) {
+            cardBody.addClass('presente');
+            statusIcon.html(`
+                <i class="fas fa-check-circle fa-2x text-success"></i>
+                <p class="mb-0 status-presente">Presente</p>
+            `);
+        } else if (status === 0) {
+            cardBody.addClass('ausente');
+            statusIcon.html(`
+                <i class="fas fa-times-circle fa-2x text-danger"></i>
+                <p class="mb-0 status-ausente">Ausente</p>
+            `);
+        } else {
+            cardBody.addClass('sin-marcar');
+            statusIcon.html(`
+                <i class="fas fa-question-circle fa-2x text-muted"></i>
+                <p class="mb-0 status-sin-marcar">Sin marcar</p>
+            `);
+        }
+    }
+    
+    function claveContador(status) {
+        return status === 1 ? 'presentes' : status === 0 ? 'ausentes' : 'sin_marcar';
+    }
+    
+    function updateCounters(previo, nuevo) {
+        if (previo === nuevo) {
+            return;
+        }
+        contadores[claveContador(previo)]--;
+        contadores[claveContador(nuevo)]++;
+        pintarContadores();
+    }
+    
+    function pintarContadores() {
+        $('#contador-presentes').text(contadores.presentes);
+        $('#contador-ausentes').text(contadores.ausentes);
+        $('#contador-sin-marcar').text(contadores.sin_marcar);
+    }
+    
+    function showAlert(type, message) {
+        const alertClass = type === 'success' ? 'alert-success' : 'alert-danger';
+        const icon = type === 'success' ? 'fas fa-check-circle' : 'fas fa-exclamation-triangle';
+        
+        const alertHtml = `
+            <div class="alert ${alertClass} alert-dismissible fade show" role="alert">
+                <i class="${icon}"></i> ${message}
+                <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+            </div>
+        `;
+        
+        $('.container .main-container').prepend(alertHtml);
+        
+        setTimeout(function() {
+            $('.alert').fadeOut();
+        }, 3000);
+    }
+});
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración común de las pruebas
+
+Las pruebas usan siempre SQLite, en un directorio temporal propio: cada
+una empieza con la base vacía y migrada (fixture app). Sin
+DATABASE_URL, DATABASE_URL_REPLICA ni SINCRONIZAR_URL del entorno, que
+se fijan antes de importar la aplicación porque se leen al importar.
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+for _variable in ('DATABASE_URL', 'DATABASE_URL_REPLICA', 'SINCRONIZAR_URL'):
+    os.environ.pop(_variable, None)
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='yoga-pruebas-'), 'asistencia.db')
+
+import pytest  # noqa: E402
+
+import app as aplicacion  # noqa: E402
+import cache  # noqa: E402
+import db_pool  # noqa: E402
+import particiones  # noqa: E402
+
+
+def borrar_base(ruta):
+    """Borrar un archivo SQLite con su WAL"""
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+
+
+def usar_pool(pool):
+    """Que este proceso use ese pool (para tener dos bases en una misma prueba)"""
+    with db_pool._pool_lock:
+        db_pool._pool = pool
+        db_pool._pool_pid = os.getpid()
+    # Las particiones conocidas son de la base anterior
+    with particiones._lock:
+        particiones._conocidas.clear()
+
+
+def _olvidar_estado():
+    """Lo que el proceso recuerda entre pedidos: caches, particiones y escrituras recientes"""
+    cache.roster.invalidar()
+    cache.versiones.invalidar()
+    with particiones._lock:
+        particiones._conocidas.clear()
+    db_pool._ultima_escritura = None
+    db_pool.leer_del_primario(False)
+    aplicacion._arranque['preparada'] = False
+
+
+@pytest.fixture
+def app():
+    """La aplicación sobre una base SQLite vacía y migrada"""
+    db_pool.cerrar()
+    db_pool._replica = None
+    borrar_base(db_pool.SQLITE_PATH)
+    _olvidar_estado()
+    aplicacion.app.config['TESTING'] = True
+    yield aplicacion.create_app()
+    db_pool.cerrar()
+    db_pool._replica = None
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
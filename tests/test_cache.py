@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Invalidación de la cache del roster con los avisos de otros workers"""
+
+from datetime import date
+
+import cache
+import eventos
+
+
+def test_lo_calculado_durante_una_invalidacion_no_se_guarda():
+    roster = cache.CacheTTL()
+
+    def leer_mientras_otro_escribe():
+        # El aviso del otro worker llega mientras se lee la base
+        roster.invalidar('asistencia')
+        return ['lectura de antes del cambio']
+
+    assert roster.obtener_o_calcular(('asistencia', 'hoy'), leer_mientras_otro_escribe).valor == [
+        'lectura de antes del cambio']
+    assert roster.obtener(('asistencia', 'hoy')) is None
+    assert roster.obtener_o_calcular(('asistencia', 'hoy'), lambda: ['nueva']).valor == ['nueva']
+    assert roster.obtener(('asistencia', 'hoy')).valor == ['nueva']
+
+
+def test_los_avisos_invalidan_el_roster(monkeypatch):
+    roster = cache.CacheTTL()
+    monkeypatch.setattr(cache, 'roster', roster)
+
+    def llenar():
+        for tipo in ('alumnos', 'asistencia', 'asistencias_hoy', 'resumen'):
+            roster.guardar((tipo, 'hoy'), [tipo])
+
+    def vigentes():
+        return {tipo for tipo in ('alumnos', 'asistencia', 'asistencias_hoy', 'resumen')
+                if roster.obtener((tipo, 'hoy')) is not None}
+
+    llenar()
+    eventos._invalidar_cache({'fecha': date.today().isoformat(), 'cambios': [[1, True]]})
+    assert vigentes() == {'alumnos'}
+
+    llenar()
+    eventos._invalidar_cache(eventos.ALTA_ALUMNOS)
+    assert vigentes() == set()
+
+    llenar()
+    eventos._invalidar_cache(eventos.RESINCRONIZAR)
+    assert vigentes() == set()
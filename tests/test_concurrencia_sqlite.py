@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Marcas de asistencia concurrentes sobre un mismo archivo SQLite
+
+Como varios workers de gunicorn: procesos con la aplicación y varios
+hilos cada uno, todos marcando a la vez con POST /toggle_asistencia. Cada
+hilo tiene sus alumnos, así que el estado final de cada uno se sabe de
+antemano, y además todos pelean por un alumno compartido. Ninguna marca
+puede fallar, los totales tienen que ser exactos y el acumulado mensual
+(que se mantiene con deltas) igual a reconstruirlo.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+
+import asistencia_mensual
+import basedatos
+import db_pool
+from alumnos import crear_alumno
+
+# Sin importar conftest: los procesos trabajadores importan este módulo y
+# tienen que quedarse con el SQLITE_PATH que les pasa la prueba
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+
+PROCESOS = 3
+HILOS = 6
+MARCAS = 12
+POR_HILO = 3
+
+SQL_ACUMULADO = '''
+    SELECT alumno_id, mes, presentes, ausentes, marcadas, dias_presentes, dias_marcados
+    FROM asistencias_mensuales
+    ORDER BY alumno_id, mes
+'''
+
+# Un proceso: HILOS hilos marcando desde el instante inicio; imprime las fallas en JSON
+TRABAJADOR = '''
+import json, sys, time
+import app as aplicacion
+from test_concurrencia_sqlite import marcar_en_hilos
+
+inicio, proceso, compartido = float(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+alumnos = json.loads(sys.argv[4])
+flask_app = aplicacion.create_app()
+time.sleep(max(0.0, inicio - time.time()))
+print(json.dumps(marcar_en_hilos(flask_app, alumnos, compartido, proceso)))
+'''
+
+
+def secuencia(alumno_id, hilo):
+    """Las marcas de un hilo para uno de sus alumnos; la última es la que queda"""
+    return [(alumno_id + hilo + vuelta) % 3 != 0 for vuelta in range(MARCAS)]
+
+
+def marcar_en_hilos(flask_app, alumnos, compartido, proceso=0):
+    """HILOS hilos con POST /toggle_asistencia a la vez; devuelve las marcas que fallaron
+
+    alumnos tiene POR_HILO ids por hilo; cada hilo marca además al
+    compartido en cada vuelta.
+    """
+    fallas = []
+    lock = threading.Lock()
+
+    def marcar(hilo):
+        cliente = flask_app.test_client()
+        propios = alumnos[hilo * POR_HILO:(hilo + 1) * POR_HILO]
+        errores = []
+        for vuelta in range(MARCAS):
+            pedidos = [(alumno_id, secuencia(alumno_id, hilo)[vuelta]) for alumno_id in propios]
+            pedidos.append((compartido, (proceso + hilo + vuelta) % 2 == 0))
+            for alumno_id, presente in pedidos:
+                respuesta = cliente.post('/toggle_asistencia', json={'alumno_id': alumno_id, 'presente': presente})
+                datos = respuesta.get_json(silent=True) or {}
+                if respuesta.status_code != 200 or not datos.get('success'):
+                    errores.append(datos.get('message') or f'HTTP {respuesta.status_code}')
+        with lock:
+            fallas.extend(errores)
+
+    hilos = [threading.Thread(target=marcar, args=(hilo,)) for hilo in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return fallas
+
+
+def esperado(alumnos):
+    """{alumno_id: presente} después de las marcas de los hilos dueños"""
+    return {alumno_id: secuencia(alumno_id, indice // POR_HILO)[-1] for indice, alumno_id in enumerate(alumnos)}
+
+
+def verificar(propios, compartido):
+    hoy = date.today()
+    marcas = {fila.alumno_id: bool(fila.presente) for fila in basedatos.consultar(
+        'SELECT alumno_id, presente FROM asistencias WHERE fecha = %s', (hoy,))}
+    assert set(marcas) == set(propios) | {compartido}
+    assert {alumno_id: marcas[alumno_id] for alumno_id in propios} == propios
+
+    presentes = sum(propios.values()) + marcas[compartido]
+    total = basedatos.consultar_uno('''
+        SELECT SUM(presentes) AS presentes, SUM(ausentes) AS ausentes, SUM(marcadas) AS marcadas
+        FROM asistencias_mensuales WHERE mes = %s
+    ''', (hoy.replace(day=1),))
+    assert (total.presentes, total.ausentes, total.marcadas) == (
+        presentes, len(marcas) - presentes, len(marcas))
+
+    mantenido = [tuple(fila) for fila in basedatos.consultar(SQL_ACUMULADO)]
+    asistencia_mensual.reconstruir()
+    assert mantenido == [tuple(fila) for fila in basedatos.consultar(SQL_ACUMULADO)]
+
+
+def crear_alumnos(cantidad):
+    return [crear_alumno('Alumno', f'{numero:03d}', '') for numero in range(cantidad)]
+
+
+def test_hilos_de_un_proceso(app):
+    alumnos = crear_alumnos(HILOS * POR_HILO)
+    compartido = crear_alumno('Compartido', 'Todos', '')
+
+    assert marcar_en_hilos(app, alumnos, compartido) == []
+    verificar(esperado(alumnos), compartido)
+
+
+def test_varios_procesos_y_hilos(app):
+    alumnos = crear_alumnos(PROCESOS * HILOS * POR_HILO)
+    compartido = crear_alumno('Compartido', 'Todos', '')
+    db_pool.cerrar()
+
+    # Que todos empiecen a la vez, después de importar la aplicación
+    inicio = time.time() + 2.0
+    entorno = dict(os.environ, MIGRAR_AL_INICIAR='0', METRICAS='0',
+                   PYTHONPATH=os.pathsep.join([RAIZ, DIRECTORIO]))
+    por_proceso = HILOS * POR_HILO
+    procesos = [
+        subprocess.Popen([sys.executable, '-c', TRABAJADOR, str(inicio), str(numero), str(compartido),
+                          json.dumps(alumnos[numero * por_proceso:(numero + 1) * por_proceso])],
+                         env=entorno, cwd=RAIZ, stdout=subprocess.PIPE, text=True)
+        for numero in range(PROCESOS)
+    ]
+    fallas = []
+    for proceso in procesos:
+        salida, _ = proceso.communicate(timeout=120)
+        assert proceso.returncode == 0
+        fallas.extend(json.loads(salida.strip().splitlines()[-1]))
+
+    assert fallas == []
+    propios = {}
+    for numero in range(PROCESOS):
+        propios.update(esperado(alumnos[numero * por_proceso:(numero + 1) * por_proceso]))
+    verificar(propios, compartido)
+
+
+def test_sin_turno_de_escritura_a_tiempo_es_503(app, monkeypatch):
+    alumno_id = crear_alumno('Ana', 'Espera', '')
+    monkeypatch.setattr(db_pool.get_pool(), 'turno_timeout', 0.2)
+    tomado = threading.Event()
+    soltar = threading.Event()
+
+    def retener():
+        with db_pool.transaccion():
+            tomado.set()
+            soltar.wait(5)
+
+    hilo = threading.Thread(target=retener)
+    hilo.start()
+    tomado.wait(5)
+    try:
+        respuesta = app.test_client().post('/toggle_asistencia', json={'alumno_id': alumno_id, 'presente': True})
+    finally:
+        soltar.set()
+        hilo.join()
+
+    assert respuesta.status_code == 503
+    assert respuesta.headers['Retry-After'] == '5'
+    assert db_pool.get_pool().stats()['agotado'] == 1
+    # Liberado el turno, la misma marca pasa
+    respuesta = app.test_client().post('/toggle_asistencia', json={'alumno_id': alumno_id, 'presente': True})
+    assert respuesta.get_json()['success']
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Descarga de asistencias: los errores llegan antes de empezar a responder"""
+
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+import asistencia_mensual
+import db_pool
+import exportar
+from alumnos import crear_alumno
+
+
+@pytest.fixture
+def marcada(app):
+    alumno_id = crear_alumno('Ana', 'Export', '')
+    with db_pool.transaccion() as conn:
+        asistencia_mensual.guardar_asistencias(conn, [(alumno_id, date.today(), True)])
+    return alumno_id
+
+
+def test_exporta_el_rango(cliente, marcada):
+    respuesta = cliente.get(f'/exportar/asistencias?formato=ndjson&alumno_id={marcada}')
+    assert respuesta.status_code == 200
+    assert b'"apellido": "Export"' in respuesta.get_data()
+
+
+@pytest.mark.parametrize('alumno_id', ['0', '-1', '99999999999999999999999', str(exportar.MAX_ALUMNO_ID + 1)])
+def test_alumno_fuera_de_rango_es_400(cliente, alumno_id):
+    respuesta = cliente.get(f'/exportar/asistencias?alumno_id={alumno_id}')
+    assert respuesta.status_code == 400
+
+
+@pytest.mark.parametrize('error', [db_pool.PoolAgotadoError('sin conexiones'), RuntimeError('réplica caída')])
+def test_sin_base_es_503_antes_de_responder(cliente, marcada, monkeypatch, error):
+    @contextmanager
+    def sin_base():
+        raise error
+        yield
+
+    monkeypatch.setattr(db_pool, 'transaccion_lectura', sin_base)
+    respuesta = cliente.get('/exportar/asistencias')
+    assert respuesta.status_code == 503
+    assert respuesta.headers['Retry-After'] == '5'
+
+
+def test_el_csv_no_deja_formulas(cliente, app):
+    alumno_id = crear_alumno('=HYPERLINK("x")', '+Suma', '')
+    with db_pool.transaccion() as conn:
+        asistencia_mensual.guardar_asistencias(conn, [(alumno_id, date.today(), True)])
+
+    texto = cliente.get('/exportar/asistencias').get_data().decode('utf-8-sig')
+    assert '\'+Suma,"\'=HYPERLINK(""x"")"' in texto
+    assert exportar._celda('-Resta') == "'-Resta"
+    assert exportar._celda('@Arroba') == "'@Arroba"
+    assert exportar._celda('\tTab') == "'\tTab"
+    assert exportar._celda('Ana') == 'Ana'
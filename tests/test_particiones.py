@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Tablas por año de SQLite detrás de la vista asistencias"""
+
+from datetime import date
+
+import asistencia_mensual
+import basedatos
+import db_pool
+import migraciones
+import particiones
+from alumnos import crear_alumno
+
+# Tabla del año como se creaba antes de la migración 11: ids propios
+SQL_TABLA_ANTERIOR = '''
+    CREATE TABLE {tabla} (
+        id INTEGER PRIMARY KEY,
+        alumno_id INTEGER NOT NULL REFERENCES alumnos (id),
+        fecha DATE NOT NULL,
+        presente BOOLEAN DEFAULT 0,
+        UNIQUE (alumno_id, fecha)
+    )
+'''
+
+
+def ids_repetidos():
+    return basedatos.consultar('SELECT id FROM asistencias GROUP BY id HAVING COUNT(*) > 1')
+
+
+def test_los_ids_no_se_repiten_entre_anios(app):
+    particiones.asegurar(date(2024, 1, 1), date(2025, 12, 1))
+    alumnos = [crear_alumno('Alumno', str(numero), '') for numero in range(3)]
+    with db_pool.transaccion() as conn:
+        asistencia_mensual.guardar_asistencias(conn, [
+            (alumno_id, fecha, True)
+            for alumno_id in alumnos for fecha in (date(2024, 3, 1), date(2025, 3, 1), date.today())])
+
+    assert basedatos.consultar_uno('SELECT COUNT(*) AS n FROM asistencias').n == 9
+    assert ids_repetidos() == []
+    fila = basedatos.consultar_uno('SELECT MIN(id) AS id FROM asistencias WHERE fecha = %s', (date(2025, 3, 1),))
+    assert fila.id == 2025 * particiones.IDS_POR_ANIO + 1
+
+
+def test_la_migracion_separa_los_ids_de_las_tablas_anteriores(app):
+    alumno_id = crear_alumno('Ana', 'Anterior', '')
+    anios = (2024, 2025)
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DROP VIEW asistencias')
+        for anio in anios:
+            cursor.execute(SQL_TABLA_ANTERIOR.format(tabla=f'asistencias_{anio}'))
+            basedatos.ejecutar_en(cursor, f'INSERT INTO asistencias_{anio} (id, alumno_id, fecha, presente) '
+                                          f'VALUES (1, %s, %s, 1)', (alumno_id, date(anio, 3, 1)))
+        particiones._recrear_vista(cursor, particiones._existentes(cursor, False).values())
+        cursor.execute('DELETE FROM schema_version WHERE version = 11')
+        cursor.close()
+    assert len(ids_repetidos()) == 1
+
+    assert migraciones.migrar() == [11]
+
+    assert ids_repetidos() == []
+    assert sorted(fila.id for fila in basedatos.consultar('SELECT id FROM asistencias')) == [
+        anio * particiones.IDS_POR_ANIO + 1 for anio in anios]
+    # Las marcas nuevas siguen en el rango de su año
+    with db_pool.transaccion() as conn:
+        asistencia_mensual.guardar_asistencias(conn, [(alumno_id, date(2024, 4, 1), False)])
+    fila = basedatos.consultar_uno('SELECT id FROM asistencias WHERE fecha = %s', (date(2024, 4, 1),))
+    assert fila.id == 2024 * particiones.IDS_POR_ANIO + 2
+
+
+def test_los_anios_anteriores_al_1000_tienen_cuatro_cifras(app):
+    alumno_id = crear_alumno('Ana', 'Antigua', '')
+    with db_pool.transaccion() as conn:
+        asistencia_mensual.guardar_asistencias(conn, [(alumno_id, date(999, 3, 1), True)])
+
+    assert 'asistencias_0999' in particiones.listar()
+    fila = basedatos.consultar_uno('SELECT id FROM asistencias WHERE fecha = %s', (date(999, 3, 1),))
+    assert fila.id == 999 * particiones.IDS_POR_ANIO + 1
+
+
+def test_la_migracion_renombra_las_tablas_de_tres_cifras(app):
+    alumno_id = crear_alumno('Ana', 'Antigua', '')
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_TABLA_ANTERIOR.format(tabla='asistencias_999'))
+        basedatos.ejecutar_en(cursor, 'INSERT INTO asistencias_999 (id, alumno_id, fecha, presente) '
+                                      'VALUES (1, %s, %s, 1)', (alumno_id, date(999, 3, 1)))
+        cursor.execute('DELETE FROM schema_version WHERE version = 13')
+        cursor.close()
+    # La tabla de tres cifras no está en la vista
+    assert basedatos.consultar('SELECT id FROM asistencias') == []
+
+    assert migraciones.migrar() == [13]
+
+    assert 'asistencias_0999' in particiones.listar()
+    assert [fila.id for fila in basedatos.consultar('SELECT id FROM asistencias')] == [
+        999 * particiones.IDS_POR_ANIO + 1]
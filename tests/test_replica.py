@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""A dónde van las lecturas con DATABASE_URL_REPLICA
+
+La réplica es una copia del archivo SQLite con un alumno que el primario
+no tiene (Solo Replica): si aparece en la página, la leyó la réplica.
+"""
+
+import shutil
+import sqlite3
+from datetime import date
+
+import pytest
+
+import cache
+import db_pool
+from alumnos import crear_alumno
+
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    """Id de un alumno del primario, con la réplica configurada y ninguna escritura reciente"""
+    alumno_id = crear_alumno('Ana', 'Primaria', '1')
+    db_pool.cerrar()
+    ruta = str(tmp_path / 'replica.db')
+    shutil.copy(db_pool.SQLITE_PATH, ruta)
+    conn = sqlite3.connect(ruta)
+    cursor = conn.execute("INSERT INTO alumnos (nombre, apellido, telefono) VALUES ('Solo', 'Replica', '')")
+    conn.execute(f"INSERT INTO asistencias_{date.today():%Y} (alumno_id, fecha, presente) VALUES (?, ?, 1)",
+                 (cursor.lastrowid, date.today().isoformat()))
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setenv('DATABASE_URL_REPLICA', f'sqlite:///{ruta}')
+    db_pool._replica = None
+    db_pool._ultima_escritura = None
+    yield alumno_id
+
+
+def leyo(respuesta):
+    cache.roster.invalidar()
+    return 'replica' if b'Replica' in respuesta.get_data() else 'primario'
+
+
+def lecturas():
+    datos = db_pool.stats()['replica']
+    return datos['lecturas_replica'], datos['lecturas_primario']
+
+
+def test_las_lecturas_van_a_la_replica(cliente, replica):
+    assert leyo(cliente.get('/alumnos')) == 'replica'
+    assert leyo(cliente.get('/asistencia')) == 'replica'
+    assert lecturas()[1] == 0
+
+
+def test_despues_de_escribir_se_lee_del_primario(cliente, replica):
+    respuesta = cliente.post('/toggle_asistencia', json={'alumno_id': replica, 'presente': True})
+    assert respuesta.get_json()['success']
+    assert 'escribio=1' in respuesta.headers['Set-Cookie']
+
+    # El mismo navegador (con la cookie) lee lo que acaba de guardar
+    assert leyo(cliente.get('/alumnos')) == 'primario'
+    # Otro navegador también, mientras este proceso escribió hace poco
+    assert leyo(cliente.application.test_client().get('/alumnos')) == 'primario'
+    assert db_pool.stats()['replica']['desvios_lectura_propia'] >= 2
+
+
+def test_con_la_cookie_se_lee_del_primario(app, replica):
+    cliente = app.test_client()
+    cliente.set_cookie('escribio', '1')
+    assert leyo(cliente.get('/alumnos')) == 'primario'
+
+    cliente.delete_cookie('escribio')
+    assert leyo(cliente.get('/alumnos')) == 'replica'
+
+
+def test_la_exportacion_lee_de_la_replica_sin_contar_como_escritura(cliente, replica):
+    antes = lecturas()
+    respuesta = cliente.get('/exportar/asistencias?formato=ndjson')
+
+    assert b'Replica' in respuesta.get_data()
+    assert lecturas()[0] == antes[0] + 1
+    assert lecturas()[1] == antes[1]
+    assert 'Set-Cookie' not in respuesta.headers
+    assert db_pool._ultima_escritura is None
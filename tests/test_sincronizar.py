@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Sincronización de escritorio y web contra el cliente de pruebas de Flask"""
+
+import gzip
+import json
+from datetime import date
+
+import pytest
+
+import asistencia_mensual
+import basedatos
+import db_pool
+import migraciones
+import particiones
+import sincronizar
+from alumnos import crear_alumno, insertar_alumno
+from conftest import borrar_base, usar_pool
+
+
+class ClienteFlask:
+    """Lo mismo que sincronizar.ClienteHTTP, pero contra el cliente de pruebas de Flask
+
+    La web y el escritorio viven en el mismo proceso: mientras dura cada
+    pedido el proceso usa el pool de la web (y no encola pendientes, como
+    la web de verdad), y después vuelve al del escritorio.
+    """
+
+    def __init__(self, cliente, pool_web, pool_escritorio):
+        self.cliente = cliente
+        self.pool_web = pool_web
+        self.pool_escritorio = pool_escritorio
+
+    def en_la_web(self, pedir):
+        url = sincronizar.URL
+        usar_pool(self.pool_web)
+        sincronizar.URL = ''
+        try:
+            respuesta = pedir()
+        finally:
+            sincronizar.URL = url
+            usar_pool(self.pool_escritorio)
+        if respuesta.status_code >= 500:
+            raise sincronizar.SinConexionError(f'HTTP {respuesta.status_code}')
+        if respuesta.status_code >= 400:
+            raise ValueError(f'HTTP {respuesta.status_code} {respuesta.get_json()}')
+        return respuesta.get_json()
+
+    def obtener(self, ruta, parametros=None):
+        return self.en_la_web(lambda: self.cliente.get(ruta, query_string=parametros))
+
+    def enviar(self, ruta, datos):
+        cuerpo = gzip.compress(json.dumps(datos).encode('utf-8'))
+        return self.en_la_web(lambda: self.cliente.post(
+            ruta, data=cuerpo, headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}))
+
+
+@pytest.fixture
+def sincronizacion(app, tmp_path, monkeypatch):
+    """(cliente de sincronización, pool de la web): la app es la web y el proceso, el escritorio"""
+    pool_web = db_pool.get_pool()
+    ruta = str(tmp_path / 'escritorio.db')
+    borrar_base(ruta)
+    pool_escritorio = db_pool._sqlite_pool(ruta)
+    monkeypatch.setattr(sincronizar, 'URL', 'http://web.prueba')
+    usar_pool(pool_escritorio)
+    migraciones.migrar()
+    particiones.asegurar()
+    yield ClienteFlask(app.test_client(), pool_web, pool_escritorio), pool_web
+    usar_pool(pool_web)
+    pool_escritorio.cerrar()
+
+
+def alta_local(nombre, apellido, telefono=''):
+    with db_pool.transaccion() as conn:
+        cursor = conn.cursor()
+        try:
+            alumno_id = insertar_alumno(cursor, nombre, apellido, telefono)
+            sincronizar.encolar(cursor, [('alumno', alumno_id, None, None)])
+        finally:
+            cursor.close()
+    return alumno_id
+
+
+def marcar_local(alumno_id, presente, fecha=None):
+    """Como la versión de escritorio: la marca y su pendiente en la misma transacción"""
+    fecha = fecha or date.today()
+    with db_pool.transaccion() as conn:
+        asistencia_mensual.guardar_asistencias(conn, [(alumno_id, fecha, presente)])
+        cursor = conn.cursor()
+        try:
+            sincronizar.encolar(cursor, [('asistencia', alumno_id, fecha, presente)])
+        finally:
+            cursor.close()
+
+
+def asistencias_de_hoy():
+    """{(nombre, apellido): presente} de la base del proceso"""
+    filas = basedatos.consultar('''
+        SELECT a.nombre, a.apellido, ast.presente
+        FROM alumnos a
+        LEFT JOIN asistencias ast ON ast.alumno_id = a.id AND ast.fecha = %s
+    ''', (date.today(),))
+    return {(f.nombre, f.apellido): None if f.presente is None else bool(f.presente) for f in filas}
+
+
+def en_la_web(cliente, consultar):
+    return cliente.en_la_web(lambda: _Respuesta(consultar()))
+
+
+class _Respuesta:
+    """Para leer la base de la web con ClienteFlask.en_la_web"""
+
+    status_code = 200
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def get_json(self):
+        return self.valor
+
+
+def test_ida_y_vuelta(sincronizacion):
+    cliente, _ = sincronizacion
+    # Un alumno que ya estaba en la web
+    en_la_web(cliente, lambda: crear_alumno('Carla', 'Web', '1'))
+    ana = alta_local('Ana', 'Local')
+    marcar_local(ana, True)
+    marcar_local(ana, False)
+    marcar_local(ana, True)
+    assert sincronizar.contar_pendientes() == 4
+
+    resultado = sincronizar.sincronizar(cliente)
+
+    assert resultado['enviadas'] == 4
+    assert sincronizar.contar_pendientes() == 0
+    # Sube la última marca, y baja el alumno de la web
+    assert en_la_web(cliente, asistencias_de_hoy) == {('Carla', 'Web'): None, ('Ana', 'Local'): True}
+    assert asistencias_de_hoy() == {('Ana', 'Local'): True, ('Carla', 'Web'): None}
+
+    # Lo que se marca en la web baja en la vuelta siguiente
+    remotos = {local: remoto for local, remoto in basedatos.consultar(
+        'SELECT alumno_id, remoto_id FROM alumnos_remotos')}
+    respuesta = cliente.en_la_web(lambda: cliente.cliente.post(
+        '/toggle_asistencia', json={'alumno_id': remotos[ana], 'presente': False}))
+    assert respuesta['success']
+    assert sincronizar.sincronizar(cliente) == {'enviadas': 0, 'recibidas': 1}
+    assert asistencias_de_hoy()[('Ana', 'Local')] is False
+
+    # Sin cambios no se aplica nada y reenviar no duplica
+    assert sincronizar.sincronizar(cliente) == {'enviadas': 0, 'recibidas': 0}
+    lote = {'alumnos': [{'ref': 'x', 'nombre': 'ana', 'apellido': 'LOCAL', 'telefono': ''}],
+            'asistencias': [{'ref': 'x', 'fecha': date.today().isoformat(), 'presente': False}]}
+    assert cliente.enviar('/api/sync', lote)['alumnos'] == {'x': remotos[ana]}
+    assert len(en_la_web(cliente, asistencias_de_hoy)) == 2
+
+
+def test_conflicto_gana_la_marca_local_pendiente(sincronizacion):
+    cliente, _ = sincronizacion
+    ana = alta_local('Ana', 'Local')
+    bruno = alta_local('Bruno', 'Local')
+    marcar_local(ana, True)
+    marcar_local(bruno, True)
+    sincronizar.sincronizar(cliente)
+    remotos = {local: remoto for local, remoto in basedatos.consultar(
+        'SELECT alumno_id, remoto_id FROM alumnos_remotos')}
+
+    # Los dos lados cambian a Ana; la web cambia también a Bruno
+    for alumno_id in (ana, bruno):
+        cliente.en_la_web(lambda: cliente.cliente.post(
+            '/toggle_asistencia', json={'alumno_id': remotos[alumno_id], 'presente': False}))
+    marcar_local(ana, True)
+
+    # Mientras la marca local espera, lo que baja de la web para Ana se ignora
+    assert sincronizar.traer_cambios(cliente) == 1
+    assert asistencias_de_hoy() == {('Ana', 'Local'): True, ('Bruno', 'Local'): False}
+
+    # Al subir, la local pisa a la de la web
+    sincronizar.sincronizar(cliente)
+    assert en_la_web(cliente, asistencias_de_hoy) == {('Ana', 'Local'): True, ('Bruno', 'Local'): False}
+    assert asistencias_de_hoy() == {('Ana', 'Local'): True, ('Bruno', 'Local'): False}
+
+
+def test_sin_conexion_los_pendientes_esperan(sincronizacion):
+    cliente, pool_web = sincronizacion
+    ana = alta_local('Ana', 'Local')
+    marcar_local(ana, True)
+
+    class Caida(ClienteFlask):
+        def en_la_web(self, pedir):
+            raise sincronizar.SinConexionError('sin red')
+
+    with pytest.raises(sincronizar.SinConexionError):
+        sincronizar.sincronizar(Caida(None, pool_web, None))
+    assert sincronizar.contar_pendientes() == 2
+    assert sincronizar.sincronizar(cliente)['enviadas'] == 2
+    assert sincronizar.contar_pendientes() == 0
+
+
+@pytest.mark.parametrize('lote, mensaje', [
+    ({'alumnos': 'Ana'}, 'alumnos y asistencias deben ser listas'),
+    ({'alumnos': ['Ana']}, 'alumnos[0]: se esperaba un objeto'),
+    ({'alumnos': [{'ref': True, 'nombre': 'Ana', 'apellido': 'Local'}]}, 'alumnos[0].ref'),
+    ({'alumnos': [{'ref': '1', 'nombre': ['Ana'], 'apellido': 'Local'}]}, 'alumnos[0].nombre'),
+    ({'asistencias': [None]}, 'asistencias[0]: se esperaba un objeto'),
+])
+def test_lote_mal_formado_es_400(cliente, lote, mensaje):
+    respuesta = cliente.post('/api/sync', json=lote)
+    assert respuesta.status_code == 400
+    assert mensaje in respuesta.get_json()['message']
+
+
+def test_lote_con_datos_invalidos_se_aplica_en_parte(cliente):
+    hoy = date.today().isoformat()
+    respuesta = cliente.post('/api/sync', json={
+        'alumnos': [{'ref': '1', 'nombre': 'Ana', 'apellido': 'Local', 'telefono': ''},
+                    {'ref': '2', 'nombre': '', 'apellido': 'Sin nombre'}],
+        'asistencias': [{'ref': '1', 'fecha': hoy, 'presente': True},
+                        {'ref': '2', 'fecha': hoy, 'presente': True},
+                        {'alumno_id': 999, 'fecha': hoy, 'presente': True},
+                        {'ref': '1', 'fecha': 'ayer', 'presente': True},
+                        {'ref': '1', 'fecha': '0999-03-01', 'presente': True}],
+    })
+    datos = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert list(datos['alumnos']) == ['1']
+    assert datos['aplicadas'] == 1
+    assert len(datos['rechazadas']) == 5
+    # La fecha anterior a SINCRONIZAR_ANIO_MINIMO no crea su partición
+    assert 'asistencias_0999' not in particiones.listar()